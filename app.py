@@ -1,1272 +1,4505 @@
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, g, has_request_context, request, jsonify, send_file, stream_with_context
+from flask.wrappers import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
 from flask_cors import CORS
 import os
+import copy
 import json
-import pandas as pd
-from docx import Document
+import importlib
+import gzip
+import hashlib
+import mimetypes
+import re
+import shutil
+import tempfile
+import zipfile
 import subprocess
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.shared import Pt
+import signal
+import sys
+import select
+import socket
+import struct
 import threading
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from io import BytesIO
+import time
+import uuid
+import zlib
+from collections import deque
+from contextlib import contextmanager, redirect_stdout
+from functools import wraps
+from io import BytesIO, StringIO
 from datetime import datetime
 import platform
+import random
 
-app = Flask(__name__, static_folder="./", static_url_path="/")
+
+class _Lazy:
+    """Stand-in for a heavy module (or one attribute of it) imported on first use.
+
+    Keeps pandas and python-docx out of process start-up for requests that
+    never touch them, such as /login or static files. warm_up() resolves
+    them all up front for servers that prefer eager loading.
+    """
+
+    def __init__(self, module, attr=None):
+        self._module = module
+        self._attr = attr
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            self._target = getattr(target, self._attr) if self._attr else target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+
+pd = _Lazy("pandas")
+Document = _Lazy("docx", "Document")
+WD_PARAGRAPH_ALIGNMENT = _Lazy("docx.enum.text", "WD_PARAGRAPH_ALIGNMENT")
+LAZY_MODULES = [pd, Document, WD_PARAGRAPH_ALIGNMENT, _Lazy("openpyxl")]
+
+# The React build is served from an in-memory manifest (see "Static assets"),
+# not through Flask's static route.
+app = Flask(__name__, static_folder=None)
 # Allow both local development and Docker container access
 CORS(app, origins=['http://localhost:8080', 'http://127.0.0.1:8080', 'http://frontend:8080'], supports_credentials=True)
 app.secret_key = "your_secret_key"
 
+# Admission control: how many parse/fill and PDF conversion jobs may run at
+# once, how many more may wait for a slot, and how long they may wait.
+# Uploads run one at a time by default: the appraisal pipeline keeps its
+# scores and faculty details in module globals and writes its documents to
+# fixed names in the working directory, so concurrent runs would overwrite
+# each other. Only raise UPLOAD_CONCURRENCY once that state is per-request.
+app.config.update(
+    UPLOAD_CONCURRENCY=int(os.environ.get("UPLOAD_CONCURRENCY", 1)),
+    UPLOAD_QUEUE_DEPTH=int(os.environ.get("UPLOAD_QUEUE_DEPTH", 8)),
+    PDF_CONCURRENCY=int(os.environ.get("PDF_CONCURRENCY", 1)),
+    PDF_QUEUE_DEPTH=int(os.environ.get("PDF_QUEUE_DEPTH", 4)),
+    ADMISSION_WAIT_TIMEOUT=float(os.environ.get("ADMISSION_WAIT_TIMEOUT", 30)),
+    ADMISSION_RETRY_AFTER=int(os.environ.get("ADMISSION_RETRY_AFTER", 10)),
+    # Deadlines (seconds) for a whole upload and for a whole PDF conversion
+    UPLOAD_DEADLINE=float(os.environ.get("UPLOAD_DEADLINE", 120)),
+    PDF_DEADLINE=float(os.environ.get("PDF_DEADLINE", 90)),
+    # Vite build output served for the React app
+    STATIC_ROOT=os.environ.get("STATIC_ROOT", "dist"),
+    # Upload ingestion: where per-request upload directories are created,
+    # the largest accepted upload, and how much of a file stays in memory
+    UPLOAD_ROOT=os.environ.get("UPLOAD_ROOT", os.path.join(tempfile.gettempdir(), "appraisal-uploads")),
+    MAX_CONTENT_LENGTH=int(os.environ.get("MAX_UPLOAD_BYTES", 25 * 1024 * 1024)),
+    UPLOAD_SPOOL_BYTES=int(os.environ.get("UPLOAD_SPOOL_BYTES", 1024 * 1024)),
+    # Workbook reader: "pandas" parses whole sheets, "parallel" extracts
+    # sheets in worker processes, "streaming" keeps only the faculty's rows,
+    # "auto" picks by size using the thresholds below
+    WORKBOOK_READER=os.environ.get("WORKBOOK_READER", "auto"),
+    PARALLEL_READER_THRESHOLD_BYTES=int(os.environ.get("PARALLEL_READER_THRESHOLD_BYTES", 1024 * 1024)),
+    STREAMING_READER_THRESHOLD_BYTES=int(os.environ.get("STREAMING_READER_THRESHOLD_BYTES", 8 * 1024 * 1024)),
+    EXTRACT_WORKERS=int(os.environ.get("EXTRACT_WORKERS", os.cpu_count() or 2)),
+    # DOCX writer: "copy" copies unchanged template parts byte for byte,
+    # "python-docx" re-serializes every part with doc.save()
+    DOCX_WRITER=os.environ.get("DOCX_WRITER", "copy"),
+    # Per-faculty cache of section results for incremental re-processing
+    # ("" turns it off)
+    SECTION_CACHE_DIR=os.environ.get("SECTION_CACHE_DIR", "section_cache"),
+    # Whole-appraisal memo: identical submissions are answered from here
+    # ("" turns it off); least recently used entries go past MEMO_MAX_BYTES
+    MEMO_DIR=os.environ.get("MEMO_DIR", "appraisal_memo"),
+    MEMO_MAX_BYTES=int(os.environ.get("MEMO_MAX_BYTES", 256 * 1024 * 1024)),
+    # Corrective action report: "lazy" builds it on first download, "eager"
+    # builds it during every upload (batch runs)
+    CORRECTIVE_REPORT=os.environ.get("CORRECTIVE_REPORT", "lazy"),
+    # Extracted section facts of every appraisal in the history, used by
+    # /rescore ("" stops storing them)
+    FACTS_DIR=os.environ.get("FACTS_DIR", "appraisal_facts"),
+    # /history/stream: seconds between heartbeats, and how long one stream
+    # stays open before the browser reconnects (and resumes) on its own
+    HISTORY_HEARTBEAT_SECONDS=float(os.environ.get("HISTORY_HEARTBEAT_SECONDS", 15)),
+    HISTORY_STREAM_SECONDS=float(os.environ.get("HISTORY_STREAM_SECONDS", 300)),
+    # Open /history/stream connections per worker process. Each one holds a
+    # worker thread for its whole lifetime, so keep this below the thread
+    # count (GUNICORN_THREADS); streams beyond it get a 503 and retry later
+    HISTORY_MAX_STREAMS=int(os.environ.get("HISTORY_MAX_STREAMS", 2)),
+    # Registered term workbooks that uploads can reference by workbook_id
+    # ("" turns registration off)
+    WORKBOOK_DIR=os.environ.get("WORKBOOK_DIR", "term_workbooks"),
+    # Resumable chunked uploads: where partial uploads are kept ("" turns
+    # them off), the largest chunk, and seconds of inactivity before an
+    # upload is removed
+    CHUNKED_UPLOAD_DIR=os.environ.get("CHUNKED_UPLOAD_DIR", "chunked_uploads"),
+    CHUNK_BYTES=int(os.environ.get("CHUNK_BYTES", 1024 * 1024)),
+    CHUNKED_UPLOAD_TTL=float(os.environ.get("CHUNKED_UPLOAD_TTL", 24 * 60 * 60)),
+    # Where the history, facts, chunked uploads, term workbooks and current
+    # output documents are kept: "" (the working directory) or another
+    # directory, sqlite:///path.db, or s3://bucket/prefix (S3_ENDPOINT_URL
+    # for MinIO or another S3-compatible server); lock waits and leases in seconds
+    STORE_URL=os.environ.get("STORE_URL", ""),
+    S3_ENDPOINT_URL=os.environ.get("S3_ENDPOINT_URL", ""),
+    STORE_LOCK_TIMEOUT=float(os.environ.get("STORE_LOCK_TIMEOUT", 30)),
+    STORE_LOCK_LEASE=float(os.environ.get("STORE_LOCK_LEASE", 60)),
+    # Shadow runs: share of uploads (0-1) processed again in the background
+    # by the legacy and the candidate configuration ("KEY=value,KEY=value"
+    # overrides of this config; sampling needs a candidate) and compared,
+    # where the results are stored, and the worker processes doing it
+    SHADOW_SAMPLE_RATE=float(os.environ.get("SHADOW_SAMPLE_RATE", 0)),
+    SHADOW_LEGACY=os.environ.get("SHADOW_LEGACY", ""),
+    SHADOW_CANDIDATE=os.environ.get("SHADOW_CANDIDATE", ""),
+    SHADOW_DIR=os.environ.get("SHADOW_DIR", "shadow_runs"),
+    SHADOW_WORKERS=int(os.environ.get("SHADOW_WORKERS", 1)),
+    # Where `python app.py batch` keeps each run's documents and progress in
+    # the store
+    BATCH_DIR=os.environ.get("BATCH_DIR", "batches"),
+)
+
 # Globals
 staffname = ""
 detaillist = []
 excel_path = ""
+current_key = None  # memo key of the appraisal whose documents are in the cwd
 research = selfm = mentor = academics = hod = 0
 
-@app.route("/")
-def home():
-    # Serve React index.html for root
-    return send_from_directory(app.static_folder, "index.html")
 
-@app.route("/login", methods=["POST", "GET"])
-def login():
-    if request.method == "POST":
-        # Accept both JSON and form data
-        if request.is_json:
-            data = request.get_json()
-            username = data.get("username")
-            password = data.get("password")
-        else:
-            username = request.form.get("username")
-            password = request.form.get("password")
-        
-        if not username or not password:
-            return jsonify({"success": False, "error": "Please enter both username and password."}), 400
-        # dummy auth: password 'admin' allows access
-        if password == "admin":
-            return jsonify({"success": True}), 200
-        else:
-            return jsonify({"success": False, "error": "Please enter correct username and password."}), 401
-    return jsonify({"message": "Login endpoint"})
+############### Admission control ###############
+class QueueFull(Exception):
+    """Raised when a work class has no free slot and no room left to wait."""
 
-@app.route("/upload", methods=["POST"])
-def upload():
-    global staffname, detaillist, excel_path
-    name = request.form.get("name")
-    designation = request.form.get("designation")
-    department = request.form.get("department")
-    emp_id = request.form.get("employee_id")
+    def __init__(self, queue):
+        super().__init__(f"{queue.name} queue is full")
+        self.queue = queue
 
-    # Log received form data
-    print("Received form data:", {
-        "name": name,
-        "designation": designation,
-        "department": department,
-        "employee_id": emp_id
-    })
 
-    if not all([name, designation, department, emp_id]):
-        print("Missing required form fields.")
-        return jsonify({"success": False, "error": "Please fill in all details."}), 400
-    staffname = name
-    detaillist = [name, designation, department, emp_id]
+class AdmissionQueue:
+    """Bounded admission for one class of expensive work.
 
-    excel_file = request.files.get("excel_file")
-    template_file = request.files.get("word_file")
+    At most `concurrency` jobs run at once and at most `depth` more wait for a
+    slot. Anything beyond that, or anything that waits longer than `timeout`
+    seconds, is rejected straight away with QueueFull.
+    """
 
-    # Log received files
-    print("Received files:", {
-        "excel_file": excel_file.filename if excel_file else None,
-        "word_file": template_file.filename if template_file else None
-    })
+    # upper bounds (seconds) of the wait-time histogram buckets
+    BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, float("inf"))
 
-    if not excel_file:
-        print("Missing Excel file.")
-        return jsonify({"error": "Excel file is required."}), 400
+    def __init__(self, name, concurrency, depth, timeout, retry_after):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.depth = max(0, depth)
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * len(self.BUCKETS)
 
-    upload_folder = os.getcwd()
-    excel_path = os.path.join(upload_folder, excel_file.filename)
-    # Always use template.docx from project folder
-    template_path = os.path.join(upload_folder, "template.docx")
+    def _record_wait(self, waited):
+        self.wait_count += 1
+        self.wait_sum += waited
+        self.wait_max = max(self.wait_max, waited)
+        for i, bound in enumerate(self.BUCKETS):
+            if waited <= bound:
+                self.wait_buckets[i] += 1
+                break
 
-    try:
-        excel_file.save(excel_path)
-    except Exception as e:
-        print(f"Error saving Excel file: {e}")
-        return jsonify({"success": False, "error": f"File save failed: {str(e)}"}), 500
+    def _acquire(self):
+        start = time.monotonic()
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                if self.waiting >= self.depth:
+                    self.rejected += 1
+                    raise QueueFull(self)
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        with self._lock:
+            if not acquired:
+                self.rejected += 1
+                raise QueueFull(self)
+            self.running += 1
+            self.admitted += 1
+            self._record_wait(time.monotonic() - start)
 
-    try:
-        processing(excel_path, staffname, template_path, template_file)
-    except Exception as e:
-        print(f"Error in processing: {e}")
-        return jsonify({"success": False, "error": f"Processing failed: {str(e)}"}), 500
+    def _release(self):
+        with self._lock:
+            self.running -= 1
+        self._slots.release()
 
-    # Save appraisal to history
-    with history_lock:
-        history = load_history()
+    @contextmanager
+    def admit(self):
+        self._acquire()
         try:
-            total_score = int(research) + int(selfm) + int(mentor) + int(academics) + int(hod)
-        except Exception:
-            total_score = 0
-        appraisal = {
-            "name": staffname,
-            "designation": detaillist[1] if len(detaillist) > 1 else "",
-            "dept": detaillist[2] if len(detaillist) > 2 else "",
-            "empid": detaillist[3] if len(detaillist) > 3 else "",
-            "research": research,
-            "selfm": selfm,
-            "mentor": mentor,
-            "academics": academics,
-            "hod": hod,
-            "total_score": total_score,
-            "timestamp": datetime.now().isoformat()
-        }
-        history.append(appraisal)
-        save_history(history)
+            yield
+        finally:
+            self._release()
 
-    print("File processed successfully.")
-    return jsonify({"success": True, "message": "File processed successfully."}), 200
+    def try_admit(self):
+        """Take a slot without waiting (QueueFull when none is free), for
+        work that outlives its view, such as a streamed response. Pair it
+        with leave() once that work is done."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(self)
+        with self._lock:
+            self.running += 1
+            self.admitted += 1
+            self._record_wait(0.0)
 
+    def leave(self):
+        """Give back a slot taken with try_admit()."""
+        self._release()
 
-@app.route("/download/<file_type>", methods=["GET"])
-def download(file_type):
-    base = os.getcwd()
-    if file_type == "docx":
-        file_path = os.path.join(base, "filled_template.docx")
-        if not os.path.exists(file_path):
-            return jsonify({"error": "File not found"}), 404
-        return send_file(file_path, as_attachment=True)
-    elif file_type == "pdf":
-        docx_path = os.path.join(base, "filled_template.docx")
-        if not os.path.exists(docx_path):
-            return jsonify({"error": "DOCX file not found for conversion"}), 404
-        
-        try:
-            # Try multiple conversion methods in order of preference
-            output_pdf = os.path.join(base, "filled_template.pdf")
-            
-            # Method 1: Try using LibreOffice (best quality)
-            try:
-                # Detect OS and use appropriate libreoffice command
-                if platform.system() == "Windows":
-                    cmd = ["soffice", "--headless", "--convert-to", "pdf", "--outdir", base, docx_path]
-                else:
-                    cmd = ["libreoffice", "--headless", "--convert-to", "pdf", "--outdir", base, docx_path]
-                
-                result = subprocess.run(cmd, capture_output=True, timeout=60)
-                
-                if os.path.exists(output_pdf):
-                    return send_file(output_pdf, mimetype='application/pdf', as_attachment=True, download_name='filled_template.pdf')
-            except (FileNotFoundError, subprocess.TimeoutExpired, Exception) as e:
-                print(f"LibreOffice conversion failed: {e}")
-            
-            # Method 2: Try using Microsoft Word COM (Windows only) via docx2pdf
-            if platform.system() == "Windows":
-                try:
-                    import win32com.client
-                    word = win32com.client.Dispatch("Word.Application")
-                    word.Visible = False
-                    doc = word.Documents.Open(os.path.abspath(docx_path))
-                    doc.SaveAs(os.path.abspath(output_pdf), FileFormat=17)  # 17 = PDF format
-                    doc.Close()
-                    word.Quit()
-                    if os.path.exists(output_pdf):
-                        return send_file(output_pdf, mimetype='application/pdf', as_attachment=True, download_name='filled_template.pdf')
-                except Exception as e:
-                    print(f"Word COM conversion failed: {e}")
-            
-            # Method 3: Try using convert command line tool
-            try:
-                cmd = ["convert", docx_path, output_pdf]
-                result = subprocess.run(cmd, capture_output=True, timeout=60)
-                if os.path.exists(output_pdf):
-                    return send_file(output_pdf, mimetype='application/pdf', as_attachment=True, download_name='filled_template.pdf')
-            except Exception as e:
-                print(f"Convert command failed: {e}")
-            
-            # Fallback: Return error asking user to install conversion tool
-            error_msg = "PDF conversion requires LibreOffice, Microsoft Word, or ImageMagick to be installed. Please install one of these tools and try again."
-            print(f"ERROR: {error_msg}")
-            return jsonify({"error": error_msg}), 500
-            
-        except Exception as e:
-            print(f"Error converting DOCX to PDF: {e}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({"error": f"PDF conversion failed: {str(e)}"}), 500
-    elif file_type == "corrective":
-        file_path = os.path.join(base, "appfilled_template.docx")
-        if not os.path.exists(file_path):
-            return jsonify({"error": "Corrective action report not found"}), 404
-        return send_file(file_path, as_attachment=True)
-    return jsonify({"error": "Invalid file type"}), 400
+    def __call__(self, view):
+        """Use the queue as a decorator around a whole view function."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with self.admit():
+                return view(*args, **kwargs)
+        return wrapper
 
+    def stats(self):
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "queue_depth": self.depth,
+                "running": self.running,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "wait_seconds": {
+                    "count": self.wait_count,
+                    "sum": round(self.wait_sum, 6),
+                    "max": round(self.wait_max, 6),
+                    "buckets": {
+                        ("+Inf" if bound == float("inf") else str(bound)): n
+                        for bound, n in zip(self.BUCKETS, self.wait_buckets)
+                    },
+                },
+            }
 
-HISTORY_FILE = "appraisal_history.json"
-history_lock = threading.Lock()
 
-def load_history():
-    if not os.path.exists(HISTORY_FILE):
-        return []
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return []
+upload_queue = AdmissionQueue(
+    "upload",
+    app.config["UPLOAD_CONCURRENCY"],
+    app.config["UPLOAD_QUEUE_DEPTH"],
+    app.config["ADMISSION_WAIT_TIMEOUT"],
+    app.config["ADMISSION_RETRY_AFTER"],
+)
+pdf_queue = AdmissionQueue(
+    "pdf",
+    app.config["PDF_CONCURRENCY"],
+    app.config["PDF_QUEUE_DEPTH"],
+    app.config["ADMISSION_WAIT_TIMEOUT"],
+    app.config["ADMISSION_RETRY_AFTER"],
+)
 
-def save_history(history):
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, indent=2)
+# Open /history/stream connections (admitted with try_admit(): a stream
+# over the cap is rejected at once)
+stream_queue = AdmissionQueue(
+    "history_stream",
+    app.config["HISTORY_MAX_STREAMS"],
+    0,
+    0,
+    app.config["ADMISSION_RETRY_AFTER"],
+)
 
-@app.route("/download_path")
-def download_path():
-    history = load_history()
-    return jsonify(history)
 
-@app.route("/history/<timestamp>", methods=["DELETE"])
-def delete_history_record(timestamp):
-    with history_lock:
-        history = load_history()
-        # Filter out the record with matching timestamp
-        updated_history = [item for item in history if item.get("timestamp") != timestamp]
-        save_history(updated_history)
-    return jsonify({"success": True, "message": "Record deleted successfully"}), 200
+@app.errorhandler(QueueFull)
+def queue_full(e):
+    print(f"Rejected request: {e}")
+    response = jsonify({"success": False, "error": "Server is busy, please try again shortly."})
+    response.headers["Retry-After"] = str(e.queue.retry_after)
+    return response, 503
 
-@app.route('/<path:path>')
-def serve_react_app(path):
-    file_path = os.path.join(app.static_folder, path)
-    if os.path.exists(file_path):
-        return send_from_directory(app.static_folder, path)
-    return send_from_directory(app.static_folder, 'index.html')
 
-def find_header_row(excel_path, sheet_name):
-    """Attempt to find the header row index where 'Faculty Name' or similar exists.
-       Returns None if not found."""
-    try:
-        df_temp = pd.read_excel(excel_path, sheet_name=sheet_name, nrows=15)
-    except Exception as e:
-        print(f"Error reading sheet {sheet_name} to detect header: {e}")
-        return None
+@app.route("/metrics")
+def metrics():
+    return jsonify({"queues": {q.name: q.stats() for q in (upload_queue, pdf_queue, stream_queue)}})
 
-    for idx, row in df_temp.iterrows():
-        row_values = [str(val).lower().strip() for val in row if pd.notna(val)]
-        if "faculty name" in row_values or "name of the faculty" in row_values:
-            return idx
-    return None
 
+############### Deadlines and cancellation ###############
+class Cancelled(BaseException):
+    """Raised when a request's deadline passes or its client goes away.
 
-def processing(excel_path, staffname, template_path, template_file):
-    """Full processing: read provided Excel, populate template Word docs and compute scores."""
-    global research, selfm, mentor, academics, hod, detaillist
+    Derives from BaseException (like KeyboardInterrupt) so the many broad
+    `except Exception` blocks in processing() don't swallow it.
+    """
 
-    # Initialize detail list if missing
-    if not detaillist:
-        detaillist = [staffname, "", "", ""]
 
-    # Load template and corrective-action doc
-    try:
-        doc = Document(template_path)
-        doc2=Document()
-    except Exception as e:
-        raise RuntimeError(f"Could not open template docx at {template_path}: {e}")
+def _client_socket(environ):
+    # Werkzeug's dev server and gunicorn both expose the client socket
+    return environ.get("werkzeug.socket") or environ.get("gunicorn.socket")
+
 
-    corrective_doc_path = "Faculty Appraisal- Corrective Action Report.docx"
+def _peer_closed(sock):
+    """True when the client has closed its end of the connection."""
     try:
-        fdoc = Document(corrective_doc_path)
-    except Exception as e:
-        # If corrective doc not found, create a copy of template for corrective operations
-        print(f"Corrective doc not found or couldn't open: {e}. Using template as fallback.")
-        fdoc = Document(template_path)
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except (OSError, ValueError):
+        return False
 
-    # reset scores and counters
-    research = 0
-    selfm = 0
-    mentor = 0
-    academics = 0
-    hod = 0
 
-    # initialize r and p and s counters used across different sections
-    r_counters = {f"r{i}_1": 0 for i in range(1, 14)}
-    p_counters = {f"p{i}_1": 0 for i in range(1, 8)}
-    s_counters = {f"s{i}_1": 0 for i in range(1, 6)}
+class Deadline:
+    """Time budget for one request, checked cooperatively between stages.
 
-    # Helper functions
-    def safe_float(x):
-        try:
-            return float(x)
-        except Exception:
-            return 0.0
-
-    def get_grade_1(value):
-        if value > 95:
-            return 5
-        elif 90 <= value <= 95:
-            return 4
-        elif 80 <= value < 90:
-            return 3
-        elif 70 <= value < 80:
-            return 2
-        elif 60 <= value < 70:
-            return 1
-        elif 50 <= value < 60:
-            return 0
-        else:
-            return -1
-
-    def get_grade_2(value):
-        if 0 < value <= 2:
-            return 1
-        elif 3 <= value <= 4:
-            return 2
-        elif 5 <= value <= 6:
-            return 3
-        elif 7 <= value <= 9:
-            return 4
-        else:
-            return 5
-
-    def get_grade_negative(value):
-        if 0 < value <= 10:
-            return -1
-        elif 11 <= value <= 20:
-            return -2
-        elif 21 <= value <= 30:
-            return -3
-        elif 31 <= value <= 40:
-            return -4
+    `seconds=None` never expires. When `environ` is given, check() also
+    notices a client that has disconnected (polled at most every
+    `poll_interval` seconds) so abandoned requests stop doing work.
+    """
+
+    def __init__(self, seconds=None, environ=None, poll_interval=0.5):
+        self.expires = time.monotonic() + seconds if seconds is not None else None
+        self._sock = _client_socket(environ) if environ else None
+        self._poll_interval = poll_interval
+        self._next_poll = 0.0
+
+    def remaining(self):
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def check(self, stage=""):
+        now = time.monotonic()
+        if self.expires is not None and now >= self.expires:
+            raise Cancelled(f"deadline exceeded{' during ' + stage if stage else ''}")
+        if self._sock is not None and now >= self._next_poll:
+            self._next_poll = now + self._poll_interval
+            if _peer_closed(self._sock):
+                raise Cancelled(f"client disconnected{' during ' + stage if stage else ''}")
+
+
+def _kill_process_group(proc):
+    """Kill a subprocess started by run_killable() along with its children."""
+    try:
+        if platform.system() == "Windows":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True)
         else:
-            return -5
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError):
+        proc.kill()
+    proc.wait()
 
-    # read list of sheets safely
+
+def run_killable(cmd, deadline, timeout=60):
+    """Run `cmd` in its own process group, polling `deadline` while it runs.
+
+    Raises subprocess.TimeoutExpired after `timeout` seconds and Cancelled
+    when the deadline passes or the client disconnects; either way the
+    whole process group (e.g. LibreOffice and its soffice.bin child) is
+    killed before returning.
+    """
+    if platform.system() == "Windows":
+        kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        kwargs = {"start_new_session": True}
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+    stop_at = time.monotonic() + timeout
     try:
-        sheet_names = pd.ExcelFile(excel_path).sheet_names
-    except Exception as e:
-        sheet_names = []
-        print("Could not read Excel file or sheets:", e)
+        while True:
+            deadline.check(cmd[0])
+            left = stop_at - time.monotonic()
+            if left <= 0:
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            try:
+                return proc.wait(timeout=min(0.25, left))
+            except subprocess.TimeoutExpired:
+                continue
+    finally:
+        if proc.poll() is None:
+            _kill_process_group(proc)
 
-    ############### Academics section (copy table and compute totals) ###############
+############### Storage ###############
+# The history, appraisal facts, chunked uploads, registered term workbooks
+# and the current output documents are kept in a Store so that several
+# backend replicas can serve one deployment. Keys are "/"-separated paths.
+# LocalStore keeps them as files (by default in the working directory,
+# where they have always been), SQLiteStore in one database file and
+# S3Store in an S3-compatible bucket. Store.lock() excludes other threads,
+# worker processes and, on a shared store, other replicas. Caches (the
+# appraisal memo, section cache and workbook partitions) stay per replica.
+class LockTimeout(Exception):
+    """A store lock could not be acquired within STORE_LOCK_TIMEOUT."""
+
+
+class LockLost(Exception):
+    """A leased store lock was taken over by another holder while held."""
+
+
+@app.errorhandler(LockLost)
+def lock_lost(e):
+    print(f"Store lock lost: {e}")
+    return jsonify({"success": False, "error": f"Storage lock was lost ({e}); please try again."}), 500
+
+
+@app.errorhandler(LockTimeout)
+def lock_timeout(e):
+    response = jsonify({"success": False, "error": f"Storage is busy ({e}); try again shortly."})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+class Lease:
+    """What Store.lock() yields. check() raises LockLost once the lock has
+    been lost, so a holder can stop before committing its writes."""
+
+    def __init__(self, name):
+        self.name = name
+        self.lost = False
+
+    def check(self):
+        if self.lost:
+            raise LockLost(f"lock {self.name!r} was taken over while held")
+
+
+@contextmanager
+def _renewing(name, renew):
+    """Keep a leased lock: a heartbeat thread calls renew() every third of
+    STORE_LOCK_LEASE (renew() returns False once the lock is no longer
+    ours). Raises LockLost on leaving when the lease was lost."""
+    lease = Lease(name)
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(app.config["STORE_LOCK_LEASE"] / 3):
+            try:
+                if not renew():
+                    lease.lost = True
+                    print(f"Lost the lease of store lock {name!r}")
+                    return
+            except Exception as e:
+                print(f"Could not renew store lock {name!r}: {e}")
+
+    thread = threading.Thread(target=heartbeat, name=f"lease-{name}", daemon=True)
+    thread.start()
     try:
-        # We assume doc.tables[1] is destination and uploaded doc1's table[1] is source in original logic.
-        # Now open the uploaded Word file to get source_table for academics
-        uploaded_doc = Document(template_file.filename)  # Open uploaded Word file
-        source_table = uploaded_doc.tables[1]
-        destination_table = doc.tables[1]
-    except Exception as e:
-        print(f"Error opening uploaded Word file for academics table: {e}")
-        source_table = None
-        destination_table = None
-
-    if source_table is not None and destination_table is not None:
-        scores = [0.0] * 6
-        nos = 0
-        # iterate rows starting from 2 as in original code
-        for i in range(2, len(source_table.rows)):
-            row = source_table.rows[i]
-            first_cell = row.cells[0].text.strip()
-
-            if first_cell.lower() == "total/average":
-                # compute nos as number of valid data rows
-                nos = max(0, i - 3)
-                # Add two rows for Total/Average and Marks
-                for j in range(i, i + 2):
-                    if j >= len(destination_table.rows):
-                        destination_table.add_row()
-                    new_row = destination_table.rows[j]
-                    source_row = source_table.rows[j] if j < len(source_table.rows) else None
-
-                    # ensure correct number of cells
-                    while len(new_row.cells) < (len(source_row.cells) if source_row else 0):
-                        new_row._tr.add_tc()
-
-                    # merge first 4 cells into one label cell (if possible)
-                    try:
-                        merged_cell = new_row.cells[0].merge(new_row.cells[1])
-                        merged_cell = merged_cell.merge(new_row.cells[2])
-                        merged_cell = merged_cell.merge(new_row.cells[3])
-                    except Exception:
-                        pass
+        yield lease
+    finally:
+        stop.set()
+        thread.join()
+    lease.check()
 
-                    if j == i:
-                        # Total/Average row
-                        try:
-                            new_row.cells[3].text = "Total/Average"
-                            avg = (scores[0] / nos) if nos > 0 else 0
-                            # put average at col 4 and remaining sums next
-                            if len(new_row.cells) > 4:
-                                new_row.cells[4].text = f"{avg:.2f}"
-                            for k in range(1, 6):
-                                if 4 + k < len(new_row.cells):
-                                    new_row.cells[4 + k].text = f"{scores[k]:.2f}"
-                        except Exception:
-                            pass
-                    else:
-                        # Marks row based on grading functions
-                        try:
-                            new_row.cells[3].text = "Marks(Ref guideline for awarding score)"
-                            if nos > 0:
-                                val0 = scores[0] / nos
-                            else:
-                                val0 = 0
-                            if len(new_row.cells) > 4:
-                                new_row.cells[4].text = str(get_grade_1(val0))
-                            if len(new_row.cells) > 5:
-                                new_row.cells[5].text = str(get_grade_2(scores[1]))
-                            if len(new_row.cells) > 6:
-                                new_row.cells[6].text = str(get_grade_2(scores[2]))
-                            if len(new_row.cells) > 7:
-                                new_row.cells[7].text = str(get_grade_2(scores[3]))
-                            if len(new_row.cells) > 8:
-                                new_row.cells[8].text = str(get_grade_negative(scores[4]))
-                            if len(new_row.cells) > 9:
-                                new_row.cells[9].text = str(get_grade_negative(scores[5]))
-                        except Exception:
-                            pass
-                # stop scanning source table
-                break
 
-            # Normal copy + accumulate for numeric columns 4..9
-            if i >= len(destination_table.rows):
-                destination_table.add_row()
-            new_row = destination_table.rows[i]
-            # ensure enough cells
-            while len(new_row.cells) < len(row.cells):
-                new_row._tr.add_tc()
-            for j in range(len(row.cells)):
-                text = row.cells[j].text.strip()
-                # copy text
-                try:
-                    new_row.cells[j].text = text
-                except Exception:
-                    pass
-                # accumulate numeric columns (4..9)
-                if 4 <= j <= 9:
-                    scores[j - 4] += safe_float(text)
-
-        # academics score computed via helper get_total_academics_score
-        def get_total_academics_score(scores_list, nos_val):
-            total = 0
-            if nos_val > 0:
-                total += get_grade_1(scores_list[0] / nos_val)
-            total += get_grade_2(scores_list[1])
-            total += get_grade_2(scores_list[2])
-            total += get_grade_2(scores_list[3])
-            total += get_grade_negative(scores_list[4])
-            total += get_grade_negative(scores_list[5])
-            return total
-
-        academics = get_total_academics_score(scores, nos)
-    else:
-        academics = 0
-
-    ############### Publications: Journals, Books ###############
-    # Initialize many counters used in original code
-    for k in range(1, 14):
-        r_counters[f"r{k}_1"] = 0
-    # Also ensure r9 used earlier gets a safe var if present
-    r_counters["r9"] = r_counters.get("r9", 0)
-
-    # Journals
-    if "Journal Publication" in sheet_names:
-        header = find_header_row(excel_path, "Journal Publication")
-        skiprows = header + 1 if header is not None else 0
-        try:
-            df_journal = pd.read_excel(excel_path, sheet_name="Journal Publication", skiprows=skiprows)
-            df_journal.columns = df_journal.columns.str.strip()
-            possible_names = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
-            selected_col = next((col for col in possible_names if col in df_journal.columns), None)
-            if selected_col:
-                df_journal[selected_col] = df_journal[selected_col].ffill()
-                df_filtered = df_journal[df_journal[selected_col].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Journal Publication:", e)
-
-        if not df_filtered.empty:
-            # index for journal table in template (preserved from original)
-            table3_index = 3
-            if table3_index < len(doc.tables):
-                table3 = doc.tables[table3_index]
-                start_row = 1
-                n = 0
-                m_val = 0
-                for i, (_, row) in enumerate(df_filtered.iterrows()):
-                    row_index = start_row + i
-                    if row_index + 1 >= len(table3.rows):
-                        table3.add_row()
-                    # write to row_index+1 as original did
-                    target_row = row_index + 1
-                    try:
-                        table3.cell(target_row, 0).text = str(i + 1)
-                        table3.cell(target_row, 1).text = str(row.get("Paper Title", "-"))
-                        table3.cell(target_row, 2).text = str(row.get("Journal Name", "-"))
-                        table3.cell(target_row, 3).text = str(row.get("Year of Publication", "-"))
-                        table3.cell(target_row, 4).text = str(row.get("ISSN", "-"))
-                        table3.cell(target_row, 5).text = str(row.get("Web Link", "-"))
-                        impact = row.get("Impact Factor", "-")
-                        table3.cell(target_row, 6).text = str(impact)
-                        # scoring rules
-                        try:
-                            if pd.notna(impact) and impact != "-":
-                                if float(impact) > 3:
-                                    n += 3
-                                    r_counters["r2_1"] += 3
-                                elif 1.5 < float(impact) <= 3:
-                                    n += 2
-                                    r_counters["r3_1"] += 2
-                                elif 1 <= float(impact) <= 1.5:
-                                    n += 1
-                                    r_counters["r4_1"] += 1
-                        except Exception:
-                            pass
-                        # base points per journal entry
-                        n += 2
-                        m_val += 2
-                    except Exception as e:
-                        print("Error filling journal row:", e)
-                # Add total row
-                try:
-                    table3.add_row()
-                    last = table3.rows[-1]
-                    # merge first to second-last cells for label
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0] if len(last.cells) >= 2 else last.cells[0].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    # put total score in last cell
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-                research += n
-
-    # Books
-    if "Book Publication" in sheet_names:
-        header = find_header_row(excel_path, "Book Publication")
-        skiprows = header + 1 if header is not None else 0
+def _wait_for(acquire, name, timeout):
+    """Retry `acquire()` with a short backoff until it returns True."""
+    deadline = time.monotonic() + (app.config["STORE_LOCK_TIMEOUT"] if timeout is None else timeout)
+    pause = 0.005
+    while not acquire():
+        if time.monotonic() > deadline:
+            raise LockTimeout(f"lock {name!r} is held elsewhere")
+        time.sleep(pause)
+        pause = min(pause * 2, 0.1)
+
+
+class Store:
+    """What every backend provides; put_file/get_file/delete_prefix have
+    generic versions built on the others."""
+
+    def get(self, key):
+        """The bytes stored under `key`, or None."""
+        raise NotImplementedError
+
+    def put(self, key, data):
+        """Store `data` under `key`, replacing any earlier value atomically."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def list(self, prefix):
+        """(key, size, modified) of every key under `prefix` + "/"."""
+        raise NotImplementedError
+
+    def stamp(self, key):
+        """A value that changes whenever `key` does (None when it is absent)."""
+        raise NotImplementedError
+
+    def lock(self, name, timeout=None):
+        """Context manager holding the named lock (LockTimeout after `timeout`
+        seconds, STORE_LOCK_TIMEOUT by default). It yields a Lease; leased
+        locks are renewed while held, and LockLost is raised if one was
+        taken over anyway."""
+        raise NotImplementedError
+
+    @property
+    def working_directory(self):
+        """True when keys are the working directory's own files."""
+        return False
+
+    def local_path(self, key):
+        """A local file holding `key` without copying it, if there is one."""
+        return None
+
+    def put_file(self, key, path):
+        with open(path, "rb") as f:
+            self.put(key, f.read())
+
+    def get_file(self, key, path):
+        """Copy `key` to the local file `path`; False when it is absent."""
+        data = self.get(key)
+        if data is None:
+            return False
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return True
+
+    def delete_prefix(self, prefix):
+        for key, _, _ in list(self.list(prefix)):
+            self.delete(key)
+
+
+class LocalStore(Store):
+    """Keys as files under `root` (the working directory by default); locks
+    are flock()s on files in <root>/.locks."""
+
+    def __init__(self, root=""):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    @property
+    def working_directory(self):
+        return os.path.abspath(self.root or os.curdir) == os.getcwd()
+
+    def get(self, key):
         try:
-            df_bookpub = pd.read_excel(excel_path, sheet_name="Book Publication", skiprows=skiprows)
-            df_bookpub.columns = df_bookpub.columns.str.strip()
-            possible_names = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
-            selected_col = next((col for col in possible_names if col in df_bookpub.columns), None)
-            if selected_col:
-                df_bookpub[selected_col] = df_bookpub[selected_col].ffill()
-                df_filtered = df_bookpub[df_bookpub[selected_col].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Book Publication:", e)
-
-        if not df_filtered.empty:
-            table4_index = 4
-            if table4_index < len(doc.tables):
-                table4 = doc.tables[table4_index]
-                start_row = 1
-                n = 0
-                for i, (_, row) in enumerate(df_filtered.iterrows()):
-                    row_index = start_row + i
-                    if row_index + 1 >= len(table4.rows):
-                        table4.add_row()
-                    try:
-                        table4.cell(row_index + 1, 0).text = str(i + 1)
-                        table4.cell(row_index + 1, 1).text = str(row.get("Book Title", "-"))
-                        table4.cell(row_index + 1, 2).text = str(row.get("Publication Name", "-"))
-                        table4.cell(row_index + 1, 3).text = str(row.get("Date of Publication", "-"))
-                        table4.cell(row_index + 1, 4).text = str(row.get("ISBN", "-"))
-                        table4.cell(row_index + 1, 5).text = str(row.get("Description", "-"))
-                        # basic scoring for books if desired
-                        n += 1
-                    except Exception as e:
-                        print("Error filling book row:", e)
-                try:
-                    table4.add_row()
-                    last = table4.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-                research += n
-
-    ############### Conferences ###############
-    if "Conferences" in sheet_names:
-        header = find_header_row(excel_path, "Conferences")
-        skiprows = header + 1 if header is not None else 0
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def put(self, key, data):
+        path = self.path(key)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def delete(self, key):
         try:
-            df_conference = pd.read_excel(excel_path, sheet_name="Conferences", skiprows=skiprows)
-            df_conference.columns = df_conference.columns.str.strip()
-            possible_names = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
-            selected_col = next((col for col in possible_names if col in df_conference.columns), None)
-            if selected_col:
-                df_conference[selected_col] = df_conference[selected_col].ffill()
-                df_filtered = df_conference[df_conference[selected_col].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Conferences:", e)
-
-        if not df_filtered.empty:
-            table6_index = 6
-            table7_index = 7
-            if table6_index < len(doc.tables):
-                table6 = doc.tables[table6_index]
-            else:
-                table6 = None
-            if table7_index < len(doc.tables):
-                table7 = doc.tables[table7_index]
-            else:
-                table7 = None
-
-            start_row = 1
-            n_total = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                conference_type = str(row.get("Conference Type", "")).strip().lower()
-                if conference_type == "international":
-                    table = table6
-                    n = 2
-                    r_counters["r8_1"] = r_counters.get("r8_1", 0) + 2
-                else:
-                    table = table7
-                    n = 1
-                    r_counters["r9_1"] = r_counters.get("r9_1", 0) + 1
-                if table is None:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix):
+        top = self.path(prefix)
+        for directory, _, files in os.walk(top):
+            for name in files:
+                if name.endswith(".tmp"):
                     continue
-                row_index = start_row + i
-                if row_index + 1 >= len(table.rows):
-                    table.add_row()
-                try:
-                    table.cell(row_index + 1, 0).text = str(i + 1)
-                    table.cell(row_index + 1, 1).text = str(row.get("Paper Title", "-"))
-                    table.cell(row_index + 1, 2).text = str(row.get("Organized By", "-"))
-                    table.cell(row_index + 1, 3).text = str(row.get("From Date", "-"))
-                    table.cell(row_index + 1, 4).text = str(row.get("Place", "-"))
-                    table.cell(row_index + 1, 5).text = str(row.get("Role", "-"))
-                except Exception as e:
-                    print("Error filling conference row:", e)
-                n_total += n
-            # add totals to whichever table was used last
-            if table6 is not None or table7 is not None:
-                tbl = table6 if table6 is not None else table7
+                path = os.path.join(directory, name)
                 try:
-                    tbl.add_row()
-                    last = tbl.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n_total)
-                except Exception:
-                    pass
-                research += n_total
-
-    ############### Research Grants & Seminars (Research Grant sheet reused) ###############
-    if "Research Grant" in sheet_names:
-        header = find_header_row(excel_path, "Research Grant")
-        skiprows = header + 1 if header is not None else 0
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                key = prefix + "/" + os.path.relpath(path, top).replace(os.sep, "/")
+                yield key, st.st_size, st.st_mtime
+
+    def stamp(self, key):
         try:
-            df_research = pd.read_excel(excel_path, sheet_name="Research Grant", skiprows=skiprows)
-            df_research.columns = df_research.columns.str.strip()
-            # ensure column names tolerant
-            if "Faculty Name" in df_research.columns:
-                df_research["Faculty Name"] = df_research["Faculty Name"].ffill()
-                df_filtered = df_research[df_research["Faculty Name"].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Research Grant:", e)
-
-        # Grants where Coordinator == 'applied' => treated as applications (table7 in original)
-        if not df_filtered.empty:
-            table7_index = 7
-            if table7_index < len(doc.tables):
-                table7 = doc.tables[table7_index]
+            st = os.stat(self.path(key))
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def local_path(self, key):
+        path = self.path(key)
+        return path if os.path.isfile(path) else None
+
+    def put_file(self, key, path):
+        target = self.path(key)
+        if os.path.abspath(path) == os.path.abspath(target):
+            return
+        if os.path.dirname(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+
+    def get_file(self, key, path):
+        source = self.local_path(key)
+        if source is None:
+            return False
+        if os.path.abspath(source) != os.path.abspath(path):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, path)
+        return True
+
+    def delete_prefix(self, prefix):
+        shutil.rmtree(self.path(prefix), ignore_errors=True)
+
+    @contextmanager
+    def lock(self, name, timeout=None):
+        directory = os.path.join(self.root, ".locks")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{name}.lock"), "a+b") as f:
+            if os.name == "nt":
+                import msvcrt
+
+                def acquire():
+                    try:
+                        f.seek(0)
+                        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                        return True
+                    except OSError:
+                        return False
+
+                def release():
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
             else:
-                table7 = None
-
-            n = 0
-            total_amt = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                row_index = 1 + i
-                coord = str(row.get("Coordinator", "-")).strip().lower()
-                amount = row.get("Amount", 0)
-                try:
-                    if coord == "applied":
-                        if table7 is not None:
-                            if row_index + 1 >= len(table7.rows):
-                                table7.add_row()
-                            table7.cell(row_index + 1, 0).text = str(i + 1)
-                            table7.cell(row_index + 1, 1).text = str(row.get("Coordinator", "-"))
-                            table7.cell(row_index + 1, 2).text = str(row.get("Title", "-"))
-                            table7.cell(row_index + 1, 3).text = str(row.get("Type", "-"))
-                            table7.cell(row_index + 1, 4).text = str(row.get("Funding Agent", "-"))
-                            table7.cell(row_index + 1, 5).text = str(amount)
-                            table7.cell(row_index + 1, 6).text = str(row.get("Applied On", "-"))
-                        if pd.notna(amount) and amount != "-" and safe_float(amount) > 0:
-                            total_amt += safe_float(amount)
-                except Exception as e:
-                    print("Error filling research grant row:", e)
+                import fcntl
+
+                def acquire():
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        return True
+                    except BlockingIOError:
+                        return False
+
+                def release():
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            _wait_for(acquire, name, timeout)
+            try:
+                yield Lease(name)
+            finally:
+                release()
+
+
+class SQLiteStore(Store):
+    """Keys as rows of one SQLite database (WAL mode, one connection per
+    thread). Locks are rows of a locks table leased for STORE_LOCK_LEASE
+    seconds, so a crashed holder cannot block the others for good."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self):
+        import sqlite3
+
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=app.config["STORE_LOCK_TIMEOUT"], isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS objects (key TEXT PRIMARY KEY, data BLOB NOT NULL, "
+                       "modified REAL NOT NULL, version INTEGER NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                       "expires REAL NOT NULL)")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def get(self, key):
+        row = self._db().execute("SELECT data FROM objects WHERE key = ?", (key,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def put(self, key, data):
+        self._db().execute(
+            "INSERT INTO objects VALUES (?, ?, ?, 1) ON CONFLICT(key) DO UPDATE SET "
+            "data = excluded.data, modified = excluded.modified, version = objects.version + 1",
+            (key, data, time.time()))
+
+    def delete(self, key):
+        self._db().execute("DELETE FROM objects WHERE key = ?", (key,))
+
+    def list(self, prefix):
+        # every key under prefix/ sorts between "prefix/" and "prefix0"
+        return self._db().execute(
+            "SELECT key, length(data), modified FROM objects WHERE key >= ? AND key < ?",
+            (prefix + "/", prefix + "0")).fetchall()
+
+    def stamp(self, key):
+        row = self._db().execute("SELECT modified, version FROM objects WHERE key = ?", (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def delete_prefix(self, prefix):
+        self._db().execute("DELETE FROM objects WHERE key >= ? AND key < ?", (prefix + "/", prefix + "0"))
+
+    @contextmanager
+    def lock(self, name, timeout=None):
+        db = self._db()
+        owner = uuid.uuid4().hex
+
+        def acquire():
+            now = time.time()
+            db.execute("DELETE FROM locks WHERE name = ? AND expires < ?", (name, now))
+            return db.execute("INSERT OR IGNORE INTO locks VALUES (?, ?, ?)",
+                              (name, owner, now + app.config["STORE_LOCK_LEASE"])).rowcount == 1
+
+        def renew():
+            return self._db().execute("UPDATE locks SET expires = ? WHERE name = ? AND owner = ?",
+                                      (time.time() + app.config["STORE_LOCK_LEASE"], name, owner)).rowcount == 1
+
+        _wait_for(acquire, name, timeout)
+        try:
+            with _renewing(name, renew) as lease:
+                yield lease
+        finally:
+            db.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+
+
+class S3Store(Store):
+    """Keys as objects under `prefix` in an S3-compatible bucket (MinIO or
+    another stand-in via S3_ENDPOINT_URL). Needs the optional boto3 package.
+    Locks are objects created with a conditional put (If-None-Match: *) and
+    leased for STORE_LOCK_LEASE seconds."""
+
+    def __init__(self, bucket, prefix="", endpoint_url=None):
+        import boto3  # noqa: F401  (fail at startup, not on the first request)
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self._client_pid = None
+
+    @property
+    def client(self):
+        if self._client_pid != os.getpid():
+            import boto3
+
+            # boto3 clients are thread-safe but must not cross a fork
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+            self._client_pid = os.getpid()
+        return self._client
+
+    def _key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    @staticmethod
+    def _missing(error):
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def get(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+        except ClientError as e:
+            if self._missing(e):
+                return None
+            raise
+
+    def put(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self, prefix):
+        strip = len(self._key(""))
+        pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self._key(prefix) + "/")
+        for page in pages:
+            for item in page.get("Contents", []):
+                yield item["Key"][strip:], item["Size"], item["LastModified"].timestamp()
+
+    def stamp(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._missing(e):
+                return None
+            raise
+        return head["ETag"], head["LastModified"].timestamp()
+
+    def put_file(self, key, path):
+        self.client.upload_file(path, self.bucket, self._key(key))
+
+    def get_file(self, key, path):
+        from botocore.exceptions import ClientError
+
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            self.client.download_file(self.bucket, self._key(key), tmp)
+        except ClientError as e:
+            if self._missing(e):
+                return False
+            raise
+        os.replace(tmp, path)
+        return True
+
+    @contextmanager
+    def lock(self, name, timeout=None):
+        from botocore.exceptions import ClientError
+
+        key = self._key(f".locks/{name}")
+        owner = uuid.uuid4().hex.encode()
+
+        def acquire():
+            try:
+                self.client.put_object(Bucket=self.bucket, Key=key, Body=owner, IfNoneMatch="*")
+                return True
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("PreconditionFailed", "ConditionalRequestConflict"):
+                    raise
+            # Held: break the lease if its holder went away without releasing it
+            held = self.stamp(f".locks/{name}")
+            if held and time.time() - held[1] > app.config["STORE_LOCK_LEASE"]:
+                self.client.delete_object(Bucket=self.bucket, Key=key)
+            return False
+
+        def renew():
+            # rewrite the lock object (restarting its lease) only if it is still ours
+            held = self.stamp(f".locks/{name}")
+            if not held or self.get(f".locks/{name}") != owner:
+                return False
+            try:
+                self.client.put_object(Bucket=self.bucket, Key=key, Body=owner, IfMatch=held[0])
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                    return False
+                raise
+            return True
+
+        _wait_for(acquire, name, timeout)
+        try:
+            with _renewing(name, renew) as lease:
+                yield lease
+        finally:
+            if self.get(f".locks/{name}") == owner:
+                self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+def open_store(url):
+    """The Store STORE_URL names: "" (the working directory) or a directory
+    path, sqlite:///path/to/file.db, or s3://bucket/optional/prefix."""
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    if url.startswith("s3://"):
+        bucket, _, prefix = url[len("s3://"):].partition("/")
+        return S3Store(bucket, prefix.strip("/"), app.config["S3_ENDPOINT_URL"] or None)
+    if "://" in url:
+        raise ValueError(f"Unsupported STORE_URL: {url}")
+    return LocalStore(url)
+
+
+store = open_store(app.config["STORE_URL"])
+
+
+############### Upload ingestion ###############
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """Upload target that hashes and size-checks the body while it streams in.
+
+    Small files stay in memory; larger ones roll over to an anonymous file
+    in the request's own upload directory. The SHA-256 is ready as soon as
+    the multipart body is parsed, so nothing needs a second read to key a
+    cache on the content.
+    """
+
+    def __init__(self, max_size, spool_size, dir):
+        super().__init__(max_size=spool_size, dir=dir)
+        self.limit = max_size
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            raise RequestEntityTooLarge(f"Uploaded file exceeds {self.limit} bytes.")
+        self._sha256.update(data)
+        return super().write(data)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+
+def request_upload_dir():
+    """Create (once per request) an isolated directory for this request's uploads."""
+    if "upload_dir" not in g:
+        os.makedirs(app.config["UPLOAD_ROOT"], exist_ok=True)
+        g.upload_dir = tempfile.mkdtemp(prefix="upload-", dir=app.config["UPLOAD_ROOT"])
+    return g.upload_dir
+
+
+class IngestRequest(Request):
+    """Request whose multipart file parts stream into HashingSpooledFile."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile(
+            app.config["MAX_CONTENT_LENGTH"] or float("inf"),
+            app.config["UPLOAD_SPOOL_BYTES"],
+            request_upload_dir(),
+        )
+
+
+app.request_class = IngestRequest
+
+
+def uploaded_stream(file_storage):
+    """Rewind an uploaded file and return it as a readable file object."""
+    stream = file_storage.stream
+    stream.seek(0)
+    return stream
+
+
+@app.teardown_request
+def remove_upload_dir(exc=None):
+    for stream in g.pop("open_files", []):
+        stream.close()
+    upload_dir = g.pop("upload_dir", None)
+    if upload_dir:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = app.config["MAX_CONTENT_LENGTH"]
+    return jsonify({"success": False, "error": f"Upload is too large (limit {limit / (1024 * 1024):g} MB)."}), 413
+
+
+############### Chunked uploads ###############
+# Large files can be sent in numbered chunks instead of one multipart body:
+# POST /uploads starts an upload, PUT /uploads/<id>/chunks/<n> stores one
+# chunk (checked against its X-Chunk-SHA256), GET /uploads/<id> lists what
+# has arrived and POST /uploads/<id>/complete assembles the file and checks
+# its sha256. /upload then takes excel_upload_id / word_upload_id in place
+# of the files. Uploads untouched for CHUNKED_UPLOAD_TTL seconds are removed.
+UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+MIN_CHUNK_BYTES = 64 * 1024
+_chunked_gc_at = 0.0
+
+
+class ChunkedUploadError(Exception):
+    """A chunked upload request that cannot be served (sent back as JSON)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+@app.errorhandler(ChunkedUploadError)
+def chunked_upload_error(e):
+    return jsonify({"success": False, "error": str(e)}), e.status
+
+
+def _chunked_prefix(upload_id):
+    if not app.config["CHUNKED_UPLOAD_DIR"] or not UPLOAD_ID.match(upload_id or ""):
+        raise ChunkedUploadError("Upload not found.", 404)
+    return f"{app.config['CHUNKED_UPLOAD_DIR']}/{upload_id}"
+
+
+def _chunked_key(upload_id, name):
+    return f"{_chunked_prefix(upload_id)}/{name}"
+
+
+def load_chunked_upload(upload_id):
+    data = store.get(_chunked_key(upload_id, "meta.json"))
+    try:
+        return json.loads(data)
+    except (TypeError, ValueError):
+        raise ChunkedUploadError("Upload not found (or expired).", 404)
+
+
+def _save_chunked_meta(upload_id, meta):
+    store.put(_chunked_key(upload_id, "meta.json"), json.dumps(meta).encode("utf-8"))
+
+
+def received_chunks(upload_id):
+    names = (key.rpartition("/")[2] for key, _, _ in store.list(_chunked_prefix(upload_id)))
+    return sorted(int(name[:-5]) for name in names if name.endswith(".part") and name[:-5].isdigit())
+
+
+def chunk_length(meta, number):
+    return min(meta["chunk_size"], meta["size"] - number * meta["chunk_size"])
+
+
+def collect_chunked_uploads(force=False):
+    """Remove uploads with no activity for CHUNKED_UPLOAD_TTL seconds (runs
+    at most once a minute unless forced)."""
+    global _chunked_gc_at
+    root = app.config["CHUNKED_UPLOAD_DIR"]
+    now = time.time()
+    if not root or (not force and now - _chunked_gc_at < 60):
+        return
+    _chunked_gc_at = now
+    touched = {}
+    for key, _, modified in store.list(root):
+        upload_id = key[len(root) + 1:].partition("/")[0]
+        touched[upload_id] = max(touched.get(upload_id, 0), modified)
+    for upload_id, modified in touched.items():
+        if now - modified > app.config["CHUNKED_UPLOAD_TTL"]:
+            store.delete_prefix(f"{root}/{upload_id}")
+            print(f"Removed expired chunked upload {upload_id}")
+
+
+def chunked_status(upload_id, meta):
+    received = received_chunks(upload_id) if not meta["complete"] else list(range(meta["chunks"]))
+    ranges = []
+    for number in received:
+        start = number * meta["chunk_size"]
+        end = start + chunk_length(meta, number)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    have = set(received)
+    return {"upload_id": upload_id, "filename": meta["filename"], "size": meta["size"], "sha256": meta["sha256"],
+            "chunk_size": meta["chunk_size"], "chunks": meta["chunks"], "complete": meta["complete"],
+            "received": received, "ranges": ranges,
+            "missing": [n for n in range(meta["chunks"]) if n not in have],
+            "expires_in": app.config["CHUNKED_UPLOAD_TTL"]}
+
+
+@app.route("/uploads", methods=["POST"])
+def start_chunked_upload():
+    """Start a chunked upload: JSON with filename, size, sha256 and an
+    optional chunk_size."""
+    if not app.config["CHUNKED_UPLOAD_DIR"]:
+        return jsonify({"success": False, "error": "Chunked uploads are turned off (CHUNKED_UPLOAD_DIR is empty)."}), 404
+    collect_chunked_uploads()
+    data = request.get_json(silent=True) or {}
+    size = data.get("size")
+    digest = str(data.get("sha256") or "").lower()
+    if not isinstance(size, int) or size <= 0 or not re.fullmatch(r"[0-9a-f]{64}", digest):
+        return jsonify({"success": False, "error": "size (bytes) and sha256 (hex) are required."}), 400
+    limit = app.config["MAX_CONTENT_LENGTH"]
+    if limit and size > limit:
+        return jsonify({"success": False, "error": f"Upload is too large (limit {limit / (1024 * 1024):g} MB)."}), 413
+    chunk_size = data.get("chunk_size") or app.config["CHUNK_BYTES"]
+    if not isinstance(chunk_size, int):
+        return jsonify({"success": False, "error": "chunk_size must be a number of bytes."}), 400
+    chunk_size = max(MIN_CHUNK_BYTES, min(chunk_size, app.config["CHUNK_BYTES"]))
+    upload_id = uuid.uuid4().hex
+    meta = {"filename": secure_filename(str(data.get("filename") or "")) or "upload", "size": size,
+            "sha256": digest, "chunk_size": chunk_size, "chunks": -(-size // chunk_size),
+            "created": datetime.now().isoformat(), "complete": False}
+    _save_chunked_meta(upload_id, meta)
+    return jsonify(chunked_status(upload_id, meta)), 201
+
+
+@app.route("/uploads/<upload_id>", methods=["GET"])
+def chunked_upload_status(upload_id):
+    return jsonify(chunked_status(upload_id, load_chunked_upload(upload_id)))
+
+
+@app.route("/uploads/<upload_id>/chunks/<int:number>", methods=["PUT"])
+def put_chunk(upload_id, number):
+    """Store one chunk from the raw request body; X-Chunk-SHA256 is its sha256."""
+    meta = load_chunked_upload(upload_id)
+    if meta["complete"]:
+        return jsonify(chunked_status(upload_id, meta)), 200
+    if not 0 <= number < meta["chunks"]:
+        return jsonify({"success": False, "error": f"Chunk {number} is out of range (0-{meta['chunks'] - 1})."}), 400
+    expected = (request.headers.get("X-Chunk-SHA256") or "").lower()
+    if not expected:
+        return jsonify({"success": False, "error": "X-Chunk-SHA256 header is required."}), 400
+    length = chunk_length(meta, number)
+    # At most CHUNK_BYTES, so the chunk is checked in memory before it is stored
+    data = bytearray()
+    while len(data) <= length:
+        block = request.stream.read(length + 1 - len(data))
+        if not block:
+            break
+        data += block
+    if len(data) != length:
+        return jsonify({"success": False, "error": f"Chunk {number} must be {length} bytes."}), 400
+    if hashlib.sha256(data).hexdigest() != expected:
+        return jsonify({"success": False, "error": f"Chunk {number} does not match its checksum; send it again."}), 422
+    store.put(_chunked_key(upload_id, f"{number}.part"), bytes(data))
+    return jsonify({"upload_id": upload_id, "chunk": number, "received": length}), 200
+
+
+@app.route("/uploads/<upload_id>/complete", methods=["POST"])
+def complete_chunked_upload(upload_id):
+    """Assemble the chunks in order and check the whole file's sha256."""
+    meta = load_chunked_upload(upload_id)
+    if meta["complete"]:
+        return jsonify(chunked_status(upload_id, meta)), 200
+    status = chunked_status(upload_id, meta)
+    if status["missing"]:
+        return jsonify({"success": False, "error": "Some chunks have not arrived.", **status}), 409
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=request_upload_dir(), delete=False) as out:
+        for number in range(meta["chunks"]):
+            data = store.get(_chunked_key(upload_id, f"{number}.part"))
+            if data is None:
+                # Another request completed the upload meanwhile
+                return jsonify(chunked_status(upload_id, load_chunked_upload(upload_id))), 200
+            digest.update(data)
+            out.write(data)
+    if digest.hexdigest() != meta["sha256"]:
+        return jsonify({"success": False, "error": "The assembled file does not match its sha256; upload it again."}), 422
+    store.put_file(_chunked_key(upload_id, "file"), out.name)
+    meta["complete"] = True
+    _save_chunked_meta(upload_id, meta)
+    for number in range(meta["chunks"]):
+        store.delete(_chunked_key(upload_id, f"{number}.part"))
+    return jsonify(chunked_status(upload_id, meta)), 200
+
+
+def request_file(field):
+    """The file the request sent for `field` ("excel_file" or "word_file"):
+    its multipart part, or the finished chunked upload named by the
+    matching *_upload_id field. None when neither was sent."""
+    if field in request.files:
+        return request.files[field]
+    upload_id = request.values.get(field.replace("_file", "_upload_id"))
+    if not upload_id:
+        return None
+    meta = load_chunked_upload(upload_id)
+    if not meta["complete"]:
+        raise ChunkedUploadError(f"Upload {upload_id} has not been completed.", 409)
+    _save_chunked_meta(upload_id, meta)  # keeps it from expiring while in use
+    key = _chunked_key(upload_id, "file")
+    path = store.local_path(key)
+    if path is None:
+        path = os.path.join(request_upload_dir(), f"chunked-{upload_id}")
+        if not store.get_file(key, path):
+            raise ChunkedUploadError("Upload not found (or expired).", 404)
+    stream = open(path, "rb")
+    stream.sha256 = meta["sha256"]
+    g.setdefault("open_files", []).append(stream)
+    return FileStorage(stream=stream, filename=meta["filename"], name=field)
+
+
+############### Appraisal memo ###############
+# A finished appraisal is stored under a key derived from everything that
+# determines its output; a later submission with the same key gets the
+# stored scores and documents back without being queued or parsed.
+MEMO_VERSION = 1
+OUTPUT_FILES = ("filled_template.docx", "appfilled_template.docx", "debug_filled_template.docx")
+FORM_FIELDS = ("name", "designation", "department", "employee_id")
+
+
+def normalize_field(value):
+    """Form value with surrounding and repeated whitespace removed."""
+    return " ".join((value or "").split())
+
+
+def _template_digest(path):
+    try:
+        return hashlib.sha256(template_bytes(path)).hexdigest()
+    except OSError:
+        return None
+
+
+def appraisal_key(workbook, word_file, fields, template_path):
+    """Memo key for one submission: the uploaded files' and templates'
+    sha256 plus the normalized form fields."""
+    parts = {
+        "version": [MEMO_VERSION, SECTION_CACHE_VERSION],
+        "workbook": stream_sha256(workbook),
+        "word_file": stream_sha256(word_file) if word_file is not None else None,
+        "fields": [fields[k] for k in FORM_FIELDS],
+        "templates": [_template_digest(template_path), _template_digest(CORRECTIVE_TEMPLATE_FILE)],
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class AppraisalMemo:
+    """Directory of finished appraisals, one subdirectory per key holding
+    result.json and the output documents."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def root(self):
+        return app.config["MEMO_DIR"]
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """The stored result for `key` (None on a miss); marks it recently used."""
+        if not self.root:
+            return None
+        result_path = os.path.join(self._entry(key), "result.json")
+        try:
+            with open(result_path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(result_path)
+        except (OSError, ValueError):
+            return None
+        return result
+
+    def path(self, key):
+        """The entry's directory (holding result.json and the documents)."""
+        return self._entry(key)
+
+    def file(self, key, name):
+        """Path of one of the entry's documents (None when it has none)."""
+        if not self.root or not key:
+            return None
+        path = os.path.join(self._entry(key), name)
+        return path if os.path.exists(path) else None
+
+    def add(self, key, base, names):
+        """Copy documents built after the entry was stored (the lazily built
+        corrective report) into it."""
+        entry = self._entry(key)
+        if not self.root or not os.path.isdir(entry):
+            return
+        for name in names:
+            tmp = os.path.join(entry, f"{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                shutil.copyfile(os.path.join(base, name), tmp)
+                os.replace(tmp, os.path.join(entry, name))
+            except OSError as e:
+                print(f"Could not add {name} to appraisal memo {key[:12]}: {e}")
+
+    def put(self, key, result, outputs):
+        """Store `result` with its output documents (the paths processing()
+        returned)."""
+        if not self.root:
+            return
+        entry = self._entry(key)
+        tmp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp)
+            for source in outputs:
+                shutil.copyfile(source, os.path.join(tmp, os.path.basename(source)))
+            with open(os.path.join(tmp, "result.json"), "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp, entry)
+        except OSError as e:
+            # An entry with this key already exists (or the disk is full);
+            # either way the appraisal itself succeeded.
+            print(f"Could not store appraisal memo {key[:12]}: {e}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the memo fits MEMO_MAX_BYTES."""
+        with self._lock:
+            entries = []
+            total = 0
+            for item in os.scandir(self.root):
+                if not item.is_dir() or item.name.endswith(".tmp"):
+                    continue
+                size = 0
+                used = 0
+                for f in os.scandir(item.path):
+                    st = f.stat()
+                    size += st.st_size
+                    if f.name == "result.json":
+                        used = st.st_mtime
+                entries.append((used, size, item))
+                total += size
+            entries.sort(key=lambda e: e[0])
+            for used, size, item in entries:
+                if total <= app.config["MEMO_MAX_BYTES"]:
+                    break
+                if item.name == keep:
+                    continue
+                shutil.rmtree(item.path, ignore_errors=True)
+                total -= size
+                print(f"Evicted appraisal memo {item.name[:12]}")
+
+
+class InFlight:
+    """Lets the first request for a key do the work while identical
+    requests arriving meanwhile wait for it to finish."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = {}
+
+    @contextmanager
+    def lead(self, key, timeout=None):
+        """Yields True to the first caller for `key`; later callers block
+        until it leaves (or `timeout` passes) and then get False."""
+        with self._lock:
+            done = self._running.get(key)
+            leader = done is None
+            if leader:
+                done = self._running[key] = threading.Event()
+        if not leader:
+            done.wait(timeout)
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+            done.set()
+
+
+appraisal_memo = AppraisalMemo()
+in_flight = InFlight()
+
+
+@app.route("/")
+def home():
+    # Serve React index.html for root
+    return serve_asset("index.html")
+
+@app.route("/login", methods=["POST", "GET"])
+def login():
+    if request.method == "POST":
+        # Accept both JSON and form data
+        if request.is_json:
+            data = request.get_json()
+            username = data.get("username")
+            password = data.get("password")
+        else:
+            username = request.form.get("username")
+            password = request.form.get("password")
+        
+        if not username or not password:
+            return jsonify({"success": False, "error": "Please enter both username and password."}), 400
+        # dummy auth: password 'admin' allows access
+        if password == "admin":
+            return jsonify({"success": True}), 200
+        else:
+            return jsonify({"success": False, "error": "Please enter correct username and password."}), 401
+    return jsonify({"message": "Login endpoint"})
+
+@app.route("/upload", methods=["POST"])
+def upload():
+    # validate_only: check the workbook's sheets and columns and return the
+    # report without processing anything (the frontend calls this as soon
+    # as a file is picked)
+    if request.values.get("validate_only", "").lower() in ("1", "true", "yes"):
+        excel_file = request_file("excel_file")
+        if not excel_file and request.values.get("workbook_id"):
+            term, error = resolve_term_workbook(request.values["workbook_id"], request.values.get("workbook_version"))
+            if term is None:
+                return jsonify({"error": error}), 404
+            return jsonify(term.validation), 200
+        if not excel_file:
+            return jsonify({"error": "Excel file is required."}), 400
+        return jsonify(validate_workbook(uploaded_stream(excel_file))), 200
+    return process_upload()
+
+
+def process_upload():
+    # Whitespace is normalized so that resubmitting the same details maps to
+    # the same memo entry (and the same name lookups) as the first time.
+    fields = {k: normalize_field(request.form.get(k)) for k in FORM_FIELDS}
+    name = fields["name"]
+    designation = fields["designation"]
+    department = fields["department"]
+    emp_id = fields["employee_id"]
+
+    # Log received form data
+    print("Received form data:", {
+        "name": name,
+        "designation": designation,
+        "department": department,
+        "employee_id": emp_id
+    })
+
+    if not all([name, designation, department, emp_id]):
+        print("Missing required form fields.")
+        return jsonify({"success": False, "error": "Please fill in all details."}), 400
+
+    excel_file = request_file("excel_file")
+    template_file = request_file("word_file")
+    workbook_id = request.form.get("workbook_id")
+
+    # Log received files
+    print("Received files:", {
+        "excel_file": excel_file.filename if excel_file else None,
+        "word_file": template_file.filename if template_file else None,
+        "workbook_id": workbook_id,
+    })
+
+    # A registered term workbook can stand in for the uploaded one
+    term = None
+    if workbook_id and not excel_file:
+        term, error = resolve_term_workbook(workbook_id, request.form.get("workbook_version"))
+        if term is None:
+            return jsonify({"success": False, "error": error}), 404
+    elif not excel_file:
+        print("Missing Excel file.")
+        return jsonify({"error": "Excel file is required."}), 400
+
+    # Always use template.docx from project folder
+    template_path = os.path.join(os.getcwd(), TEMPLATE_FILE)
+
+    key = appraisal_key(term or uploaded_stream(excel_file),
+                        uploaded_stream(template_file) if template_file else None,
+                        fields, template_path)
+    # Duplicate submissions wait for the first one and are then answered
+    # from the memo; if it failed they run themselves.
+    with in_flight.lead(key, timeout=app.config["UPLOAD_DEADLINE"]):
+        result = appraisal_memo.get(key)
+        if result is None:
+            return run_appraisal(key, excel_file, template_file, template_path, fields, term)
+
+    print(f"Answering from appraisal memo {key[:12]}")
+    make_current(key, result, appraisal_memo.path(key))
+    appraisal = record_appraisal(key, result)
+    return jsonify({"success": True, "message": "File processed successfully.", "validation": result["validation"],
+                    "sections": result["sections"], "memoized": True, "timestamp": appraisal["timestamp"]}), 200
+
+
+@upload_queue
+def run_appraisal(key, excel_file, template_file, template_path, fields, term=None):
+    if term is not None:
+        # Validated and partitioned by faculty when it was registered
+        validation = term.validation
+        workbook = term
+    else:
+        # Header-only pre-pass: reject unreadable workbooks before any full
+        # parse or DOCX work and report missing sheets/columns with the result.
+        validation = validate_workbook(uploaded_stream(excel_file))
+        if not validation["readable"]:
+            return jsonify({"success": False, "error": validation["message"], "validation": validation}), 400
+
+        # The workbook was streamed (and hashed) into this request's upload
+        # directory while the body was parsed; hand it over as a file object.
+        workbook = uploaded_stream(excel_file)
+
+    # Everything about this appraisal stays in local variables and this
+    # request's own output directory until it is complete; only then does
+    # it become the current appraisal (make_current).
+    details = [fields[k] for k in FORM_FIELDS]
+    output_dir = tempfile.mkdtemp(prefix="outputs-", dir=request_upload_dir())
+    deadline = Deadline(app.config["UPLOAD_DEADLINE"], request.environ)
+    try:
+        report = processing(workbook, details[0], template_path, template_file, deadline, details, output_dir)
+    except Cancelled as e:
+        print(f"Processing abandoned: {e}")
+        return jsonify({"success": False, "error": f"Processing abandoned: {e}"}), 504
+    except Exception as e:
+        print(f"Error in processing: {e}")
+        return jsonify({"success": False, "error": f"Processing failed: {str(e)}"}), 500
+
+    sections = {"reused": report["reused"], "reprocessed": report["reprocessed"]}
+    result = {
+        "scores": report["scores"],
+        "detaillist": details,
+        "validation": validation,
+        "sections": sections,
+        "fingerprints": report["fingerprints"],
+        "counters": report["counters"],
+        "facts": report["facts"],
+    }
+    appraisal_memo.put(key, result, report["outputs"])
+    make_current(key, result, output_dir)
+    appraisal = record_appraisal(key, result)
+    # Maybe compare the legacy and candidate paths on this upload, off the request
+    sample_shadow_run(term or excel_file, template_file, fields)
+
+    print("File processed successfully.")
+    return jsonify({"success": True, "message": "File processed successfully.", "validation": validation,
+                    "sections": sections, "timestamp": appraisal["timestamp"]}), 200
+
+
+def apply_result(result):
+    """Set the current appraisal's scores and faculty details."""
+    global research, selfm, mentor, academics, hod, staffname, detaillist
+    scores = result["scores"]
+    research, selfm, mentor = scores["research"], scores["selfm"], scores["mentor"]
+    academics, hod = scores["academics"], scores["hod"]
+    detaillist = list(result["detaillist"])
+    staffname = detaillist[0]
+
+
+def record_appraisal(key, result, batch=None):
+    """Append an appraisal (its memo key and result: scores, detaillist,
+    fingerprints and facts) to the history file and store its facts, with
+    the id of the batch run that produced it, if any."""
+    scores, details = result["scores"], result["detaillist"]
+    facts_id = save_facts({"detaillist": details, "scores": scores, "facts": result["facts"]})
+    with history_lock() as lease:
+        history = load_history()
+        try:
+            total_score = sum(int(scores[k]) for k in ("research", "selfm", "mentor", "academics", "hod"))
+        except Exception:
+            total_score = 0
+        appraisal = {
+            "name": details[0],
+            "designation": details[1] if len(details) > 1 else "",
+            "dept": details[2] if len(details) > 2 else "",
+            "empid": details[3] if len(details) > 3 else "",
+            "research": scores["research"],
+            "selfm": scores["selfm"],
+            "mentor": scores["mentor"],
+            "academics": scores["academics"],
+            "hod": scores["hod"],
+            "total_score": total_score,
+            "timestamp": datetime.now().isoformat(),
+            "fingerprints": result["fingerprints"],
+            "facts_id": facts_id,
+            "memo_key": key,
+        }
+        if batch:
+            appraisal["batch"] = batch
+        history.append(appraisal)
+        lease.check()
+        save_history(history)
+    history_feed.poll(force=True)
+    return appraisal
+
+
+# current_appraisal.json in the store records which appraisal is current
+# (memo key, scores and faculty details), so every worker and replica
+# serves -- and lazily builds the corrective report of -- the same one.
+# With a store outside the working directory (another replica's disk, SQLite
+# or S3) the output documents are also copied to the store under
+# outputs/<memo key>/, and a replica syncs its own copies before serving a
+# download; otherwise the working directory's documents are already shared.
+CURRENT_APPRAISAL = "current_appraisal.json"  # store key
+_synced_outputs = None  # stamp of the current_appraisal.json this replica matches
+outputs_lock = threading.RLock()
+
+
+def replace_outputs(source, base):
+    """Copy the output documents in `source` over those in `base`, removing
+    any that `source` lacks (never leave another appraisal's behind)."""
+    for name in OUTPUT_FILES:
+        target = os.path.join(base, name)
+        tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            shutil.copyfile(os.path.join(source, name), tmp)
+        except OSError:
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+            continue
+        os.replace(tmp, target)
+
+
+@contextmanager
+def current_outputs():
+    """Hold the output documents still: this process's outputs lock and the
+    store's "outputs" lock, which other workers and replicas take too."""
+    with outputs_lock, store.lock("outputs") as lease:
+        yield lease
+
+
+def make_current(key, result, source):
+    """Make a finished appraisal the one /download serves: its documents
+    (copied from the directory `source`), scores and faculty details.
+
+    Runs under current_outputs(), so the documents and the stored record
+    always belong to the same appraisal even when several uploads (in any
+    worker) finish at once.
+    """
+    global current_key
+    with current_outputs() as lease:
+        replace_outputs(source, os.getcwd())
+        apply_result(result)
+        current_key = key
+        publish_outputs(lease)
+
+
+def current_appraisal():
+    """The stored record of the current appraisal (None before the first)."""
+    data = store.get(CURRENT_APPRAISAL)
+    return json.loads(data) if data else None
+
+
+def publish_outputs(lease):
+    """Make this replica's output documents the deployment's current ones
+    (under current_outputs(), whose `lease` is checked before the switch)."""
+    global _synced_outputs
+    if not current_key:
+        return
+    previous = None
+    if not store.working_directory:
+        previous = current_appraisal()
+        for name in OUTPUT_FILES:
+            if os.path.exists(name):
+                store.put_file(f"outputs/{current_key}/{name}", name)
+    lease.check()
+    store.put(CURRENT_APPRAISAL, json.dumps({"key": current_key, "scores": current_scores(),
+                                             "detaillist": detaillist}).encode("utf-8"))
+    _synced_outputs = store.stamp(CURRENT_APPRAISAL)
+    if previous and previous["key"] != current_key:
+        store.delete_prefix(f"outputs/{previous['key']}")
+
+
+def sync_outputs():
+    """Catch up with the deployment's current appraisal when another worker
+    or replica has published a newer one: its scores and details and, with
+    a store outside the working directory, its output documents."""
+    global _synced_outputs, current_key
+    with outputs_lock:
+        stamp = store.stamp(CURRENT_APPRAISAL)
+        if stamp is None or stamp == _synced_outputs:
+            return
+        current = current_appraisal()
+        if not store.working_directory:
+            for name in OUTPUT_FILES:
+                if not store.get_file(f"outputs/{current['key']}/{name}", name):
+                    try:
+                        os.remove(name)
+                    except FileNotFoundError:
+                        pass
+        apply_result(current)
+        current_key = current["key"]
+        _synced_outputs = stamp
+
+
+@app.route("/download/<file_type>", methods=["GET"])
+def download(file_type):
+    sync_outputs()
+    base = os.getcwd()
+    if file_type == "docx":
+        file_path = os.path.join(base, "filled_template.docx")
+        if not os.path.exists(file_path):
+            return jsonify({"error": "File not found"}), 404
+        return send_file(file_path, as_attachment=True)
+    elif file_type == "pdf":
+        docx_path = os.path.join(base, "filled_template.docx")
+        if not os.path.exists(docx_path):
+            return jsonify({"error": "DOCX file not found for conversion"}), 404
+        
+        with pdf_queue.admit():
+            deadline = Deadline(app.config["PDF_DEADLINE"], request.environ)
+            try:
+                return convert_to_pdf(base, docx_path, deadline)
+            except Cancelled as e:
+                print(f"PDF conversion abandoned: {e}")
+                return jsonify({"error": f"PDF conversion abandoned: {e}"}), 504
+            except Exception as e:
+                print(f"Error converting DOCX to PDF: {e}")
+                import traceback
+                traceback.print_exc()
+                return jsonify({"error": f"PDF conversion failed: {str(e)}"}), 500
+    elif file_type == "corrective":
+        file_path = os.path.join(base, "appfilled_template.docx")
+        if not os.path.exists(file_path):
+            # Lazy mode: build it the first time it is asked for from the
+            # stored record of the current appraisal -- whichever worker or
+            # replica made it current -- then keep it with the memo entry.
+            with current_outputs() as lease:
+                sync_outputs()
+                current = current_appraisal()
+                if not os.path.exists(file_path):
+                    if (current is None or len(current["detaillist"]) < 2
+                            or not os.path.exists(os.path.join(base, "filled_template.docx"))):
+                        return jsonify({"error": "Corrective action report not found"}), 404
+                    try:
+                        build_corrective_report(current["scores"], current["detaillist"][1])
+                    except Exception as e:
+                        print(f"Error building corrective action report: {e}")
+                        return jsonify({"error": f"Corrective action report failed: {str(e)}"}), 500
+                    appraisal_memo.add(current["key"], base, CORRECTIVE_OUTPUTS)
+                    publish_outputs(lease)
+        return send_file(file_path, as_attachment=True)
+    return jsonify({"error": "Invalid file type"}), 400
+
+
+def convert_to_pdf(base, docx_path, deadline):
+    """Convert the filled DOCX to PDF with the first converter that works.
+
+    All methods share `deadline`; once it passes (or the client goes away)
+    Cancelled propagates instead of falling through to the next method.
+    """
+    # Try multiple conversion methods in order of preference
+    output_pdf = os.path.join(base, "filled_template.pdf")
+
+    # Method 1: Try using LibreOffice (best quality)
+    try:
+        # Detect OS and use appropriate libreoffice command
+        if platform.system() == "Windows":
+            cmd = ["soffice", "--headless", "--convert-to", "pdf", "--outdir", base, docx_path]
+        else:
+            cmd = ["libreoffice", "--headless", "--convert-to", "pdf", "--outdir", base, docx_path]
+
+        run_killable(cmd, deadline, timeout=60)
+
+        if os.path.exists(output_pdf):
+            return send_file(output_pdf, mimetype='application/pdf', as_attachment=True, download_name='filled_template.pdf')
+    except (FileNotFoundError, subprocess.TimeoutExpired, Exception) as e:
+        print(f"LibreOffice conversion failed: {e}")
+
+    # Method 2: Try using Microsoft Word COM (Windows only) via docx2pdf
+    if platform.system() == "Windows":
+        deadline.check("Word COM")
+        try:
+            import win32com.client
+            word = win32com.client.Dispatch("Word.Application")
+            word.Visible = False
+            doc = word.Documents.Open(os.path.abspath(docx_path))
+            doc.SaveAs(os.path.abspath(output_pdf), FileFormat=17)  # 17 = PDF format
+            doc.Close()
+            word.Quit()
+            if os.path.exists(output_pdf):
+                return send_file(output_pdf, mimetype='application/pdf', as_attachment=True, download_name='filled_template.pdf')
+        except Exception as e:
+            print(f"Word COM conversion failed: {e}")
+
+    # Method 3: Try using convert command line tool
+    try:
+        cmd = ["convert", docx_path, output_pdf]
+        run_killable(cmd, deadline, timeout=60)
+        if os.path.exists(output_pdf):
+            return send_file(output_pdf, mimetype='application/pdf', as_attachment=True, download_name='filled_template.pdf')
+    except Exception as e:
+        print(f"Convert command failed: {e}")
+
+    # Fallback: Return error asking user to install conversion tool
+    error_msg = "PDF conversion requires LibreOffice, Microsoft Word, or ImageMagick to be installed. Please install one of these tools and try again."
+    print(f"ERROR: {error_msg}")
+    return jsonify({"error": error_msg}), 500
+
+
+HISTORY_FILE = "appraisal_history.json"  # store key
+
+
+def history_lock():
+    """Held around every read-modify-write of the history, across workers
+    and replicas."""
+    return store.lock("history")
+
+
+def load_history():
+    data = store.get(HISTORY_FILE)
+    if data is None:
+        return []
+    try:
+        return json.loads(data)
+    except Exception:
+        return []
+
+def iter_history(chunk_size=64 * 1024):
+    """The history records one at a time, decoded as they are needed.
+
+    From a local store the file is read in chunks, so only the record being
+    decoded is held; other stores hand over the whole document, but its
+    records are still never all decoded at once. Stops at the first
+    malformed record (load_history() ignores a corrupt file altogether).
+    """
+    path = store.local_path(HISTORY_FILE)
+    if path is not None:
+        f = open(path, "r", encoding="utf-8")
+        chunks = iter(lambda: f.read(chunk_size), "")
+    else:
+        f = None
+        data = store.get(HISTORY_FILE)
+        chunks = iter([data.decode("utf-8")] if data else [])
+    decoder = json.JSONDecoder()
+    buffer, pos, opened = "", 0, False
+    try:
+        for chunk in chunks:
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos == len(buffer):
+                    break
+                if not opened:
+                    if buffer[pos] != "[":
+                        return
+                    opened, pos = True, pos + 1
+                    continue
+                if buffer[pos] == "]":
+                    return
+                try:
+                    # records are objects, so a partly read one never decodes
+                    record, pos = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    break  # needs the next chunk
+                yield record
+        if buffer[pos:].strip():
+            print("History file is malformed; ignoring the rest of it")
+    finally:
+        if f is not None:
+            f.close()
+
+
+def save_history(history):
+    store.put(HISTORY_FILE, json.dumps(history, indent=2).encode("utf-8"))
+
+@app.route("/download_path")
+def download_path():
+    history = load_history()
+    return jsonify(history)
+
+@app.route("/history/<timestamp>", methods=["DELETE"])
+def delete_history_record(timestamp):
+    with history_lock() as lease:
+        history = load_history()
+        # Filter out the record with matching timestamp
+        updated_history = [item for item in history if item.get("timestamp") != timestamp]
+        lease.check()
+        save_history(updated_history)
+    history_feed.poll(force=True)
+    for item in history:
+        if item.get("timestamp") == timestamp and item.get("facts_id"):
+            delete_facts(item["facts_id"])
+    return jsonify({"success": True, "message": "Record deleted successfully"}), 200
+
+
+############### History change feed ###############
+class HistoryFeed:
+    """Insert and delete events for the history, fanned out to every open
+    /history/stream of this process.
+
+    The feed (not the streams) watches the history file and turns changes,
+    including other workers' writes, into events, so N open dashboards cost
+    one history read per change. Event ids carry a per-process epoch; a
+    stream resuming with an id this process cannot replay gets a snapshot.
+    """
+
+    def __init__(self, size=1000):
+        self._size = size
+        self._pid = None
+        self._reset_lock = threading.Lock()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._epoch = f"{os.getpid():x}{int(time.time()):x}"
+        self._cond = threading.Condition()
+        self._poll_lock = threading.Lock()
+        self._events = deque(maxlen=self._size)  # (seq, event, payload)
+        self._seq = 0
+        self._records = None  # timestamp -> record
+        self._stamp = None
+        self._next_poll = 0.0
+
+    def poll(self, force=False):
+        """Publish what changed in the history file since the last poll
+        (checked at most once a second unless forced)."""
+        if self._pid != os.getpid():
+            with self._reset_lock:
+                if self._pid != os.getpid():
+                    self._reset()  # first use in this (possibly forked) process
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return
+        if not self._poll_lock.acquire(blocking=force):
+            return
+        try:
+            self._next_poll = now + 1.0
+            stamp = store.stamp(HISTORY_FILE)
+            if self._records is not None and stamp == self._stamp:
+                return
+            records = {r.get("timestamp"): r for r in load_history()}
+            with self._cond:
+                if self._records is not None:
+                    for timestamp in self._records.keys() - records.keys():
+                        self._publish("delete", {"timestamp": timestamp})
+                    for timestamp, record in records.items():
+                        if timestamp not in self._records:
+                            self._publish("insert", record)
+                self._records = records
+                self._stamp = stamp
+                self._cond.notify_all()
+        finally:
+            self._poll_lock.release()
+
+    def _publish(self, event, payload):
+        self._seq += 1
+        self._events.append((self._seq, event, payload))
+
+    def _event_id(self, seq):
+        return f"{self._epoch}-{seq}"
+
+    def _resume_from(self, last_event_id):
+        """The sequence number to replay after, or None for a snapshot."""
+        epoch, _, seq = (last_event_id or "").rpartition("-")
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if seq > self._seq or seq < oldest - 1:
+            return None
+        return seq
+
+    def stream(self, last_event_id=None, heartbeat=15.0, lifetime=300.0):
+        """SSE text for one client: a snapshot (unless it can resume), then
+        events as they happen, with heartbeat comments in between."""
+        self.poll(force=True)
+        with self._cond:
+            seq = self._resume_from(last_event_id)
+            snapshot = None
+            if seq is None:
+                seq = self._seq
+                snapshot = list(self._records.values())
+        yield "retry: 3000\n\n"
+        if snapshot is not None:
+            yield self._format(self._event_id(seq), "snapshot", snapshot)
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < lifetime:
+            self.poll()
+            with self._cond:
+                if self._seq == seq:
+                    self._cond.wait(1.0)
+                pending = [e for e in self._events if e[0] > seq]
+            for event_seq, event, payload in pending:
+                yield self._format(self._event_id(event_seq), event, payload)
+                seq = event_seq
+                last_sent = time.monotonic()
+            if time.monotonic() - last_sent >= heartbeat:
+                yield ": heartbeat\n\n"
+                last_sent = time.monotonic()
+
+    @staticmethod
+    def _format(event_id, event, payload):
+        return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+history_feed = HistoryFeed()
+
+
+@app.route("/history/stream")
+def history_stream():
+    """Server-sent events: the history as a snapshot, then insert/delete
+    deltas. EventSource reconnects with Last-Event-ID and only gets what
+    it missed."""
+    # A stream holds its worker thread until it closes; past the cap, turn
+    # the client away rather than starving uploads of threads.
+    try:
+        stream_queue.try_admit()
+    except QueueFull as e:
+        print(f"Rejected request: {e}")
+        retry_after = stream_queue.retry_after
+        return Response(f"retry: {retry_after * 1000}\n\n", status=503, mimetype="text/event-stream",
+                        headers={"Retry-After": str(retry_after), "Cache-Control": "no-cache"})
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    body = history_feed.stream(last_event_id, app.config["HISTORY_HEARTBEAT_SECONDS"],
+                               app.config["HISTORY_STREAM_SECONDS"])
+    response = Response(body, mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(stream_queue.leave)
+    return response
+
+
+def _facts_key(facts_id):
+    return f"{app.config['FACTS_DIR']}/{facts_id}.json"
+
+
+def save_facts(stored):
+    """Store an appraisal's facts; returns their id (None when not stored)."""
+    if not app.config["FACTS_DIR"]:
+        return None
+    facts_id = uuid.uuid4().hex
+    try:
+        store.put(_facts_key(facts_id), json.dumps(stored).encode("utf-8"))
+    except Exception as e:
+        print(f"Could not store appraisal facts: {e}")
+        return None
+    return facts_id
+
+
+def load_facts(facts_id):
+    if not app.config["FACTS_DIR"]:
+        return None
+    data = store.get(_facts_key(facts_id))
+    try:
+        return json.loads(data) if data is not None else None
+    except ValueError:
+        return None
+
+
+def delete_facts(facts_id):
+    if app.config["FACTS_DIR"]:
+        store.delete(_facts_key(facts_id))
+
+
+def select_history(records, timestamps=None, name=None, department=None, latest=False, batch=None):
+    """History records matching the given timestamps, faculty name,
+    department (case and spacing ignored) and batch id; with `latest`, only
+    each faculty's most recent one. `records` may be an iterator
+    (iter_history()): only the selected records are kept."""
+    if batch:
+        records = (r for r in records if r.get("batch") == batch)
+    if timestamps is not None:
+        wanted = set(timestamps)
+        records = (r for r in records if r.get("timestamp") in wanted)
+    if name:
+        name = normalize_field(name).lower()
+        records = (r for r in records if normalize_field(r.get("name")).lower() == name)
+    if department:
+        department = normalize_field(department).lower()
+        records = (r for r in records if normalize_field(r.get("dept")).lower() == department)
+    if latest:
+        newest = {}
+        for r in records:
+            newest[(normalize_field(r.get("name")).lower(), r.get("empid"))] = r
+        records = newest.values()
+    return list(records)
+
+
+@app.route("/rescore", methods=["POST"])
+def rescore_appraisals():
+    """Recompute stored appraisals' scores from their facts under other
+    scoring rules, weights or designation, without the Excel or Word files.
+
+    JSON body (all optional): "timestamps", "name", "department", "batch"
+    and "latest" select history records (default: all); "designation" scores
+    them as that designation; "rules" overrides SCORING_RULES entries;
+    "weights" maps designations to five weights.
+    """
+    body = request.get_json(silent=True) or {}
+    rules = body.get("rules") or {}
+    weights = body.get("weights") or {}
+    if not isinstance(rules, dict) or not isinstance(weights, dict):
+        return jsonify({"success": False, "error": "rules and weights must be objects."}), 400
+    unknown = sorted(set(rules) - set(SCORING_RULES))
+    if unknown:
+        return jsonify({"success": False, "error": f"Unknown scoring rules: {', '.join(unknown)}"}), 400
+    for designation, factors in weights.items():
+        if (not isinstance(factors, list) or len(factors) != 5
+                or not all(isinstance(x, (int, float)) for x in factors)):
+            return jsonify({"success": False, "error": f"Weights for {designation} must be five numbers."}), 400
+
+    records = select_history(iter_history(), body.get("timestamps"), body.get("name"),
+                             body.get("department"), body.get("latest"), body.get("batch"))
+
+    results = []
+    for record in records:
+        result = {"timestamp": record.get("timestamp"), "name": record.get("name"),
+                  "dept": record.get("dept"), "empid": record.get("empid")}
+        stored = load_facts(record["facts_id"]) if record.get("facts_id") else None
+        if stored is None:
+            result["error"] = "No stored facts for this appraisal."
+        else:
+            result.update(rescore(stored, body.get("designation"), rules, weights))
+        results.append(result)
+    return jsonify({"success": True, "results": results}), 200
+
+
+############### Exports ###############
+# Exports are generated row by row and sent as they are produced (chunked
+# transfer encoding): nothing is built up in memory or staged on disk, so a
+# large export starts downloading at once.
+EXPORT_COLUMNS = (["timestamp", "name", "designation", "dept", "empid",
+                   "academics", "research", "selfm", "mentor", "hod", "total_score", "weighted_total"]
+                  + [f"r{i}_1" for i in range(1, 14)] + [f"p{i}_1" for i in range(1, 8)]
+                  + [f"s{i}_1" for i in range(1, 6)])
+EXPORT_BATCH_ROWS = 1000
+
+
+class StreamSink:
+    """Write-only, unseekable file object whose output a generator hands
+    out piecemeal (zipfile then writes entries with data descriptors)."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_rows(records):
+    """One EXPORT_COLUMNS dict per history record, with the weighted total
+    and (when its facts are stored) the corrective report counters."""
+    for record in records:
+        scores = {k: record.get(k, 0) for k in ("academics", "research", "selfm", "mentor", "hod")}
+        row = {column: record.get(column) for column in EXPORT_COLUMNS}
+        try:
+            row["weighted_total"] = weighted_scores(scores, record.get("designation"))[1]
+        except TypeError:
+            row["weighted_total"] = None
+        stored = load_facts(record["facts_id"]) if record.get("facts_id") else None
+        if stored is not None:
+            row.update(rescore(stored)["counters"])
+        yield row
+
+
+def export_csv(rows):
+    import csv
+
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % EXPORT_BATCH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>')
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'officeDocument" Target="xl/workbook.xml"/></Relationships>')
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Appraisals" sheetId="1" r:id="rId1"/></sheets></workbook>')
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+    'worksheet" Target="worksheets/sheet1.xml"/></Relationships>')
+XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _column_letter(index):
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _xlsx_row(r, values):
+    from xml.sax.saxutils import escape
+
+    cells = []
+    for c, value in enumerate(values):
+        ref = f"{_column_letter(c)}{r}"
+        if value is None:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value!r}</v></c>')
+        else:
+            text = escape(XML_ILLEGAL.sub("", str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{r}">{"".join(cells)}</row>'
+
+
+def export_xlsx(rows):
+    """A single-sheet workbook written as it goes: the sheet XML is streamed
+    into the zip with inline strings, so no shared-strings table is kept."""
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", XLSX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", XLSX_ROOT_RELS)
+        archive.writestr("xl/workbook.xml", XLSX_WORKBOOK)
+        archive.writestr("xl/_rels/workbook.xml.rels", XLSX_WORKBOOK_RELS)
+        yield sink.drain()
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xlsx_row(1, EXPORT_COLUMNS).encode("utf-8"))
+            for r, row in enumerate(rows, 2):
+                sheet.write(_xlsx_row(r, [row[c] for c in EXPORT_COLUMNS]).encode("utf-8"))
+                if r % EXPORT_BATCH_ROWS == 0:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+def export_parquet(rows, pa, pq):
+    """Row groups of EXPORT_BATCH_ROWS records, each sent once written."""
+    text = {"timestamp", "name", "designation", "dept", "empid"}
+    schema = pa.schema([(c, pa.string() if c in text else pa.float64()) for c in EXPORT_COLUMNS])
+    sink = StreamSink()
+    writer = pq.ParquetWriter(sink, schema)
+
+    def batch(chunk):
+        columns = {}
+        for c in EXPORT_COLUMNS:
+            if c in text:
+                columns[c] = [None if row[c] is None else str(row[c]) for row in chunk]
+            else:
+                columns[c] = [None if row[c] is None else safe_float(row[c]) for row in chunk]
+        return pa.Table.from_pydict(columns, schema=schema)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == EXPORT_BATCH_ROWS:
+            writer.write_table(batch(chunk))
+            chunk = []
+            yield sink.drain()
+    if chunk:
+        writer.write_table(batch(chunk))
+    writer.close()
+    yield sink.drain()
+
+
+@app.route("/export/<file_type>", methods=["GET"])
+def export(file_type):
+    """Consolidated score sheet of the selected history records (query
+    parameters as for /rescore: timestamp (repeatable), name, department,
+    batch, latest) as csv, xlsx or parquet."""
+    records = select_history(iter_history(), request.args.getlist("timestamp") or None, request.args.get("name"),
+                             request.args.get("department"),
+                             request.args.get("latest", "").lower() in ("1", "true", "yes"), request.args.get("batch"))
+    rows = export_rows(records)
+    stem = normalize_field(request.args.get("department")) or "appraisals"
+    if file_type == "csv":
+        body, mimetype = export_csv(rows), "text/csv"
+    elif file_type == "xlsx":
+        body, mimetype = export_xlsx(rows), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    elif file_type == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            return jsonify({"error": "Parquet export requires the pyarrow package."}), 501
+        body, mimetype = export_parquet(rows, pa, pq), "application/vnd.apache.parquet"
+    else:
+        return jsonify({"error": "Invalid file type"}), 400
+    headers = {"Content-Disposition": f'attachment; filename="{secure_filename(stem) or "appraisals"}.{file_type}"'}
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+def bundle_entries(records, deadline):
+    """(archive name, chunks) for each selected appraisal's documents.
+
+    The filled appraisal comes from the record's memo entry (or from the
+    store for batch runs); the corrective action report from there too, or
+    is built from the stored scores when it was never downloaded.
+    """
+    missing = []
+    for record in records:
+        folder = secure_filename(f"{record.get('name')}_{record.get('empid')}_{record.get('timestamp')}") or "appraisal"
+        docx = _stored_document(record, "filled_template.docx")
+        if docx:
+            yield f"{folder}/filled_template.docx", docx
+        else:
+            missing.append(f"{folder}/filled_template.docx")
+        corrective = _stored_document(record, "appfilled_template.docx")
+        if corrective:
+            yield f"{folder}/corrective_action_report.docx", corrective
+        else:
+            try:
+                scores = {k: record[k] for k in ("research", "selfm", "mentor", "academics", "hod")}
+                buffer = BytesIO()
+                save_document(corrective_report(scores, record.get("designation"), deadline), buffer,
+                              CORRECTIVE_TEMPLATE_FILE)
+                yield f"{folder}/corrective_action_report.docx", [buffer.getvalue()]
+            except Cancelled as e:
+                # The client went away: end the archive here. Cancelled must
+                # not escape the response iterator into the WSGI server.
+                print(f"Bundle abandoned: {e}")
+                return
+            except Exception as e:
+                print(f"Could not build corrective action report for {folder}: {e}")
+                missing.append(f"{folder}/corrective_action_report.docx")
+    if missing:
+        # documents evicted from (or never stored in) the appraisal memo
+        yield "missing.txt", ["\n".join(missing).encode("utf-8")]
+
+
+def _stored_document(record, name):
+    """Chunks of a record's document from the appraisal memo or, for batch
+    runs, the store; None when it is in neither."""
+    path = appraisal_memo.file(record.get("memo_key"), name)
+    if path:
+        return _file_chunks(path)
+    data = batch_document(record, name)
+    return [data] if data is not None else None
+
+
+def _file_chunks(path, size=64 * 1024):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(size), b""):
+            yield chunk
+
+
+def stream_bundle(entries):
+    """A zip of `entries` handed out while it is written. Entries are stored
+    (DOCX is already compressed) and only one chunk is held at a time."""
+    sink = StreamSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, chunks in entries:
+            with archive.open(name, "w", force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+@app.route("/bundle", methods=["GET"])
+def bundle():
+    """Zip of the selected appraisals' documents, selected by batch,
+    department or timestamp (repeatable) as for /export."""
+    args = request.args
+    if not (args.get("batch") or args.get("department") or args.get("timestamp") or args.get("name")):
+        return jsonify({"error": "Select appraisals by batch, department, name or timestamp."}), 400
+    records = select_history(iter_history(), args.getlist("timestamp") or None, args.get("name"),
+                             args.get("department"), args.get("latest", "").lower() in ("1", "true", "yes"),
+                             args.get("batch"))
+    if not records:
+        return jsonify({"error": "No matching appraisals"}), 404
+    stem = secure_filename(normalize_field(args.get("batch") or args.get("department") or args.get("name"))) or "appraisals"
+    # no time limit (bundles grow with the department), but stop building
+    # reports once the client has gone away
+    deadline = Deadline(None, request.environ)
+    body = stream_bundle(bundle_entries(records, deadline))
+    return Response(stream_with_context(body), mimetype="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="{stem}.zip"'})
+
+
+############### Search ###############
+# Every row extracted by an appraisal (a journal paper, patent, workshop...)
+# is a search record. Records come from the stored facts of the appraisals
+# in the history and are indexed in memory: text token -> record ids, plus
+# "type:", "dept:" and "year:" tokens for the field filters. The index
+# follows the history file, adding and dropping appraisals as it changes.
+SEARCH_TOKEN = re.compile(r"[a-z0-9]+")
+SEARCH_YEAR = re.compile(r"\b(19|20)\d\d\b")
+SEARCH_YEAR_COLUMNS = ("Year of Publication", "Date of Publication", "Date", "From Date", "Applied On")
+SEARCH_CONDITION = re.compile(r"^\s*([\w ]+?)\s*(>=|<=|>|<|=)\s*(.+?)\s*$")
+
+
+def _search_key(text):
+    return "_".join(SEARCH_TOKEN.findall(str(text).lower()))
+
+
+def _record_year(row, timestamp):
+    for column in SEARCH_YEAR_COLUMNS:
+        match = SEARCH_YEAR.search(str(row.get(column) or ""))
+        if match:
+            return int(match.group())
+    return int(timestamp[:4]) if timestamp and timestamp[:4].isdigit() else None
+
+
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._history_stamp = None
+        self._records = {}
+        self._postings = {}
+        self._by_facts = {}  # facts_id -> record ids
+        self._next_id = 0
+
+    def sync(self):
+        """Bring the index in line with the history file (cheap when unchanged)."""
+        stamp = store.stamp(HISTORY_FILE)
+        if stamp == self._history_stamp:
+            return
+        wanted = {r["facts_id"]: r for r in load_history() if r.get("facts_id")}
+        for facts_id in set(self._by_facts) - set(wanted):
+            self._remove(facts_id)
+        for facts_id in wanted.keys() - self._by_facts.keys():
+            self._add(facts_id, wanted[facts_id])
+        self._history_stamp = stamp
+
+    def _add(self, facts_id, appraisal):
+        ids = self._by_facts[facts_id] = []
+        stored = load_facts(facts_id)
+        if stored is None:
+            return
+        for sheet, fact in stored["facts"].items():
+            if sheet == "Academics" or not fact:
+                continue
+            for row in fact["rows"]:
+                fields = {column: value for column, value in row.items()
+                          if value is not None and column != "S.No" and column != fact["name_column"]}
+                record = {
+                    "type": sheet,
+                    "name": appraisal.get("name"),
+                    "dept": appraisal.get("dept"),
+                    "designation": appraisal.get("designation"),
+                    "timestamp": appraisal.get("timestamp"),
+                    "year": _record_year(row, appraisal.get("timestamp")),
+                    "fields": fields,
+                }
+                record_id = self._next_id
+                self._next_id += 1
+                self._records[record_id] = record
+                ids.append(record_id)
+                for token in self._tokens(record):
+                    self._postings.setdefault(token, set()).add(record_id)
+
+    @staticmethod
+    def _tokens(record):
+        tokens = set(SEARCH_TOKEN.findall(" ".join(str(v) for v in record["fields"].values()).lower()))
+        tokens.update(SEARCH_TOKEN.findall(str(record["name"]).lower()))
+        tokens.update(["type:" + _search_key(record["type"]), "dept:" + _search_key(record["dept"]),
+                       f"year:{record['year']}"])
+        return tokens
+
+    def _remove(self, facts_id):
+        for record_id in self._by_facts.pop(facts_id):
+            for token in self._tokens(self._records.pop(record_id)):
+                posting = self._postings.get(token)
+                if posting is not None:
+                    posting.discard(record_id)
+                    if not posting:
+                        del self._postings[token]
+
+    def search(self, text="", record_type=None, department=None, year=None, conditions=()):
+        """Records containing every word of `text` and matching the filters
+        and (column, operator, value) conditions, newest appraisal first."""
+        with self._lock:
+            self.sync()
+            tokens = SEARCH_TOKEN.findall(text.lower())
+            if record_type:
+                tokens.append("type:" + _search_key(record_type))
+            if department:
+                tokens.append("dept:" + _search_key(department))
+            if year:
+                tokens.append(f"year:{year}")
+            if tokens:
+                postings = sorted((self._postings.get(t, set()) for t in tokens), key=len)
+                ids = set(postings[0]).intersection(*postings[1:])
+            else:
+                ids = set(self._records)
+            records = [self._records[i] for i in ids]
+        if conditions:
+            records = [r for r in records if all(_matches(r["fields"], *c) for c in conditions)]
+        records.sort(key=lambda r: r["timestamp"] or "", reverse=True)
+        return records
+
+
+def _matches(fields, column, operator, value):
+    actual = next((v for k, v in fields.items() if _search_key(k) == column), None)
+    if actual is None:
+        return False
+    if operator == "=":
+        return _search_key(actual) == _search_key(value)
+    try:
+        actual, value = float(actual), float(value)
+    except (TypeError, ValueError):
+        return False
+    return {">": actual > value, ">=": actual >= value, "<": actual < value, "<=": actual <= value}[operator]
+
+
+search_index = SearchIndex()
+
+
+@app.route("/search", methods=["GET"])
+def search():
+    """Search the records extracted by every appraisal in the history.
+
+    q: words that must all appear; type: section sheet (e.g. "Journal
+    Publication"); department; year; where (repeatable): a column condition
+    such as "Impact Factor>3" or "Status=published"; limit (default 100).
+    """
+    conditions = []
+    for where in request.args.getlist("where"):
+        match = SEARCH_CONDITION.match(where)
+        if not match:
+            return jsonify({"success": False, "error": f"Invalid condition: {where}"}), 400
+        column, operator, value = match.groups()
+        conditions.append((_search_key(column), operator, value))
+    try:
+        limit = int(request.args.get("limit", 100))
+        year = int(request.args["year"]) if request.args.get("year") else None
+    except ValueError:
+        return jsonify({"success": False, "error": "limit and year must be numbers."}), 400
+    records = search_index.search(request.args.get("q", ""), request.args.get("type"),
+                                  request.args.get("department"), year, conditions)
+    return jsonify({"success": True, "total": len(records), "results": records[:limit]}), 200
+
+@app.route('/<path:path>')
+def serve_react_app(path):
+    # Unknown paths fall back to index.html so client-side routes work
+    return serve_asset(path if path in static_manifest() else "index.html")
+
+
+############### Static assets ###############
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are offered
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+MIN_COMPRESS_SIZE = 1024
+# Vite writes content-hashed files into assets/, e.g. assets/index-4f2b9c1a.js
+HASHED_ASSET = re.compile(r"^assets/.+[.-][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_static_manifest = None
+_static_lock = threading.Lock()
+
+
+class StaticAsset:
+    """One built file held in memory with its precompressed variants."""
+
+    def __init__(self, rel_path, data, gz=None, br=None):
+        self.mimetype = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        # encoding -> (body, strong ETag); each variant needs its own ETag
+        self.variants = {"identity": (data, f'"{digest}"')}
+        if gz is not None and len(gz) < len(data):
+            self.variants["gzip"] = (gz, f'"{digest}-gz"')
+        if br is not None and len(br) < len(data):
+            self.variants["br"] = (br, f'"{digest}-br"')
+        self.cache_control = IMMUTABLE if HASHED_ASSET.match(rel_path) else "no-cache"
+
+
+def _read_variant(path):
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return None
+
+
+def build_static_manifest(root):
+    """Read every built file under `root` and pre-generate gzip/brotli variants.
+
+    Variants already produced by the build (`file.js.gz`, `file.js.br`) are
+    used as-is; otherwise they are compressed here once.
+    """
+    manifest = {}
+    if not os.path.isdir(root):
+        print(f"Static root {root!r} not found; run `npm run build` to serve the frontend.")
+        return manifest
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith((".gz", ".br")):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(full_path, root).replace(os.sep, "/")
+            with open(full_path, "rb") as f:
+                data = f.read()
+            gz = _read_variant(full_path + ".gz")
+            br = _read_variant(full_path + ".br")
+            mimetype = mimetypes.guess_type(rel_path)[0] or ""
+            if len(data) >= MIN_COMPRESS_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES):
+                if gz is None:
+                    gz = gzip.compress(data, compresslevel=9, mtime=0)
+                if br is None and brotli is not None:
+                    br = brotli.compress(data, quality=11)
+            manifest[rel_path] = StaticAsset(rel_path, data, gz, br)
+    print(f"Static manifest built: {len(manifest)} files from {root}")
+    return manifest
+
+
+def static_manifest():
+    """Return the manifest, building it on first use."""
+    global _static_manifest
+    if _static_manifest is None:
+        with _static_lock:
+            if _static_manifest is None:
+                _static_manifest = build_static_manifest(app.config["STATIC_ROOT"])
+    return _static_manifest
+
+
+def serve_asset(rel_path):
+    asset = static_manifest().get(rel_path)
+    if asset is None:
+        return jsonify({"error": "File not found"}), 404
+    encoding = "identity"
+    for candidate in ("br", "gzip"):
+        if candidate in asset.variants and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    body, etag = asset.variants[encoding]
+    headers = {"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains(etag.strip('"')):
+        return Response(status=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype=asset.mimetype, headers=headers)
+
+############### Template cache ###############
+TEMPLATE_FILE = "template.docx"
+CORRECTIVE_TEMPLATE_FILE = "Faculty Appraisal- Corrective Action Report.docx"
+BLUEPRINT_FILE = "MSP Self-Appraisal form.docx"
+
+_template_cache = {}
+_template_lock = threading.Lock()
+
+
+def template_bytes(path):
+    """Return the raw bytes of a template file, read once and kept in memory.
+
+    The file is re-read only when its modification time changes, so a
+    preforking master can load every template before workers are forked
+    and the workers share that copy.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    with _template_lock:
+        cached = _template_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    with open(path, "rb") as f:
+        data = f.read()
+    with _template_lock:
+        _template_cache[path] = (mtime, data)
+    return data
+
+
+def open_template(path):
+    """Open a fresh, independently editable Document from a cached template."""
+    return Document(BytesIO(template_bytes(path)))
+
+
+############### DOCX writer ###############
+# python-docx's save() re-serializes and recompresses every part of the
+# package. A filled document only changes word/document.xml, so
+# save_document() copies every other entry of the template's zip as it is,
+# still compressed, and only serializes and compresses the changed parts.
+_ZIP_LOCAL = struct.Struct("<4s5H3L2H")
+_ZIP_CENTRAL = struct.Struct("<4s6H3L5H2L")
+_ZIP_END = struct.Struct("<4s4H2LH")
+_archive_entries = {}
+
+
+class TemplateEntry:
+    __slots__ = ("info", "raw", "rels")
+
+    def __init__(self, info, raw, rels):
+        self.info = info  # ZipInfo from the central directory
+        self.raw = raw  # compressed data, copied verbatim
+        self.rels = rels  # (Id, Type, external) of a .rels entry, else None
+
+
+def template_entries(path):
+    """The template's zip entries, parsed once per template version."""
+    data = template_bytes(path)
+    with _template_lock:
+        cached = _archive_entries.get(path)
+        if cached is not None and cached[0] is data:
+            return cached[1]
+    entries = []
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        for info in archive.infolist():
+            fields = _ZIP_LOCAL.unpack_from(data, info.header_offset)
+            start = info.header_offset + _ZIP_LOCAL.size + fields[9] + fields[10]
+            rels = None
+            if info.filename.endswith(".rels"):
+                root = etree.fromstring(archive.read(info))
+                rels = {(rel.get("Id"), rel.get("Type"), rel.get("TargetMode") == "External") for rel in root}
+            entries.append(TemplateEntry(info, data[start:start + info.compress_size], rels))
+    with _template_lock:
+        _archive_entries[path] = (data, entries)
+    return entries
+
+
+def _dos_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def save_document(doc, target, template_path, changed=()):
+    """Save `doc` (opened from `template_path`) to a path or file object.
+
+    word/document.xml and the partnames in `changed` are serialized; every
+    other entry is copied from the template's zip byte for byte. Falls back
+    to doc.save() when parts or relationships were added or removed, and
+    always uses doc.save() when DOCX_WRITER is "python-docx".
+    """
+    package = doc.part.package
+    parts = {str(part.partname).lstrip("/"): part for part in package.iter_parts()}
+    rels = {str(part.partname.rels_uri).lstrip("/"): part.rels for part in parts.values() if len(part.rels)}
+    rels["_rels/.rels"] = package.rels
+    dirty = {str(doc.part.partname).lstrip("/")} | {name.lstrip("/") for name in changed}
+
+    if app.config["DOCX_WRITER"] == "python-docx":
+        doc.save(target)
+        return
+
+    entries = template_entries(template_path)
+    names = {entry.info.filename for entry in entries}
+    if (set(parts) | set(rels) | {"[Content_Types].xml"}) != names or any(
+            entry.rels is not None and entry.rels != {(r.rId, r.reltype, r.is_external)
+                                                      for r in rels[entry.info.filename].values()}
+            for entry in entries):
+        doc.save(target)
+        return
+
+    records = []
+    for entry in entries:
+        info = entry.info
+        method, crc, size, raw = info.compress_type, info.CRC, info.file_size, entry.raw
+        if info.filename in dirty:
+            blob = parts[info.filename].blob
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            raw = compressor.compress(blob) + compressor.flush()
+            method, crc, size = zipfile.ZIP_DEFLATED, zlib.crc32(blob), len(blob)
+        records.append((info, method, crc, size, raw))
+    if sum(len(r[4]) + 128 for r in records) > 0xFFFFFFFF:
+        doc.save(target)  # needs ZIP64
+        return
+
+    out = open(target, "wb") if isinstance(target, (str, os.PathLike)) else target
+    try:
+        offset = 0
+        central = []
+        for info, method, crc, size, raw in records:
+            encoded = info.filename.encode("utf-8")
+            flags = info.flag_bits & ~0x08  # sizes go in the local header
+            if not info.filename.isascii():
+                flags |= 0x800
+            dostime, dosdate = _dos_time(info.date_time)
+            header = _ZIP_LOCAL.pack(b"PK\x03\x04", 20, flags, method, dostime, dosdate,
+                                     crc, len(raw), size, len(encoded), 0)
+            out.write(header)
+            out.write(encoded)
+            out.write(raw)
+            central.append(_ZIP_CENTRAL.pack(b"PK\x01\x02", 20, 20, flags, method, dostime, dosdate,
+                                             crc, len(raw), size, len(encoded), 0, 0, 0, 0,
+                                             info.external_attr, offset) + encoded)
+            offset += len(header) + len(encoded) + len(raw)
+        directory = b"".join(central)
+        out.write(directory)
+        out.write(_ZIP_END.pack(b"PK\x05\x06", 0, 0, len(central), len(central), len(directory), offset, 0))
+    finally:
+        if out is not target:
+            out.close()
+
+
+def warm_up():
+    """Import the heavy dependencies and load the templates ahead of the first request.
+
+    Called by the gunicorn master (see gunicorn.conf.py) before it forks
+    workers; calling it again is cheap.
+    """
+    for lazy in LAZY_MODULES:
+        lazy._load()
+    static_manifest()
+    for path in (TEMPLATE_FILE, CORRECTIVE_TEMPLATE_FILE, BLUEPRINT_FILE):
+        try:
+            template_bytes(path)
+        except OSError as e:
+            print(f"Could not preload template {path}: {e}")
+
+
+############### Academics (uploaded Word file) ###############
+np = _Lazy("numpy")
+etree = _Lazy("lxml.etree")
+LAZY_MODULES += [np, etree]
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _w(tag):
+    return f"{{{W_NS}}}{tag}"
+
+
+def safe_float(x):
+    try:
+        return float(x)
+    except Exception:
+        return 0.0
+
+
+def _run_text(r):
+    # same mapping python-docx uses for run.text
+    parts = []
+    for e in r:
+        if e.tag == _w("t"):
+            parts.append(e.text or "")
+        elif e.tag in (_w("tab"), _w("ptab")):
+            parts.append("\t")
+        elif e.tag == _w("br"):
+            parts.append("\n" if e.get(_w("type"), "textWrapping") == "textWrapping" else "")
+        elif e.tag == _w("cr"):
+            parts.append("\n")
+        elif e.tag == _w("noBreakHyphen"):
+            parts.append("-")
+    return "".join(parts)
+
+
+def _cell_text(tc):
+    paragraphs = []
+    for p in tc.iterchildren(_w("p")):
+        text = []
+        for child in p:
+            if child.tag == _w("r"):
+                text.append(_run_text(child))
+            elif child.tag == _w("hyperlink"):
+                text.extend(_run_text(r) for r in child.iterchildren(_w("r")))
+        paragraphs.append("".join(text))
+    return "\n".join(paragraphs)
+
+
+def read_docx_table(stream, index):
+    """Return the text of table `index` of a .docx stream as a list of rows.
+
+    Reads word/document.xml in one lxml pass without building a python-docx
+    Document. Rows match python-docx's `row.cells`: a horizontally merged
+    cell repeats once per grid column it spans, and a vertically merged
+    cell repeats the text of the cell above it.
+    """
+    with zipfile.ZipFile(stream) as package:
+        root = etree.fromstring(package.read("word/document.xml"))
+    body = root.find(_w("body"))
+    table = list(body.iterchildren(_w("tbl")))[index]
+    rows = []
+    above = {}  # grid column -> text of the cell covering it in the previous row
+    for tr in table.iterchildren(_w("tr")):
+        row = []
+        current = {}
+        grid_before = tr.find(f"{_w('trPr')}/{_w('gridBefore')}")
+        col = int(grid_before.get(_w("val"))) if grid_before is not None else 0
+        for tc in tr.iterchildren(_w("tc")):
+            props = tc.find(_w("tcPr"))
+            span_el = props.find(_w("gridSpan")) if props is not None else None
+            span = int(span_el.get(_w("val"))) if span_el is not None else 1
+            vmerge = props.find(_w("vMerge")) if props is not None else None
+            if vmerge is not None and vmerge.get(_w("val"), "continue") == "continue":
+                text = above.get(col, "")
+            else:
+                text = _cell_text(tc)
+            for offset in range(span):
+                current[col + offset] = text
+                row.append(text)
+            col += span
+        above = current
+        rows.append(row)
+    return rows
+
+
+def grade_pass_percentage(values):
+    """Vectorized grade for the average pass percentage (5 .. -1)."""
+    v = np.asarray(values, dtype=float)
+    return np.select(
+        [v > 95, (v >= 90) & (v <= 95), (v >= 80) & (v < 90), (v >= 70) & (v < 80), (v >= 60) & (v < 70), (v >= 50) & (v < 60)],
+        [5, 4, 3, 2, 1, 0],
+        -1,
+    )
+
+
+def grade_count(values):
+    """Vectorized grade for O / A / B grade counts (1 .. 5)."""
+    v = np.asarray(values, dtype=float)
+    return np.select([(v > 0) & (v <= 2), (v >= 3) & (v <= 4), (v >= 5) & (v <= 6), (v >= 7) & (v <= 9)], [1, 2, 3, 4], 5)
+
+
+def grade_negative(values):
+    """Vectorized penalty for C / RA grade counts (-1 .. -5)."""
+    v = np.asarray(values, dtype=float)
+    return np.select([(v > 0) & (v <= 10), (v >= 11) & (v <= 20), (v >= 21) & (v <= 30), (v >= 31) & (v <= 40)], [-1, -2, -3, -4], -5)
+
+
+def summarize_academics(rows):
+    """Column sums, course count, marks and total score of the academics table.
+
+    Course rows start at row 2 and run up to the "Total/Average" row;
+    columns 4-9 are the pass percentage and the O, A, B, C and RA counts.
+    """
+    total_row = next(
+        (i for i in range(2, len(rows)) if rows[i] and rows[i][0].strip().lower() == "total/average"),
+        None,
+    )
+    course_rows = rows[2:total_row] if total_row is not None else rows[2:]
+    values = np.zeros((len(course_rows), 6))
+    for r, row in enumerate(course_rows):
+        for j in range(4, min(len(row), 10)):
+            values[r, j - 4] = safe_float(row[j].strip())
+    # cumsum adds row by row, exactly like a running Python total would
+    scores = values.cumsum(axis=0)[-1] if len(course_rows) else np.zeros(6)
+    nos = max(0, total_row - 3) if total_row is not None else 0
+    average = scores[0] / nos if nos > 0 else 0
+    marks = np.concatenate([
+        grade_pass_percentage([average]),
+        grade_count(scores[1:4]),
+        grade_negative(scores[4:6]),
+    ])
+    total = int(marks[1:].sum()) + (int(marks[0]) if nos > 0 else 0)
+    return {
+        "total_row": total_row,
+        "scores": [float(x) for x in scores],
+        "nos": nos,
+        "average": float(average),
+        "marks": [int(x) for x in marks],
+        "total": total,
+    }
+
+
+def find_header_row(excel_path, sheet_name):
+    """Attempt to find the header row index where 'Faculty Name' or similar exists.
+       Returns None if not found."""
+    try:
+        df_temp = pd.read_excel(excel_path, sheet_name=sheet_name, nrows=15)
+    except Exception as e:
+        print(f"Error reading sheet {sheet_name} to detect header: {e}")
+        return None
+
+    for idx, row in df_temp.iterrows():
+        row_values = [str(val).lower().strip() for val in row if pd.notna(val)]
+        if "faculty name" in row_values or "name of the faculty" in row_values:
+            return idx
+    return None
+
+
+############### Workbook sections ###############
+FACULTY_NAME_COLUMNS = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
+HEADER_SCAN_ROWS = 15
+
+# The workbook sheets processing() reads. For each: the columns tried (in
+# order) to find the faculty's rows, whether the header row has to be
+# located first, the columns the score depends on, and the columns copied
+# into the template. Names match case-insensitively unless "match" is
+# "exact"; "where" adds (lower-cased) column filters.
+SECTIONS = [
+    {"sheet": "Journal Publication", "name_columns": FACULTY_NAME_COLUMNS, "find_header": True,
+     "score_columns": ["Impact Factor"],
+     "columns": ["Paper Title", "Journal Name", "Year of Publication", "ISSN", "Web Link", "Impact Factor"]},
+    {"sheet": "Book Publication", "name_columns": FACULTY_NAME_COLUMNS, "find_header": True,
+     "score_columns": [],
+     "columns": ["Book Title", "Publication Name", "Date of Publication", "ISBN", "Description"]},
+    {"sheet": "Conferences", "name_columns": FACULTY_NAME_COLUMNS, "find_header": True,
+     "score_columns": ["Conference Type"],
+     "columns": ["Paper Title", "Organized By", "From Date", "Place", "Role"]},
+    {"sheet": "Research Grant", "name_columns": ["Faculty Name"], "find_header": True,
+     "score_columns": ["Coordinator", "Amount"],
+     "columns": ["Title", "Type", "Funding Agent", "Applied On"]},
+    {"sheet": "Patents", "name_columns": ["Faculty name", "Faculty Name", "Faculty"], "find_header": False,
+     "score_columns": ["Status"],
+     "columns": ["Title", "Date"]},
+    {"sheet": "Workshop", "name_columns": FACULTY_NAME_COLUMNS, "find_header": True,
+     "score_columns": ["Role"],
+     "columns": ["Topic", "From Date", "To Date", "Description", "Venue"]},
+    {"sheet": "Faculty Internship", "name_columns": FACULTY_NAME_COLUMNS, "find_header": True,
+     "score_columns": [],
+     "columns": ["FDP Name", "From Date", "To Date", "Description", "National or International"]},
+    {"sheet": "MOOC Course", "name_columns": FACULTY_NAME_COLUMNS, "find_header": True,
+     "score_columns": [],
+     "columns": ["Coure Title", "Course Type", "From Date", "To Date", "Duration", "Awards"]},
+    {"sheet": "MoU", "name_columns": FACULTY_NAME_COLUMNS, "find_header": True,
+     "score_columns": [],
+     "columns": ["Company Name", "From Date", "To Date", "Industry SPOC", "Duration"]},
+    {"sheet": "Workshops", "name_columns": FACULTY_NAME_COLUMNS, "find_header": True,
+     "match": "exact", "where": {"Role": "conducted"},
+     "score_columns": ["Role"],
+     "columns": ["Topic", "Department", "From Date", "To Date", "No of Students", "Venue", "Description"]},
+    {"sheet": "Guest Lectures", "name_columns": ["Faculty Name"], "find_header": True,
+     "score_columns": [],
+     "columns": ["Chief Guest Name", "Address", "Topic Name", "From Date", "To Date", "Description", "Topic Delivered"]},
+    {"sheet": "Project Guided or Mentoring", "name_columns": ["Faculty Name"], "find_header": True,
+     "score_columns": [],
+     "columns": ["Project Title", "Number of Students", "Title of Hackathon", "Organized By", "Date", "Status"]},
+]
+
+
+def locate_header(rows, find_header=True):
+    """Return (index, column names) of the header among a sheet's first raw rows.
+
+    Mirrors find_header_row() + pd.read_excel: the header is the first row
+    below row 0 (within HEADER_SCAN_ROWS) holding a faculty-name label, or
+    row 0 when there is none. Column names follow pandas: blank ones become
+    "Unnamed: <n>", repeats get ".1", ".2" suffixes, then all are stripped.
+    """
+    index = 0
+    if find_header:
+        for i, row in enumerate(rows[1:HEADER_SCAN_ROWS + 1], start=1):
+            values = [str(v).lower().strip() for v in row if v is not None and v != ""]
+            if "faculty name" in values or "name of the faculty" in values:
+                index = i
+                break
+    header = list(rows[index]) if index < len(rows) else []
+    while header and header[-1] in (None, ""):
+        header.pop()
+    columns = []
+    seen = {}
+    for n, v in enumerate(header):
+        name = str(v) if v is not None and v != "" else f"Unnamed: {n}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name.strip())
+    return index, columns
+
+
+def validate_workbook(stream):
+    """Check an uploaded workbook against SECTIONS without parsing it fully.
+
+    Opens the xlsx in openpyxl's streaming read-only mode and reads only the
+    first HEADER_SCAN_ROWS + 1 rows of each sheet. Returns a report listing,
+    per section, the header row found, the faculty-name column matched and
+    any missing columns (with close matches as suggestions).
+    """
+    import difflib
+    import openpyxl
+
+    started = time.perf_counter()
+    report = {"valid": True, "errors": 0, "warnings": 0, "sections": []}
+
+    def issue(entry, level, message):
+        entry["issues"].append({"level": level, "message": message})
+        report["errors" if level == "error" else "warnings"] += 1
+
+    try:
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        report.update(valid=False, errors=1, readable=False,
+                      message=f"Could not open the workbook as .xlsx: {e}")
+        report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return report
+
+    report["readable"] = True
+    try:
+        for section in SECTIONS:
+            entry = {"sheet": section["sheet"], "present": section["sheet"] in workbook.sheetnames, "issues": []}
+            report["sections"].append(entry)
+            if not entry["present"]:
+                issue(entry, "warning", f"Sheet '{section['sheet']}' is missing; this section will score 0.")
+                continue
+            worksheet = workbook[section["sheet"]]
+            rows = list(worksheet.iter_rows(max_row=HEADER_SCAN_ROWS + 1, values_only=True))
+            index, columns = locate_header(rows, section["find_header"])
+            entry["header_row"] = index + 1
+            entry["name_column"] = next((c for c in section["name_columns"] if c in columns), None)
+            if entry["name_column"] is None:
+                issue(entry, "error", f"No faculty name column (expected one of: {', '.join(section['name_columns'])}); "
+                                      "no rows from this sheet will be used.")
+            missing = [c for c in section["score_columns"] + section["columns"] if c not in columns]
+            entry["missing_columns"] = missing
+            entry["suggestions"] = {}
+            for column in missing:
+                close = difflib.get_close_matches(column, columns, n=2, cutoff=0.75)
+                if close:
+                    entry["suggestions"][column] = close
+                level = "error" if column in section["score_columns"] else "warning"
+                hint = f" (did you mean {' or '.join(repr(c) for c in close)}?)" if close else ""
+                issue(entry, level, f"Column '{column}' not found{hint}.")
+    finally:
+        workbook.close()
+
+    report["valid"] = report["errors"] == 0
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+
+############### Workbook readers ###############
+# processing() reads each section through one of these. Both return the
+# faculty's rows of a sheet as the DataFrame pd.read_excel + ffill + filter
+# would give; they differ only in how much of the workbook they hold.
+SECTION_BY_SHEET = {section["sheet"]: section for section in SECTIONS}
+PARTITION_FLUSH_ROWS = 5000
+
+
+def select_faculty_rows(df, section, staffname):
+    """Filter a section's sheet to the faculty's rows.
+
+    Forward-fills the faculty-name column (merged cells leave it blank
+    below the first row) and applies the section's "match" and "where"
+    rules. Returns (rows, name column); (empty, None) without a name column.
+    """
+    name_col = next((c for c in section["name_columns"] if c in df.columns), None)
+    if name_col is None:
+        return pd.DataFrame(), None
+    df[name_col] = df[name_col].ffill()
+    names = df[name_col].astype(str).str.strip()
+    if section.get("match") == "exact":
+        mask = names == staffname
+    else:
+        mask = names.str.lower() == staffname.lower()
+    for column, value in section.get("where", {}).items():
+        mask &= df[column].fillna("").astype(str).str.strip().str.lower() == value
+    return df[mask], name_col
+
+
+def read_section(workbook, sheet, staffname):
+    """Return (rows, name column) for one sheet, or (empty, None) on error."""
+    try:
+        return workbook.faculty_rows(SECTION_BY_SHEET[sheet], staffname)
+    except Exception as e:
+        print(f"Error reading {sheet}:", e)
+        return pd.DataFrame(), None
+
+
+class PandasWorkbook:
+    """Parses each sheet in full with pd.read_excel from one open ExcelFile."""
+
+    mode = "pandas"
+
+    def __init__(self, source):
+        self.book = pd.ExcelFile(source)
+        self.sheet_names = self.book.sheet_names
+
+    def faculty_rows(self, section, staffname):
+        skiprows = 0
+        if section["find_header"]:
+            header = find_header_row(self.book, section["sheet"])
+            skiprows = header + 1 if header is not None else 0
+        df = pd.read_excel(self.book, sheet_name=section["sheet"], skiprows=skiprows)
+        df.columns = df.columns.str.strip()
+        return select_faculty_rows(df, section, staffname)
+
+    def close(self):
+        self.book.close()
+
+
+def _cell_value(cell):
+    """Convert an openpyxl cell the way pandas' openpyxl reader does."""
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+# The strings pd.read_excel() reads as NaN by default (its documented
+# na_values list); tests/test_parallel_reader.py checks them against pandas.
+NA_STRINGS = frozenset({
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+})
+
+
+def _is_missing(value):
+    """True for values pandas' parser reads as NaN."""
+    if isinstance(value, str):
+        return value in NA_STRINGS
+    return isinstance(value, float) and value != value
+
+
+def _value_kind(value):
+    """The parser-relevant kind of a raw cell value (see _SheetScan)."""
+    if _is_missing(value):
+        return "na"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return ("int", value < 0, value >= 2 ** 63)
+    if isinstance(value, str):
+        for kind, convert in (("str-int", int), ("str-float", float)):
+            try:
+                convert(value)
+                return kind
+            except ValueError:
+                pass
+        return "str-bool" if value.strip().lower() in ("true", "false") else "str"
+    return type(value).__name__
+
+
+def _name_key(value):
+    return str(value).strip().lower()
+
+
+class _SheetScan:
+    """One streaming pass over a sheet's rows.
+
+    Yields (position, name key, row) for each data row below the header,
+    with the faculty-name cell forward-filled. Blank rows are held back
+    until a later non-blank row shows they are not trailing (pandas drops
+    trailing blank rows). Along the way it records the sheet's width and,
+    per column, one sample value of every kind seen ("witnesses"): parsing
+    the kept rows together with the witnesses gives every column the dtype
+    it would have had if the whole sheet had been parsed.
+    """
+
+    def __init__(self, worksheet, section):
+        self.worksheet = worksheet
+        self.section = section
+        self.width = 0
+        self.witnesses = []
+        self.shortest = None
+        self.header = None
+        self.name_index = None
+
+    def _observe(self, row):
+        while len(self.witnesses) < len(row):
+            self.witnesses.append({})
+        for samples, value in zip(self.witnesses, row):
+            samples.setdefault(_value_kind(value), value)
+
+    def _rows(self):
+        self.worksheet.reset_dimensions()
+        for row in self.worksheet.rows:
+            row = [_cell_value(cell) for cell in row]
+            while row and row[-1] == "":
+                row.pop()
+            self.width = max(self.width, len(row))
+            yield row
+
+    def __iter__(self):
+        rows = self._rows()
+        head = []
+        for row in rows:
+            head.append(row)
+            if len(head) > HEADER_SCAN_ROWS:
+                break
+        index, columns = locate_header(head, self.section["find_header"])
+        if index >= len(head):
+            return
+        self.header = head[index]
+        self.name_index = next((columns.index(c) for c in self.section["name_columns"] if c in columns), None)
+
+        def data_rows():
+            yield from head[index + 1:]
+            yield from rows
+
+        last_name = np.nan
+        blank = []
+        for position, row in enumerate(data_rows()):
+            self._observe(row)
+            length = len(row)
+            if self.name_index is not None:
+                value = row[self.name_index] if self.name_index < length else ""
+                if not _is_missing(value):
+                    last_name = value
+                elif not _is_missing(last_name):
+                    row = row + [""] * (self.name_index + 1 - length)
+                    row[self.name_index] = last_name
+            key = None if _is_missing(last_name) else _name_key(last_name)
+            if length == 0:
+                blank.append((position, key, row))
+                continue
+            # Rows are padded to the sheet width, so a short row puts a
+            # missing value in every column past its end.
+            shortest = 0 if blank else length
+            self.shortest = shortest if self.shortest is None else min(self.shortest, shortest)
+            yield from blank
+            blank = []
+            yield position, key, row
+
+    def frame(self, kept):
+        """Parse [(position, row)] into the DataFrame pd.read_excel would give."""
+        # TextParser is the parser pd.read_excel runs on a sheet's rows. It is
+        # not public API, so the requirements pin the pandas versions it is
+        # tested with (tests/test_parallel_reader.py).
+        from pandas.io.parsers import TextParser
+
+        width = self.width
+        while len(self.witnesses) < width:
+            self.witnesses.append({})
+        for samples in self.witnesses[self.shortest if self.shortest is not None else width:]:
+            samples.setdefault("na", "")
+        depth = max((len(samples) for samples in self.witnesses), default=0)
+        witness_rows = []
+        for k in range(depth):
+            witness_rows.append([
+                list(samples.values())[min(k, len(samples) - 1)] if samples else ""
+                for samples in self.witnesses
+            ])
+        data = [self.header] + [row for _, row in kept] + witness_rows
+        data = [row + [""] * (width - len(row)) for row in data]
+        df = TextParser(data, header=0, skip_blank_lines=False).read()
+        df = df.iloc[:len(kept)].copy()
+        if isinstance(df.index, pd.RangeIndex):
+            df.index = [position for position, _ in kept]
+        df.columns = df.columns.str.strip()
+        return df
+
+
+class StreamingWorkbook:
+    """Reads sheets row by row with openpyxl's read-only parser.
+
+    Only the requested faculty's rows are kept, so memory is bounded by the
+    output rather than the workbook. partition() instead spills every
+    faculty's rows to disk in one pass per sheet for batch runs.
+    """
+
+    mode = "streaming"
+
+    def __init__(self, source):
+        import openpyxl
+
+        self.book = openpyxl.load_workbook(source, read_only=True, data_only=True, keep_links=False)
+        self.sheet_names = self.book.sheetnames
+
+    def faculty_rows(self, section, staffname):
+        scan = _SheetScan(self.book[section["sheet"]], section)
+        wanted = _name_key(staffname)
+        kept = []
+        for position, key, row in scan:
+            # Rows with a non-text name are kept too; the exact comparison
+            # happens on the parsed frame in select_faculty_rows().
+            if key == wanted or (key is not None and not isinstance(row[scan.name_index], str)):
+                kept.append((position, row))
+        if scan.header is None:
+            return pd.DataFrame(), None
+        return select_faculty_rows(scan.frame(kept), section, staffname)
+
+    def partition(self, directory):
+        """Spill each section's rows to per-faculty files under `directory`."""
+        import pickle
+
+        os.makedirs(directory, exist_ok=True)
+        for number, section in enumerate(SECTIONS):
+            if section["sheet"] not in self.sheet_names:
+                continue
+            sheet_dir = os.path.join(directory, str(number))
+            os.makedirs(sheet_dir, exist_ok=True)
+            scan = _SheetScan(self.book[section["sheet"]], section)
+            buffers, buffered = {}, 0
+
+            def flush():
+                for key, rows in buffers.items():
+                    with open(os.path.join(sheet_dir, hashlib.sha1(key.encode()).hexdigest() + ".pkl"), "ab") as f:
+                        pickle.dump(rows, f)
+                buffers.clear()
+
+            for position, key, row in scan:
+                if key is None:
+                    continue
+                buffers.setdefault(key, []).append((position, row))
+                buffered += 1
+                if buffered >= PARTITION_FLUSH_ROWS:
+                    flush()
+                    buffered = 0
+            flush()
+            # The scan state (header, width, witnesses) is all that is needed
+            # to parse a partition later; drop the worksheet handle.
+            scan.worksheet = None
+            with open(os.path.join(sheet_dir, "sheet.pkl"), "wb") as f:
+                pickle.dump(scan, f)
+        with open(os.path.join(directory, "sheets.json"), "w") as f:
+            json.dump(self.sheet_names, f)
+        return PartitionedWorkbook(directory)
+
+    def close(self):
+        self.book.close()
+
+
+class PartitionedWorkbook:
+    """Serves faculty rows from a StreamingWorkbook.partition() directory."""
+
+    mode = "partitioned"
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "sheets.json")) as f:
+            self.sheet_names = json.load(f)
+
+    def faculty_rows(self, section, staffname):
+        import pickle
+
+        sheet_dir = os.path.join(self.directory, str(SECTIONS.index(section)))
+        with open(os.path.join(sheet_dir, "sheet.pkl"), "rb") as f:
+            scan = pickle.load(f)
+        if scan.header is None:
+            return pd.DataFrame(), None
+        kept = []
+        path = os.path.join(sheet_dir, hashlib.sha1(_name_key(staffname).encode()).hexdigest() + ".pkl")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                while True:
+                    try:
+                        kept.extend(pickle.load(f))
+                    except EOFError:
+                        break
+        return select_faculty_rows(scan.frame(kept), section, staffname)
+
+    def close(self):
+        pass
+
+
+SS_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+_archive_cache = {}
+
+
+def extract_pool():
+    """The process pool the parallel reader extracts sheets in (started on first use)."""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn, not fork: the server process runs threads
+            _extract_pool = ProcessPoolExecutor(max_workers=app.config["EXTRACT_WORKERS"],
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _extract_pool
+
+
+def _ss(tag):
+    return f"{{{SS_NS}}}{tag}"
+
+
+def read_sheet_names(archive):
+    """Sheet names of an xlsx in workbook order, without loading the workbook."""
+    return [sheet.get("name") for sheet in etree.fromstring(archive.read("xl/workbook.xml")).iter(_ss("sheet"))]
+
+
+def read_archive_index(archive):
+    """Return sheet name -> part path, shared strings, styles and epoch of an xlsx."""
+    from openpyxl.reader.strings import read_string_table
+    from openpyxl.styles.stylesheet import Stylesheet
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+
+    def part(target):
+        return target.lstrip("/") if target.startswith("/") else "xl/" + target
+
+    rels = {}
+    for rel in etree.fromstring(archive.read("xl/_rels/workbook.xml.rels")).iter(f"{{{PKG_REL_NS}}}Relationship"):
+        rels[rel.get("Id")] = (rel.get("Type").rsplit("/", 1)[-1], part(rel.get("Target")))
+    workbook = etree.fromstring(archive.read("xl/workbook.xml"))
+    sheets = {}
+    for sheet in workbook.iter(_ss("sheet")):
+        kind, path = rels[sheet.get(f"{{{REL_NS}}}id")]
+        if kind == "worksheet":
+            sheets[sheet.get("name")] = path
+    props = workbook.find(_ss("workbookPr"))
+    date1904 = props is not None and props.get("date1904") in ("1", "true")
+
+    by_kind = {kind: path for kind, path in rels.values()}
+    strings = []
+    if "sharedStrings" in by_kind:
+        with archive.open(by_kind["sharedStrings"]) as src:
+            strings = read_string_table(src)
+    date_formats, timedelta_formats = set(), set()
+    if "styles" in by_kind:
+        stylesheet = Stylesheet.from_tree(etree.fromstring(archive.read(by_kind["styles"])))
+        date_formats, timedelta_formats = stylesheet.date_formats, stylesheet.timedelta_formats
+    return {
+        "sheets": sheets,
+        "strings": strings,
+        "date_formats": date_formats,
+        "timedelta_formats": timedelta_formats,
+        "epoch": CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900,
+    }
+
+
+def iter_sheet_rows(archive, path, index):
+    """Yield a worksheet part's rows as pandas' openpyxl reader sees them.
+
+    Missing rows and cells become "", error cells NaN, whole numbers int and
+    numbers in a date or duration style datetime/timedelta; trailing ""
+    cells are trimmed.
+    """
+    from openpyxl.cell.text import Text
+    from openpyxl.utils.cell import coordinate_to_tuple
+    from openpyxl.utils.datetime import from_excel, from_ISO8601
+
+    strings, epoch = index["strings"], index["epoch"]
+    date_formats, timedelta_formats = index["date_formats"], index["timedelta_formats"]
+    row_number = 0
+    with archive.open(path) as src:
+        for _, element in etree.iterparse(src, tag=_ss("row")):
+            number = int(element.get("r", row_number + 1))
+            while row_number < number - 1:
+                row_number += 1
+                yield []
+            row_number = number
+            row = []
+            for c in element.iterchildren(_ss("c")):
+                ref = c.get("r")
+                column = coordinate_to_tuple(ref)[1] if ref else len(row) + 1
+                row.extend([""] * (column - 1 - len(row)))
+                kind = c.get("t", "n")
+                if kind == "inlineStr":
+                    child = c.find(_ss("is"))
+                    value = Text.from_tree(child).content if child is not None else None
+                else:
+                    value = c.findtext(_ss("v")) or None
+                if value is None:
+                    value = ""
+                elif kind == "n":
+                    value = float(value) if "." in value or "E" in value.upper() else int(value)
+                    style = int(c.get("s") or 0)
+                    if style in date_formats:
+                        try:
+                            value = from_excel(value, epoch, timedelta=style in timedelta_formats)
+                        except (OverflowError, ValueError):
+                            value = np.nan
+                    elif int(value) == value:
+                        value = int(value)
+                elif kind == "s":
+                    value = strings[int(value)]
+                elif kind == "b":
+                    value = bool(int(value))
+                elif kind == "d":
+                    value = from_ISO8601(value)
+                elif kind == "e":
+                    value = np.nan
+                row[column - 1:column] = [value]
+            while row and row[-1] == "":
+                row.pop()
+            element.clear()
+            yield row
+
+
+def extract_sheet(path, section):
+    """Worker task: parse one section's sheet of the xlsx at `path` into a DataFrame.
+
+    The archive index (shared strings, styles) is read once per worker
+    process and reused for the other sheets of the same file.
+    """
+    stamp = (path, os.path.getmtime(path))
+    with zipfile.ZipFile(path) as archive:
+        if stamp not in _archive_cache:
+            _archive_cache.clear()
+            _archive_cache[stamp] = read_archive_index(archive)
+        index = _archive_cache[stamp]
+        data = list(iter_sheet_rows(archive, index["sheets"][section["sheet"]], index))
+    from pandas.errors import EmptyDataError
+    from pandas.io.parsers import TextParser  # as in _SheetScan.frame()
+
+    while data and not data[-1]:
+        data.pop()
+    if not data:
+        return pd.DataFrame()
+    width = max(len(row) for row in data)
+    data = [row + [""] * (width - len(row)) for row in data]
+    header, _ = locate_header(data[:HEADER_SCAN_ROWS + 1], section["find_header"])
+    try:
+        df = TextParser(data, header=0, skiprows=header, skip_blank_lines=False).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+    df.columns = df.columns.str.strip()
+    return df
+
+
+class ParallelWorkbook:
+    """Extracts every section sheet concurrently, one worker process per sheet.
+
+    Workers read the xlsx archive directly: shared strings and styles once,
+    then only their own worksheet part, parsed with lxml. Sheets are
+    submitted when the workbook is opened, so later sections are usually
+    ready by the time processing() asks for them.
+    """
+
+    mode = "parallel"
+
+    def __init__(self, source):
+        self.copy = None
+        if not isinstance(source, (str, os.PathLike)):
+            # Workers open the file by path; spill in-memory uploads.
+            directory = request_upload_dir() if has_request_context() else None
+            with tempfile.NamedTemporaryFile(suffix=".xlsx", dir=directory, delete=False) as f:
+                source.seek(0)
+                shutil.copyfileobj(source, f)
+            source = self.copy = f.name
+        with zipfile.ZipFile(source) as archive:
+            self.sheet_names = read_sheet_names(archive)
+        pool = extract_pool()
+        self.futures = {
+            section["sheet"]: pool.submit(extract_sheet, os.fspath(source), section)
+            for section in SECTIONS if section["sheet"] in self.sheet_names
+        }
+
+    def faculty_rows(self, section, staffname):
+        return select_faculty_rows(self.futures[section["sheet"]].result(), section, staffname)
+
+    def close(self):
+        from concurrent.futures import wait
+
+        for future in self.futures.values():
+            future.cancel()
+        wait(self.futures.values())
+        if self.copy is not None:
+            os.remove(self.copy)
+
+
+def open_workbook(source, mode=None):
+    """Open an uploaded workbook with the reader WORKBOOK_READER selects.
+
+    "auto" parses small workbooks with pandas, extracts those larger than
+    PARALLEL_READER_THRESHOLD_BYTES in parallel and streams those larger
+    than STREAMING_READER_THRESHOLD_BYTES. A registered term workbook is
+    served from its partitions.
+    """
+    if isinstance(source, TermWorkbook):
+        return source.open()
+    mode = mode or app.config["WORKBOOK_READER"]
+    if mode == "auto":
+        if isinstance(source, (str, os.PathLike)):
+            size = os.path.getsize(source)
+        else:
+            source.seek(0, os.SEEK_END)
+            size = source.tell()
+            source.seek(0)
+        if size > app.config["STREAMING_READER_THRESHOLD_BYTES"]:
+            mode = "streaming"
+        elif size > app.config["PARALLEL_READER_THRESHOLD_BYTES"]:
+            mode = "parallel"
+        else:
+            mode = "pandas"
+    if mode == "streaming":
+        return StreamingWorkbook(source)
+    if mode == "parallel":
+        return ParallelWorkbook(source)
+    if mode == "pandas":
+        return PandasWorkbook(source)
+    raise ValueError(f"Unknown workbook reader: {mode}")
+
+
+############### Term workbooks ###############
+# A department's term workbook can be registered once and referenced by id
+# from /upload. Each version is validated, fingerprinted and partitioned by
+# faculty (StreamingWorkbook.partition) when it is registered, so uploads
+# that reference it skip the upload, validation and sheet parsing. Versions
+# live in the store under <WORKBOOK_DIR>/<id>/<version>/ and become current
+# when <id>/current.json is replaced, which is atomic on every backend;
+# earlier versions are kept for uploads pinned to them. Partitions are a
+# local cache: a replica that did not register a version builds them the
+# first time it uses it.
+WORKBOOK_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+class TermWorkbook:
+    """One registered version of a term workbook."""
+
+    def __init__(self, meta):
+        self.id = meta["id"]
+        self.version = meta["version"]
+        self.sha256 = meta["sha256"]
+        self.fingerprints = meta["fingerprints"]
+        self.validation = meta["validation"]
+        self.meta = meta
+
+    @property
+    def key(self):
+        return f"{app.config['WORKBOOK_DIR']}/{self.id}/{self.version}"
+
+    @property
+    def directory(self):
+        """This replica's directory for the version's partitions."""
+        return os.path.join(app.config["WORKBOOK_DIR"], self.id, str(self.version))
+
+    def partitions(self, source=None):
+        """The local partitions directory, built from `source` (or the stored
+        workbook) when this replica has none yet."""
+        partitions = os.path.join(self.directory, "partitions")
+        if os.path.isdir(partitions):
+            return partitions
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{partitions}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fetched = None
+        try:
+            if source is None:
+                source = store.local_path(f"{self.key}/workbook.xlsx")
+            if source is None:
+                source = fetched = f"{tmp}.xlsx"
+                if not store.get_file(f"{self.key}/workbook.xlsx", fetched):
+                    raise FileNotFoundError(f"Term workbook {self.id} version {self.version} is gone")
+            reader = StreamingWorkbook(source)
+            try:
+                reader.partition(tmp)
+            finally:
+                reader.close()
+            try:
+                os.rename(tmp, partitions)
+            except OSError:
+                pass  # built meanwhile by another thread or worker
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if fetched and os.path.exists(fetched):
+                os.remove(fetched)
+        return partitions
+
+    def open(self):
+        return PartitionedWorkbook(self.partitions())
+
+
+class TermWorkbooks:
+    """Registered term workbooks in the store: <id>/<version>/ holding the
+    workbook and meta.json, and <id>/current.json naming the version uploads
+    get by default."""
+
+    @property
+    def root(self):
+        return app.config["WORKBOOK_DIR"]
+
+    def _read(self, key):
+        data = store.get(key)
+        try:
+            return json.loads(data) if data is not None else None
+        except ValueError:
+            return None
+
+    def current_version(self, workbook_id):
+        if not self.root or not WORKBOOK_ID.match(workbook_id or ""):
+            return None
+        current = self._read(f"{self.root}/{workbook_id}/current.json")
+        return current["version"] if current else None
+
+    def get(self, workbook_id, version=None):
+        """The registered workbook (its current version unless `version` is
+        given), or None."""
+        if version is None:
+            version = self.current_version(workbook_id)
+        if version is None or not WORKBOOK_ID.match(workbook_id or ""):
+            return None
+        meta = self._read(f"{self.root}/{workbook_id}/{int(version)}/meta.json")
+        return TermWorkbook(meta) if meta else None
+
+    def versions(self, workbook_id):
+        """Metadata of every stored version, oldest first."""
+        found = []
+        for key, _, _ in store.list(f"{self.root}/{workbook_id}"):
+            parts = key[len(self.root) + 1:].split("/")
+            if len(parts) == 3 and parts[1].isdigit() and parts[2] == "meta.json":
+                meta = self._read(key)
+                if meta:
+                    found.append(meta)
+        return sorted(found, key=lambda m: m["version"])
+
+    def ids(self):
+        if not self.root:
+            return []
+        return sorted({key[len(self.root) + 1:].split("/")[0] for key, _, _ in store.list(self.root)
+                       if key.endswith("/current.json") and key.count("/") == self.root.count("/") + 2})
+
+    def register(self, workbook_id, stream, filename):
+        """Validate, fingerprint and partition `stream` as the next version of
+        `workbook_id` and make it current. Returns (TermWorkbook, validation);
+        the workbook is None when the file is not a readable xlsx."""
+        validation = validate_workbook(stream)
+        if not validation["readable"]:
+            return None, validation
+        stream.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False,
+                                         dir=request_upload_dir() if has_request_context() else None) as f:
+            shutil.copyfileobj(stream, f)
+        try:
+            meta = {
+                "id": workbook_id,
+                "filename": filename,
+                "size": os.path.getsize(f.name),
+                "sha256": stream_sha256(stream),
+                "fingerprints": workbook_fingerprints(f.name) or {},
+                "validation": validation,
+                "registered": datetime.now().isoformat(),
+            }
+            # Other replicas may register versions of the same id; numbering
+            # and switching current.json happen under one store lock.
+            with store.lock(f"workbook-{workbook_id}") as lease:
+                meta["version"] = max((m["version"] for m in self.versions(workbook_id)), default=0) + 1
+                term = TermWorkbook(meta)
+                store.put_file(f"{term.key}/workbook.xlsx", f.name)
+                term.partitions(f.name)
+                # meta.json last: a version without it is not registered yet
+                lease.check()
+                store.put(f"{term.key}/meta.json", json.dumps(meta).encode("utf-8"))
+                store.put(f"{self.root}/{workbook_id}/current.json",
+                          json.dumps({"version": term.version}).encode("utf-8"))
+        finally:
+            os.remove(f.name)
+        print(f"Registered term workbook {workbook_id} version {term.version}")
+        return term, validation
+
+    def delete(self, workbook_id):
+        # current.json goes first so no new upload picks the workbook up
+        store.delete(f"{self.root}/{workbook_id}/current.json")
+        store.delete_prefix(f"{self.root}/{workbook_id}")
+        shutil.rmtree(os.path.join(self.root, workbook_id), ignore_errors=True)
+
+
+term_workbooks = TermWorkbooks()
+
+
+def resolve_term_workbook(workbook_id, version=None):
+    """(TermWorkbook, None) for an upload's workbook_id and optional
+    workbook_version, or (None, error message)."""
+    if version not in (None, ""):
+        if not str(version).isdigit():
+            return None, "workbook_version must be a number."
+        term = term_workbooks.get(workbook_id, int(version))
+    else:
+        term = term_workbooks.get(workbook_id)
+    if term is None:
+        return None, f"Term workbook {workbook_id} not found."
+    return term, None
+
+
+def describe_workbook(term):
+    """The listing fields of a registered workbook version."""
+    described = {k: term.meta[k] for k in ("id", "version", "filename", "size", "sha256", "registered")}
+    described.update({k: term.validation[k] for k in ("valid", "errors", "warnings")})
+    return described
+
+
+@app.route("/workbooks", methods=["GET"])
+def list_workbooks():
+    return jsonify([describe_workbook(term) for term in map(term_workbooks.get, term_workbooks.ids()) if term])
+
+
+@app.route("/workbooks", methods=["POST"])
+@app.route("/workbooks/<workbook_id>", methods=["PUT"])
+@upload_queue
+def register_workbook(workbook_id=None):
+    """Register a term workbook (POST, optional `workbook_id` form field) or
+    upload a corrected version of an existing one (PUT)."""
+    if not app.config["WORKBOOK_DIR"]:
+        return jsonify({"error": "Term workbooks are turned off (WORKBOOK_DIR is empty)."}), 404
+    excel_file = request.files.get("excel_file")
+    if not excel_file:
+        return jsonify({"error": "Excel file is required."}), 400
+    if request.method == "PUT":
+        if term_workbooks.current_version(workbook_id) is None:
+            return jsonify({"error": "Term workbook not found."}), 404
+    else:
+        workbook_id = request.form.get("workbook_id") or uuid.uuid4().hex[:12]
+        if not WORKBOOK_ID.match(workbook_id):
+            return jsonify({"error": "workbook_id may only contain letters, digits, '.', '_' and '-'."}), 400
+        if term_workbooks.current_version(workbook_id) is not None:
+            return jsonify({"error": f"Term workbook {workbook_id} already exists; PUT a new version instead."}), 409
+    term, validation = term_workbooks.register(workbook_id, uploaded_stream(excel_file),
+                                               secure_filename(excel_file.filename or "") or "workbook.xlsx")
+    if term is None:
+        return jsonify({"success": False, "error": validation["message"], "validation": validation}), 400
+    return jsonify({"success": True, **describe_workbook(term), "validation": validation}), \
+        201 if request.method == "POST" else 200
+
+
+@app.route("/workbooks/<workbook_id>", methods=["GET"])
+def workbook_versions(workbook_id):
+    term = term_workbooks.get(workbook_id)
+    if term is None:
+        return jsonify({"error": "Term workbook not found."}), 404
+    return jsonify({"id": workbook_id, "current": term.version,
+                    "versions": [describe_workbook(TermWorkbook(meta))
+                                 for meta in term_workbooks.versions(workbook_id)]})
+
+
+@app.route("/workbooks/<workbook_id>", methods=["DELETE"])
+def delete_workbook(workbook_id):
+    if term_workbooks.current_version(workbook_id) is None:
+        return jsonify({"error": "Term workbook not found."}), 404
+    term_workbooks.delete(workbook_id)
+    return jsonify({"success": True}), 200
+
+
+############### Section facts, scoring and filling ###############
+# processing() handles each section in three steps: extract the faculty's
+# rows as JSON-able facts, score them, and fill the template tables from
+# them. Facts and filled tables are cached per faculty (see SECTION_CACHE_DIR)
+# so a re-upload only redoes the sections whose sheets changed.
+SECTION_CACHE_VERSION = 1
+SHARED_STRING_REF = re.compile(rb'<(?:\w+:)?c\b[^>]*\bt="s"[^>]*>\s*<(?:\w+:)?v>(\d+)</')
+
+
+def cell_fact(value):
+    """A DataFrame cell as a JSON value that prints (str()) the same way."""
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if value != value else float(value)
+    if isinstance(value, str):
+        return value
+    return str(value)
+
+
+def section_facts(df):
+    """The filtered rows of a section as a list of {column: fact} dicts."""
+    return [{str(column): cell_fact(value) for column, value in row.items()} for _, row in df.iterrows()]
+
+
+def fact_text(row, column, default="-"):
+    """Cell text for a fact; missing values print as "nan" as they always have."""
+    if column not in row:
+        return default
+    value = row[column]
+    return "nan" if value is None else str(value)
+
+
+# Scoring takes the facts and `placed`, one flag per row: whether the
+# template took the row. Rows the template had no room for have never
+# scored, so scores stay what they were before filling and scoring split.
+# Points and caps come from `rules` (SCORING_RULES unless rescoring with
+# overrides).
+SCORING_RULES = {
+    "journal_points": 2,                # per journal
+    "journal_impact_points": [3, 2, 1],  # impact factor > 3, > 1.5, >= 1
+    "journal_cap": None,                # most points for the journal section
+    "book_points": 1,
+    "international_conference_points": 2,
+    "conference_points": 1,
+    "grant_points": 2,                  # per grant_unit applied for in total
+    "grant_unit": 1000000,
+    "seminar_unit": 50000,              # one point per unit per seminar grant
+    "patent_points": 5,                 # per published patent
+    "workshop_cap": 3,                  # workshops attended that count
+    "internship_points": 3,
+    "mooc_points": 2,
+    "mooc_cap": 2,                      # courses that count
+    "mou_points": 1,
+    "workshop_conducted_points": 0.5,
+    "guest_lecture_points": 1,
+    "project_points": 1,                # once, for any project guided
+}
+
+# Weights of the academics, research, self-development, mentorship and HOD
+# scores in the weighted total, by designation (other designations get 0)
+DESIGNATION_WEIGHTS = {
+    "Professor": [0.1, 0.4, 0.2, 0.2, 0.1],
+    "Associate Professor": [0.2, 0.4, 0.15, 0.15, 0.1],
+    "Assistant Professor": [0.3, 0.3, 0.15, 0.15, 0.1],
+}
+
+
+def score_journals(rows, placed, rules=SCORING_RULES):
+    n = 0
+    counters = {}
+    high, mid, low = rules["journal_impact_points"]
+    for row, ok in zip(rows, placed):
+        if not ok:
+            continue
+        impact = row.get("Impact Factor", "-")
+        try:
+            if pd.notna(impact) and impact != "-":
+                if float(impact) > 3:
+                    n += high
+                    counters["r2_1"] = counters.get("r2_1", 0) + high
+                elif 1.5 < float(impact) <= 3:
+                    n += mid
+                    counters["r3_1"] = counters.get("r3_1", 0) + mid
+                elif 1 <= float(impact) <= 1.5:
+                    n += low
+                    counters["r4_1"] = counters.get("r4_1", 0) + low
+        except Exception:
+            pass
+        # base points per journal entry
+        n += rules["journal_points"]
+    if rules["journal_cap"] is not None:
+        n = min(n, rules["journal_cap"])
+    return {"journals": n}, counters
+
+
+def score_books(rows, placed, rules=SCORING_RULES):
+    return {"books": rules["book_points"] * sum(placed)}, {}
+
+
+def score_conferences(rows, placed, rules=SCORING_RULES):
+    n = 0
+    counters = {}
+    for row, ok in zip(rows, placed):
+        if not ok:
+            continue
+        if fact_text(row, "Conference Type", "").strip().lower() == "international":
+            n += rules["international_conference_points"]
+            counters["r8_1"] = counters.get("r8_1", 0) + rules["international_conference_points"]
+        else:
+            n += rules["conference_points"]
+            counters["r9_1"] = counters.get("r9_1", 0) + rules["conference_points"]
+    return {"conferences": n}, counters
+
+
+def score_grants(rows, placed, rules=SCORING_RULES):
+    """Applied grants score 2 points per 10 lakh in total; other grants
+    (seminars) 1 point per 50,000 each."""
+    counters = {}
+    total_amt = 0
+    seminars = 0
+    for row, ok in zip(rows, placed):
+        if not ok:
+            continue
+        amount = row.get("Amount", 0)
+        if fact_text(row, "Coordinator").strip().lower() == "applied":
+            if pd.notna(amount) and amount != "-" and safe_float(amount) > 0:
+                total_amt += safe_float(amount)
+        else:
+            amt = safe_float(amount)
+            if amt > rules["seminar_unit"]:
+                inc = int(amt // rules["seminar_unit"])
+                seminars += inc
+                counters["r11_1"] = counters.get("r11_1", 0) + inc
+    grants = 0
+    if total_amt > rules["grant_unit"]:
+        grants = int(total_amt // rules["grant_unit"]) * rules["grant_points"]
+        counters["r10_1"] = grants
+    return {"grants": grants, "seminars": seminars}, counters
+
+
+def score_patents(rows, placed, rules=SCORING_RULES):
+    published = sum(1 for row, ok in zip(rows, placed)
+                    if ok and fact_text(row, "Status", "").strip().lower() == "published")
+    points = rules["patent_points"] * published
+    return {"patents": points}, {"r12_1": points} if published else {}
+
+
+def score_workshop(rows, placed, rules=SCORING_RULES):
+    # at most 3 workshops attended count
+    attended = sum(1 for row, ok in zip(rows, placed)
+                   if ok and fact_text(row, "Role", "").strip().lower() == "attended")
+    counted = min(attended, rules["workshop_cap"])
+    return {"workshop": counted}, {"p1_1": counted} if attended else {}
+
+
+def score_internship(rows, placed, rules=SCORING_RULES):
+    points = rules["internship_points"] * sum(placed)
+    return {"internship": points}, {"p2_1": points}
+
+
+def score_mooc(rows, placed, rules=SCORING_RULES):
+    # at most 2 courses count
+    points = rules["mooc_points"] * min(sum(placed), rules["mooc_cap"])
+    return {"mooc": points}, {"p3_1": points}
+
+
+def score_mou(rows, placed, rules=SCORING_RULES):
+    points = rules["mou_points"] * sum(placed)
+    return {"mou": points}, {"p4_1": points}
+
+
+def score_workshops_conducted(rows, placed, rules=SCORING_RULES):
+    n = 0
+    for ok in placed:
+        if ok:
+            n += rules["workshop_conducted_points"]
+    return {"workshops": n}, {"p6_1": n}
+
+
+def score_guest_lectures(rows, placed, rules=SCORING_RULES):
+    points = rules["guest_lecture_points"] * sum(placed)
+    return {"guest_lectures": points}, {"p7_1": points}
+
+
+def score_projects(rows, placed, rules=SCORING_RULES):
+    n = rules["project_points"] if any(placed) else 0
+    return {"projects": n}, {"s1_1": n}
+
+
+def weighted_scores(scores, designation, weights=DESIGNATION_WEIGHTS):
+    """Designation-weighted academics, research, self-development,
+    mentorship and HOD scores, and their total."""
+    score = [scores["academics"], scores["research"], scores["selfm"], scores["mentor"], scores["hod"]]
+    factors = weights.get(designation)
+    weighted = [value * (factors[i] if factors else 0) for i, value in enumerate(score)]
+    tot = 0
+    for value in weighted:
+        tot += value
+    return weighted, tot
+
+
+def blank_counters():
+    """The r*_1, p*_1 and s*_1 counters of the corrective action report, all 0."""
+    return {**{f"r{i}_1": 0 for i in range(1, 14)},
+            **{f"p{i}_1": 0 for i in range(1, 8)},
+            **{f"s{i}_1": 0 for i in range(1, 6)}}
+
+
+def rescore(stored, designation=None, rules=None, weights=None):
+    """Scores, counters and weighted total of a stored appraisal recomputed
+    from its facts, optionally as another designation or with overridden
+    SCORING_RULES / DESIGNATION_WEIGHTS entries."""
+    rules = {**SCORING_RULES, **(rules or {})}
+    weights = {**DESIGNATION_WEIGHTS, **(weights or {})}
+    designation = designation or stored["detaillist"][1]
+    counters = blank_counters()
+    totals = {"research": 0, "selfm": 0, "mentor": 0}
+    parts = {}
+    for unit in SECTION_UNITS:
+        fact = stored["facts"].get(unit["sheet"])
+        if not fact:
+            continue
+        unit_parts, unit_counters = unit["score"](fact["rows"], fact["placed"], rules)
+        parts.update(unit_parts)
+        for points in unit_parts.values():
+            totals[unit["category"]] += points
+        for counter, value in unit_counters.items():
+            counters[counter] = counters.get(counter, 0) + value
+    scores = {"academics": stored["scores"]["academics"], **totals, "hod": stored["scores"]["hod"]}
+    weighted, total = weighted_scores(scores, designation, weights)
+    return {"designation": designation, "scores": scores, "parts": parts, "counters": counters,
+            "weighted": weighted, "weighted_total": total}
+
+
+def _table(doc, index):
+    return doc.tables[index] if index < len(doc.tables) else None
+
+
+def add_total_row(table, total):
+    """Append the right-aligned total row every section table ends with."""
+    try:
+        table.add_row()
+        last = table.rows[-1]
+        # merge first to second-last cells for label
+        try:
+            last.cells[0].merge(last.cells[-2])
+        except Exception:
+            pass
+        paragraph = last.cells[-2].paragraphs[0] if len(last.cells) >= 2 else last.cells[0].paragraphs[0]
+        paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
+        # put total score in last cell
+        last.cells[-1].text = str(total)
+    except Exception:
+        pass
+
+
+def write_row(table, i, texts, label=None):
+    """Write a serial number and `texts` into row i of a section table (below
+    its two header rows), growing it by a row when needed. Returns whether
+    the row was written."""
+    if (1 + i + 1) >= len(table.rows):
+        table.add_row()
+    try:
+        table.cell(1 + i + 1, 0).text = str(i + 1)
+        for j, text in enumerate(texts, start=1):
+            table.cell(1 + i + 1, j).text = text
+        return True
+    except Exception as e:
+        if label:
+            print(f"Error filling {label} row:", e)
+        return False
+
+
+def fill_journals(doc, rows, name_col):
+    table3 = _table(doc, 3)
+    if table3 is None:
+        return [False] * len(rows)
+    columns = ["Paper Title", "Journal Name", "Year of Publication", "ISSN", "Web Link", "Impact Factor"]
+    return [write_row(table3, i, [fact_text(row, c) for c in columns], "journal") for i, row in enumerate(rows)]
+
+
+def fill_books(doc, rows, name_col):
+    table4 = _table(doc, 4)
+    if table4 is None:
+        return [False] * len(rows)
+    columns = ["Book Title", "Publication Name", "Date of Publication", "ISBN", "Description"]
+    return [write_row(table4, i, [fact_text(row, c) for c in columns], "book") for i, row in enumerate(rows)]
+
+
+def fill_conferences(doc, rows, name_col):
+    # International conferences go to table 6, the rest to table 7; rows
+    # keep their position in the sheet order in either table. A row counts
+    # when its table exists, even if writing it failed.
+    table6 = _table(doc, 6)
+    table7 = _table(doc, 7)
+    placed = []
+    for i, row in enumerate(rows):
+        international = fact_text(row, "Conference Type", "").strip().lower() == "international"
+        table = table6 if international else table7
+        placed.append(table is not None)
+        if table is not None:
+            write_row(table, i, [fact_text(row, c) for c in ["Paper Title", "Organized By", "From Date", "Place", "Role"]],
+                      "conference")
+    return placed
+
+
+def fill_grants(doc, rows, name_col):
+    # Applied grants go to table 7 (after the conferences) and count even
+    # without it; the rest (seminars) go to table 9 and need it.
+    table7 = _table(doc, 7)
+    table9 = _table(doc, 9)
+    placed = []
+    for i, row in enumerate(rows):
+        applied = fact_text(row, "Coordinator").strip().lower() == "applied"
+        table = table7 if applied else table9
+        texts = [fact_text(row, "Coordinator"), fact_text(row, "Title"), fact_text(row, "Type"),
+                 fact_text(row, "Funding Agent"), fact_text(row, "Amount", "0" if applied else "-"),
+                 fact_text(row, "Applied On")]
+        if table is None:
+            placed.append(applied)
+        else:
+            placed.append(write_row(table, i, texts, "research grant" if applied else "seminar"))
+    return placed
+
+
+def fill_patents(doc, rows, name_col):
+    table10 = _table(doc, 10)
+    if table10 is None:
+        return [False] * len(rows)
+    placed = []
+    for i, row in enumerate(rows):
+        # the date goes under "filed" or "published" by status
+        status = fact_text(row, "Status", "").strip().lower()
+        date_value = fact_text(row, "Date")
+        texts = [fact_text(row, "Title"), date_value if status == "filed" else "-",
+                 date_value if status == "published" else "-", fact_text(row, "Status")]
+        placed.append(write_row(table10, i, texts, "patent"))
+    return placed
+
+
+def fill_workshop(doc, rows, name_col):
+    # Only attended workshops are listed; they count even if not written.
+    table13 = _table(doc, 14)
+    for i, row in enumerate(rows):
+        if table13 is not None and fact_text(row, "Role", "").strip().lower() == "attended":
+            write_row(table13, i, [fact_text(row, "Topic"),
+                                   f"{fact_text(row, 'From Date')} to {fact_text(row, 'To Date')}",
+                                   fact_text(row, "Description"), fact_text(row, "Venue")])
+    return [True] * len(rows)
+
+
+def _fill_simple(index, columns):
+    """A fill step writing `columns` for every row into table `index`; None
+    stands for the faculty-name column and a (from, to) pair is written as
+    "from to to" in one cell."""
+    def fill(doc, rows, name_col):
+        table = _table(doc, index)
+        if table is None:
+            return [False] * len(rows)
+        placed = []
+        for i, row in enumerate(rows):
+            texts = []
+            for column in columns:
+                if isinstance(column, tuple):
+                    texts.append(f"{fact_text(row, column[0])} to {fact_text(row, column[1])}")
+                else:
+                    texts.append(fact_text(row, name_col if column is None else column))
+            placed.append(write_row(table, i, texts))
+        return placed
+    return fill
+
+
+# The sections in the order processing() handles them: the sheet read,
+# the score category the points go to, the template tables filled, where
+# each part of the score is totalled (the first of the listed tables the
+# template has), and the fill and score steps. Sections sharing a table
+# are cached together.
+SECTION_UNITS = [
+    {"sheet": "Journal Publication", "category": "research", "tables": [3],
+     "totals": [((3,), "journals")], "fill": fill_journals, "score": score_journals},
+    {"sheet": "Book Publication", "category": "research", "tables": [4],
+     "totals": [((4,), "books")], "fill": fill_books, "score": score_books},
+    {"sheet": "Conferences", "category": "research", "tables": [6, 7],
+     "totals": [((6, 7), "conferences")], "fill": fill_conferences, "score": score_conferences},
+    {"sheet": "Research Grant", "category": "research", "tables": [7, 9],
+     "totals": [((7,), "grants"), ((9,), "seminars")], "fill": fill_grants, "score": score_grants},
+    {"sheet": "Patents", "category": "research", "tables": [10],
+     "totals": [((10,), "patents")], "fill": fill_patents, "score": score_patents},
+    {"sheet": "Workshop", "category": "selfm", "tables": [14],
+     "totals": [((14,), "workshop")], "fill": fill_workshop, "score": score_workshop},
+    {"sheet": "Faculty Internship", "category": "selfm", "tables": [15], "totals": [((15,), "internship")],
+     "fill": _fill_simple(15, ["FDP Name", ("From Date", "To Date"), "Description", "National or International"]),
+     "score": score_internship},
+    {"sheet": "MOOC Course", "category": "selfm", "tables": [16], "totals": [((16,), "mooc")],
+     "fill": _fill_simple(16, ["Coure Title", "Course Type", ("From Date", "To Date"), "Duration", "Awards"]),
+     "score": score_mooc},
+    {"sheet": "MoU", "category": "selfm", "tables": [17], "totals": [((17,), "mou")],
+     "fill": _fill_simple(17, [None, "Company Name", ("From Date", "To Date"), "Industry SPOC", "Duration"]),
+     "score": score_mou},
+    {"sheet": "Workshops", "category": "selfm", "tables": [19], "totals": [((19,), "workshops")],
+     "fill": _fill_simple(19, ["Topic", "Department", ("From Date", "To Date"), "No of Students", "Venue",
+                               "Description"]),
+     "score": score_workshops_conducted},
+    {"sheet": "Guest Lectures", "category": "selfm", "tables": [20], "totals": [((20,), "guest_lectures")],
+     "fill": _fill_simple(20, ["Chief Guest Name", "Address", "Topic Name", ("From Date", "To Date"),
+                               "Description", "Topic Delivered"]),
+     "score": score_guest_lectures},
+    {"sheet": "Project Guided or Mentoring", "category": "mentor", "tables": [22], "totals": [((22,), "projects")],
+     "fill": _fill_simple(22, ["Project Title", "Number of Students", "Title of Hackathon", "Organized By", "Date",
+                               "Status"]),
+     "score": score_projects},
+]
+
+
+def fill_totals(doc, unit, parts):
+    """Append the total rows of a unit's score parts to its tables."""
+    for indexes, part in unit["totals"]:
+        table = next((t for t in (_table(doc, i) for i in indexes) if t is not None), None)
+        if table is not None:
+            add_total_row(table, parts[part])
+
+
+def section_groups():
+    """SECTION_UNITS split into runs of units that share a template table."""
+    groups = []
+    for unit in SECTION_UNITS:
+        if groups and set(unit["tables"]) & {t for u in groups[-1] for t in u["tables"]}:
+            groups[-1].append(unit)
+        else:
+            groups.append([unit])
+    return groups
+
+
+def workbook_fingerprints(source):
+    """sha256 per worksheet of an xlsx, or None when it is not one.
+
+    A sheet's fingerprint covers its XML part, the text of the shared
+    strings it refers to, and the styles part (cell styles decide which
+    numbers are dates), so it changes whenever the sheet's values may have.
+    """
+    if isinstance(source, TermWorkbook):
+        return dict(source.fingerprints)
+    try:
+        with zipfile.ZipFile(source) as archive:
+            index = read_archive_index(archive)
+            styles = hashlib.sha256()
+            for name in archive.namelist():
+                if name.endswith("styles.xml"):
+                    styles.update(archive.read(name))
+            fingerprints = {}
+            for sheet, path in index["sheets"].items():
+                data = archive.read(path)
+                digest = hashlib.sha256(data)
+                for match in SHARED_STRING_REF.finditer(data):
+                    digest.update(index["strings"][int(match.group(1))].encode("utf-8", "surrogatepass") + b"\0")
+                digest.update(styles.digest() + str(index["epoch"]).encode())
+                fingerprints[sheet] = digest.hexdigest()
+            return fingerprints
+    except Exception as e:
+        print("Could not fingerprint workbook sheets:", e)
+        return None
+    finally:
+        if hasattr(source, "seek"):
+            source.seek(0)
 
-            # scoring for grant amounts (example from original: > 1,000,000 gives points)
+
+def _cache_path(staffname):
+    key = hashlib.sha256(staffname.strip().lower().encode("utf-8")).hexdigest()
+    return os.path.join(app.config["SECTION_CACHE_DIR"], key + ".json")
+
+
+def load_section_cache(staffname):
+    """The cached section results for a faculty ({} when there are none)."""
+    if not app.config["SECTION_CACHE_DIR"]:
+        return {}
+    try:
+        with open(_cache_path(staffname), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_section_cache(staffname, cache):
+    if not app.config["SECTION_CACHE_DIR"]:
+        return
+    path = _cache_path(staffname)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp, path)
+
+
+def snapshot_tables(doc, indexes):
+    """Serialized XML of the given template tables, keyed by index."""
+    return {str(i): etree.tostring(doc.tables[i]._tbl, encoding="unicode")
+            for i in indexes if i < len(doc.tables)}
+
+
+def restore_tables(doc, tables):
+    """Swap snapshot_tables() output back into a freshly opened template."""
+    from docx.oxml import parse_xml
+
+    current = doc.tables
+    for i, xml in tables.items():
+        old = current[int(i)]._tbl
+        old.getparent().replace(old, parse_xml(xml))
+
+
+def stream_sha256(stream):
+    """sha256 of an uploaded file (computed while it was received when possible)."""
+    digest = getattr(stream, "sha256", None)
+    if isinstance(digest, str):
+        return digest
+    stream.seek(0)
+    hasher = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+        hasher.update(chunk)
+    stream.seek(0)
+    return hasher.hexdigest()
+
+
+def fingerprint(*parts):
+    return hashlib.sha256(json.dumps([SECTION_CACHE_VERSION, *parts]).encode("utf-8")).hexdigest()
+
+
+def fill_academics(destination_table, source_rows, summary):
+    """Copy the uploaded course table into the template's with its
+    Total/Average and Marks rows."""
+    scores = summary["scores"]
+    # copy the course rows (2 .. before Total/Average) into the template
+    for i in range(2, summary["total_row"] if summary["total_row"] is not None else len(source_rows)):
+        row = source_rows[i]
+        if i >= len(destination_table.rows):
+            destination_table.add_row()
+        new_row = destination_table.rows[i]
+        # ensure enough cells
+        while len(new_row.cells) < len(row):
+            new_row._tr.add_tc()
+        new_cells = new_row.cells
+        for j, text in enumerate(row):
             try:
-                if total_amt > 1000000:
-                    add_pts = int(total_amt // 1000000) * 2
-                    n += add_pts
-                    r_counters["r10_1"] = r_counters.get("r10_1", 0) + add_pts
+                new_cells[j].text = text.strip()
             except Exception:
                 pass
 
-            # add totals row
-            if table7 is not None:
-                try:
-                    table7.add_row()
-                    last = table7.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            research += n
-
-        # Seminars (same sheet but coordinator != applied) -> table9 in original
-        if not df_filtered.empty:
-            table9_index = 9
-            if table9_index < len(doc.tables):
-                table9 = doc.tables[table9_index]
-            else:
-                table9 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                coord = str(row.get("Coordinator", "-")).strip().lower()
-                if coord != "applied":
-                    row_index = 1 + i
-                    if table9 is not None:
-                        if row_index + 1 >= len(table9.rows):
-                            table9.add_row()
-                        try:
-                            table9.cell(row_index + 1, 0).text = str(i + 1)
-                            table9.cell(row_index + 1, 1).text = str(row.get("Coordinator", "-"))
-                            table9.cell(row_index + 1, 2).text = str(row.get("Title", "-"))
-                            table9.cell(row_index + 1, 3).text = str(row.get("Type", "-"))
-                            table9.cell(row_index + 1, 4).text = str(row.get("Funding Agent", "-"))
-                            table9.cell(row_index + 1, 5).text = str(row.get("Amount", "-"))
-                            table9.cell(row_index + 1, 6).text = str(row.get("Applied On", "-"))
-                            amt = safe_float(row.get("Amount", 0))
-                            if amt > 50000:
-                                inc = int(amt // 50000)
-                                n += inc
-                                r_counters["r11_1"] = r_counters.get("r11_1", 0) + inc
-                        except Exception as e:
-                            print("Error filling seminar row:", e)
-            if table9 is not None:
-                try:
-                    table9.add_row()
-                    last = table9.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            research += n
-
-    ############### Patents ###############
-    if "Patents" in sheet_names:
-        try:
-            df_patent = pd.read_excel(excel_path, sheet_name="Patents")
-            df_patent.columns = df_patent.columns.str.strip()
-            # tolerant column name
-            possible_name_cols = ["Faculty name", "Faculty Name", "Faculty"]
-            selected_col = next((c for c in possible_name_cols if c in df_patent.columns), None)
-            if selected_col:
-                df_patent[selected_col] = df_patent[selected_col].ffill()
-                df_filtered = df_patent[df_patent[selected_col].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Patents:", e)
+    i = summary["total_row"]
+    if i is not None:
+        # Add two rows for Total/Average and Marks
+        for j in range(i, i + 2):
+            if j >= len(destination_table.rows):
+                destination_table.add_row()
+            new_row = destination_table.rows[j]
+            source_width = len(source_rows[j]) if j < len(source_rows) else 0
 
-        if not df_filtered.empty:
-            table10_index = 10
-            if table10_index < len(doc.tables):
-                table10 = doc.tables[table10_index]
-            else:
-                table10 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                row_index = 1 + i
-                if table10 is not None and row_index + 1 >= len(table10.rows):
-                    table10.add_row()
-                try:
-                    # Serial
-                    if table10 is not None:
-                        table10.cell(row_index + 1, 0).text = str(i + 1)
-                        title = str(row.get("Title", "-"))
-                        table10.cell(row_index + 1, 1).text = title
-                        status = str(row.get("Status", "")).strip().lower()
-                        date_value = str(row.get("Date", "-"))
-                        if status == "filed":
-                            table10.cell(row_index + 1, 2).text = date_value  # filing
-                            table10.cell(row_index + 1, 3).text = "-"
-                        elif status == "published":
-                            table10.cell(row_index + 1, 2).text = "-"  # filing
-                            table10.cell(row_index + 1, 3).text = date_value  # published
-                            n += 5
-                            r_counters["r12_1"] = r_counters.get("r12_1", 0) + 5
-                        else:
-                            table10.cell(row_index + 1, 2).text = "-"
-                            table10.cell(row_index + 1, 3).text = "-"
-                        table10.cell(row_index + 1, 4).text = str(row.get("Status", "-"))
-                except Exception as e:
-                    print("Error filling patent row:", e)
-            if table10 is not None:
-                try:
-                    table10.add_row()
-                    last = table10.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            research += n
-
-    ############### Workshops, Internships, MOOC, MoU, etc. ###############
-    # Workshop (table13_index in original was 14)
-    if "Workshop" in sheet_names:
-        header = find_header_row(excel_path, "Workshop")
-        skiprows = header + 1 if header is not None else 0
-        try:
-            df_workshop = pd.read_excel(excel_path, sheet_name="Workshop", skiprows=skiprows)
-            df_workshop.columns = df_workshop.columns.str.strip()
-            possible_names = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
-            selected_col = next((col for col in possible_names if col in df_workshop.columns), None)
-            if selected_col:
-                df_workshop[selected_col] = df_workshop[selected_col].ffill()
-                df_filtered = df_workshop[df_workshop[selected_col].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Workshop:", e)
+            # ensure correct number of cells
+            while len(new_row.cells) < source_width:
+                new_row._tr.add_tc()
 
-        if not df_filtered.empty:
-            table13_index = 14
-            if table13_index < len(doc.tables):
-                table13 = doc.tables[table13_index]
-            else:
-                table13 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                role = str(row.get("Role", "")).strip().lower()
-                if role == "attended":
-                    if table13 is not None and (1 + i + 1) >= len(table13.rows):
-                        table13.add_row()
-                    try:
-                        table13.cell(1 + i + 1, 0).text = str(i + 1)
-                        table13.cell(1 + i + 1, 1).text = str(row.get("Topic", "-"))
-                        from_date = str(row.get("From Date", "-"))
-                        to_date = str(row.get("To Date", "-"))
-                        table13.cell(1 + i + 1, 2).text = f"{from_date} to {to_date}"
-                        table13.cell(1 + i + 1, 3).text = str(row.get("Description", "-"))
-                        table13.cell(1 + i + 1, 4).text = str(row.get("Venue", "-"))
-                    except Exception:
-                        pass
-                    if n < 3:
-                        n += 1
-                        p_counters["p1_1"] = p_counters.get("p1_1", 0) + 1
-            if table13 is not None:
-                try:
-                    table13.add_row()
-                    last = table13.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            selfm += n
-
-    # Faculty Internship (table14)
-    if "Faculty Internship" in sheet_names:
-        header = find_header_row(excel_path, "Faculty Internship")
-        skiprows = header + 1 if header is not None else 0
-        try:
-            df_develop = pd.read_excel(excel_path, sheet_name="Faculty Internship", skiprows=skiprows)
-            df_develop.columns = df_develop.columns.str.strip()
-            possible_names = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
-            selectedcol = next((col for col in possible_names if col in df_develop.columns), None)
-            if selectedcol:
-                df_develop[selectedcol] = df_develop[selectedcol].ffill()
-                df_filtered = df_develop[df_develop[selectedcol].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Faculty Internship:", e)
+            # merge first 4 cells into one label cell (if possible)
+            try:
+                merged_cell = new_row.cells[0].merge(new_row.cells[1])
+                merged_cell = merged_cell.merge(new_row.cells[2])
+                merged_cell = merged_cell.merge(new_row.cells[3])
+            except Exception:
+                pass
 
-        if not df_filtered.empty:
-            table14_index = 15
-            if table14_index < len(doc.tables):
-                table14 = doc.tables[table14_index]
-            else:
-                table14 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                if table14 is not None and (1 + i + 1) >= len(table14.rows):
-                    table14.add_row()
-                try:
-                    table14.cell(1 + i + 1, 0).text = str(i + 1)
-                    table14.cell(1 + i + 1, 1).text = str(row.get("FDP Name", "-"))
-                    from_date = str(row.get("From Date", "-"))
-                    to_date = str(row.get("To Date", "-"))
-                    table14.cell(1 + i + 1, 2).text = f"{from_date} to {to_date}"
-                    table14.cell(1 + i + 1, 3).text = str(row.get("Description", "-"))
-                    table14.cell(1 + i + 1, 4).text = str(row.get("National or International", "-"))
-                    n += 3
-                    p_counters["p2_1"] = p_counters.get("p2_1", 0) + 3
-                except Exception:
-                    pass
-            if table14 is not None:
-                try:
-                    table14.add_row()
-                    last = table14.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            selfm += n
-
-    # MOOC Course (table15)
-    if "MOOC Course" in sheet_names:
-        header = find_header_row(excel_path, "MOOC Course")
-        skiprows = header + 1 if header is not None else 0
-        try:
-            df_mooc = pd.read_excel(excel_path, sheet_name="MOOC Course", skiprows=skiprows)
-            df_mooc.columns = df_mooc.columns.str.strip()
-            possible_names = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
-            selectedcol = next((col for col in possible_names if col in df_mooc.columns), None)
-            if selectedcol:
-                df_mooc[selectedcol] = df_mooc[selectedcol].ffill()
-                df_filtered = df_mooc[df_mooc[selectedcol].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading MOOC Course:", e)
+            new_cells = new_row.cells
+            try:
+                if j == i:
+                    # Total/Average row: average at col 4 and remaining sums next
+                    new_cells[3].text = "Total/Average"
+                    values = [summary["average"]] + list(scores[1:])
+                else:
+                    # Marks row based on grading functions
+                    new_cells[3].text = "Marks(Ref guideline for awarding score)"
+                    values = summary["marks"]
+                for k, value in enumerate(values):
+                    if 4 + k < len(new_cells):
+                        new_cells[4 + k].text = f"{value:.2f}" if j == i else str(value)
+            except Exception:
+                pass
 
-        if not df_filtered.empty:
-            table15_index = 16
-            if table15_index < len(doc.tables):
-                table15 = doc.tables[table15_index]
-            else:
-                table15 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                if table15 is not None and (1 + i + 1) >= len(table15.rows):
-                    table15.add_row()
-                try:
-                    table15.cell(1 + i + 1, 0).text = str(i + 1)
-                    table15.cell(1 + i + 1, 1).text = str(row.get("Coure Title", "-"))
-                    table15.cell(1 + i + 1, 2).text = str(row.get("Course Type", "-"))
-                    from_date = str(row.get("From Date", "-"))
-                    to_date = str(row.get("To Date", "-"))
-                    table15.cell(1 + i + 1, 3).text = f"{from_date} to {to_date}"
-                    table15.cell(1 + i + 1, 4).text = str(row.get("Duration", "-"))
-                    table15.cell(1 + i + 1, 5).text = str(row.get("Awards", "-"))
-                    if n < 4:
-                        n += 2
-                        p_counters["p3_1"] = p_counters.get("p3_1", 0) + 2
-                except Exception:
-                    pass
-            if table15 is not None:
-                try:
-                    table15.add_row()
-                    last = table15.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            selfm += n
-
-    # MoU (table16)
-    if "MoU" in sheet_names:
-        header = find_header_row(excel_path, "MoU")
-        skiprows = header + 1 if header is not None else 0
-        try:
-            df_mou = pd.read_excel(excel_path, sheet_name="MoU", skiprows=skiprows)
-            df_mou.columns = df_mou.columns.str.strip()
-            possible_names = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
-            selectedcol = next((col for col in possible_names if col in df_mou.columns), None)
-            if selectedcol:
-                df_mou[selectedcol] = df_mou[selectedcol].ffill()
-                df_filtered = df_mou[df_mou[selectedcol].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading MoU:", e)
 
-        if not df_filtered.empty:
-            table16_index = 17
-            if table16_index < len(doc.tables):
-                table16 = doc.tables[table16_index]
-            else:
-                table16 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                if table16 is not None and (1 + i + 1) >= len(table16.rows):
-                    table16.add_row()
-                try:
-                    table16.cell(1 + i + 1, 0).text = str(i + 1)
-                    table16.cell(1 + i + 1, 1).text = str(row.get(selectedcol, "-"))
-                    table16.cell(1 + i + 1, 2).text = str(row.get("Company Name", "-"))
-                    from_date = str(row.get("From Date", "-"))
-                    to_date = str(row.get("To Date", "-"))
-                    table16.cell(1 + i + 1, 3).text = f"{from_date} to {to_date}"
-                    table16.cell(1 + i + 1, 4).text = str(row.get("Industry SPOC", "-"))
-                    table16.cell(1 + i + 1, 5).text = str(row.get("Duration", "-"))
-                    n += 1
-                    p_counters["p4_1"] = p_counters.get("p4_1", 0) + 1
-                except Exception:
-                    pass
-            if table16 is not None:
-                try:
-                    table16.add_row()
-                    last = table16.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            selfm += n
-
-    ############### Workshops conducted (Workshops sheet) ###############
-    if "Workshops" in sheet_names:
-        header = find_header_row(excel_path, "Workshops")
-        skiprows = header + 1 if header is not None else 0
-        try:
-            df_workshops_conducted = pd.read_excel(excel_path, sheet_name="Workshops", skiprows=skiprows)
-            df_workshops_conducted.columns = df_workshops_conducted.columns.str.strip()
-            possible_names = ["Faculty Name", "Faculty name", "Name of the Faculty", "Name", "Faculty"]
-            selectedcol = next((col for col in possible_names if col in df_workshops_conducted.columns), None)
-            if selectedcol:
-                df_workshops_conducted[selectedcol] = df_workshops_conducted[selectedcol].ffill()
-                df_filtered = df_workshops_conducted[
-                    (df_workshops_conducted[selectedcol].astype(str).str.strip() == staffname) &
-                    (df_workshops_conducted["Role"].fillna("").astype(str).str.strip().str.lower() == "conducted")
-                ]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Workshops:", e)
+CORRECTIVE_OUTPUTS = ("appfilled_template.docx", "debug_filled_template.docx")
 
-        if not df_filtered.empty:
-            table17_index = 19
-            if table17_index < len(doc.tables):
-                table17 = doc.tables[table17_index]
-            else:
-                table17 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                if table17 is not None and (1 + i + 1) >= len(table17.rows):
-                    table17.add_row()
-                try:
-                    table17.cell(1 + i + 1, 0).text = str(i + 1)
-                    table17.cell(1 + i + 1, 1).text = str(row.get("Topic", "-"))
-                    table17.cell(1 + i + 1, 2).text = str(row.get("Department", "-"))
-                    from_date = str(row.get("From Date", "-"))
-                    to_date = str(row.get("To Date", "-"))
-                    table17.cell(1 + i + 1, 3).text = f"{from_date} to {to_date}"
-                    table17.cell(1 + i + 1, 4).text = str(row.get("No of Students", "-"))
-                    table17.cell(1 + i + 1, 5).text = str(row.get("Venue", "-"))
-                    table17.cell(1 + i + 1, 6).text = str(row.get("Description", "-"))
-                    n += 0.5
-                    p_counters["p6_1"] = p_counters.get("p6_1", 0) + 0.5
-                except Exception:
-                    pass
-            if table17 is not None:
-                try:
-                    table17.add_row()
-                    last = table17.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            selfm += n
-
-    ############### Guest Lectures / Expert Visits ###############
-    if "Guest Lectures" in sheet_names:
-        header = find_header_row(excel_path, "Guest Lectures")
-        skiprows = header + 1 if header is not None else 0
-        try:
-            df_experts = pd.read_excel(excel_path, sheet_name="Guest Lectures", skiprows=skiprows)
-            df_experts.columns = df_experts.columns.str.strip()
-            if "Faculty Name" in df_experts.columns:
-                df_experts["Faculty Name"] = df_experts["Faculty Name"].ffill()
-                df_filtered = df_experts[df_experts["Faculty Name"].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Guest Lectures:", e)
 
-        if not df_filtered.empty:
-            table19_index = 20
-            if table19_index < len(doc.tables):
-                table19 = doc.tables[table19_index]
-            else:
-                table19 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                if table19 is not None and (1 + i + 1) >= len(table19.rows):
-                    table19.add_row()
-                try:
-                    table19.cell(1 + i + 1, 0).text = str(i + 1)
-                    table19.cell(1 + i + 1, 1).text = str(row.get("Chief Guest Name", "-"))
-                    table19.cell(1 + i + 1, 2).text = str(row.get("Address", "-"))
-                    table19.cell(1 + i + 1, 3).text = str(row.get("Topic Name", "-"))
-                    from_date = str(row.get("From Date", "-"))
-                    to_date = str(row.get("To Date", "-"))
-                    table19.cell(1 + i + 1, 4).text = f"{from_date} to {to_date}"
-                    table19.cell(1 + i + 1, 5).text = str(row.get("Description", "-"))
-                    table19.cell(1 + i + 1, 6).text = str(row.get("Topic Delivered", "-"))
-                    n += 1
-                    p_counters["p7_1"] = p_counters.get("p7_1", 0) + 1
-                except Exception:
-                    pass
-            if table19 is not None:
-                try:
-                    table19.add_row()
-                    last = table19.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            selfm += n
-
-    ############### Projects Guided / Mentoring ###############
-    if "Project Guided or Mentoring" in sheet_names:
-        header = find_header_row(excel_path, "Project Guided or Mentoring")
-        skiprows = header + 1 if header is not None else 0
+def current_scores():
+    return {"research": research, "selfm": selfm, "mentor": mentor, "academics": academics, "hod": hod}
+
+
+def discard_corrective_report(base=None):
+    base = base or os.getcwd()
+    for name in CORRECTIVE_OUTPUTS:
         try:
-            df_project = pd.read_excel(excel_path, sheet_name="Project Guided or Mentoring", skiprows=skiprows)
-            df_project.columns = df_project.columns.str.strip()
-            if "Faculty Name" in df_project.columns:
-                df_project["Faculty Name"] = df_project["Faculty Name"].ffill()
-                df_filtered = df_project[df_project["Faculty Name"].astype(str).str.strip().str.lower() == staffname.lower()]
-            else:
-                df_filtered = pd.DataFrame()
-        except Exception as e:
-            df_filtered = pd.DataFrame()
-            print("Error reading Project Guided or Mentoring:", e)
+            os.remove(os.path.join(base, name))
+        except FileNotFoundError:
+            pass
 
-        if not df_filtered.empty:
-            table21_index = 22
-            if table21_index < len(doc.tables):
-                table21 = doc.tables[table21_index]
-            else:
-                table21 = None
-            n = 0
-            for i, (_, row) in enumerate(df_filtered.iterrows()):
-                if table21 is not None and (1 + i + 1) >= len(table21.rows):
-                    table21.add_row()
-                try:
-                    table21.cell(1 + i + 1, 0).text = str(i + 1)
-                    table21.cell(1 + i + 1, 1).text = str(row.get("Project Title", "-"))
-                    table21.cell(1 + i + 1, 2).text = str(row.get("Number of Students", "-"))
-                    table21.cell(1 + i + 1, 3).text = str(row.get("Title of Hackathon", "-"))
-                    table21.cell(1 + i + 1, 4).text = str(row.get("Organized By", "-"))
-                    table21.cell(1 + i + 1, 5).text = str(row.get("Date", "-"))
-                    table21.cell(1 + i + 1, 6).text = str(row.get("Status", "-"))
-                    # example scoring
-                    n = 1
-                    s_counters["s1_1"] = 1
-                except Exception:
-                    pass
-            if table21 is not None:
-                try:
-                    table21.add_row()
-                    last = table21.rows[-1]
-                    try:
-                        last.cells[0].merge(last.cells[-2])
-                    except Exception:
-                        pass
-                    paragraph = last.cells[-2].paragraphs[0]
-                    paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.RIGHT
-                    last.cells[-1].text = str(n)
-                except Exception:
-                    pass
-            mentor += n
 
-    # Prepare placeholders for main template and corrective doc
-    placeholders = {
-        "{{research}}": str(research),
-        "{{self}}": str(selfm),
-        "{{mentorship}}": str(mentor),
-        "{{academics}}": str(academics),
-        "{{name}}": detaillist[0] if detaillist and len(detaillist) > 0 else staffname,
-        "{{designation}}": detaillist[1] if len(detaillist) > 1 else "",
-        "{{dept}}": detaillist[2] if len(detaillist) > 2 else "",
-        "{{empid}}": detaillist[3] if len(detaillist) > 3 else ""
-    }
+def build_corrective_report(scores, designation, deadline=None, output_dir=None):
+    """Fill the corrective action report from an appraisal's section scores
+    and designation and save it as appfilled_template.docx in `output_dir`
+    (the working directory by default)."""
+    if deadline is None:
+        deadline = Deadline()
+    output_dir = output_dir or os.getcwd()
+    fdoc = corrective_report(scores, designation, deadline)
+
+    # Save final doc
+    deadline.check("saving documents")
+    output_path = os.path.join(output_dir, "appfilled_template.docx")
+    save_document(fdoc, output_path, CORRECTIVE_TEMPLATE_FILE)
+    shutil.copyfile(output_path, os.path.join(output_dir, "debug_filled_template.docx"))
+    print(f"Document saved as {output_path}")
+
 
+def corrective_report(scores, designation, deadline):
+    """The filled corrective action report document (unsaved)."""
     placeholders2 = {
-        "{{research}}": str(research),
-        "{{selfm}}": str(selfm),
-        "{{mentor}}": str(mentor),
-        "{{academics}}": str(academics),
+        "{{research}}": str(scores["research"]),
+        "{{selfm}}": str(scores["selfm"]),
+        "{{mentor}}": str(scores["mentor"]),
+        "{{academics}}": str(scores["academics"]),
     }
 
     for i in range(1, 14):
@@ -1281,9 +4514,11 @@ def processing(excel_path, staffname, template_path, template_file):
         placeholders2[f"{{{{s{i}_1}}}}"] = globals().get(f"s{i}_1", 0)
     placeholders2["{{u1}}"]=8
 
-    score=[academics, research, selfm, mentor,hod]
+    score = [scores["academics"], scores["research"], scores["selfm"], scores["mentor"], scores["hod"]]
 
-    fdoc = Document("Faculty Appraisal- Corrective Action Report.docx")
+    deadline.check("corrective action report")
+
+    fdoc = open_template(CORRECTIVE_TEMPLATE_FILE)
 
     # Replace placeholders in paragraphs
     for table in fdoc.tables:
@@ -1296,83 +4531,225 @@ def processing(excel_path, staffname, template_path, template_file):
                             full_text = full_text.replace(placeholder, str(value))
                     paragraph.text = full_text
     lasttable = fdoc.tables[2]
-    assispro = [0.3, 0.3, 0.15, 0.15, 0.1]
-    assospro = [0.2, 0.4, 0.15, 0.15, 0.1]
-    prof = [0.1, 0.4, 0.2, 0.2, 0.1]
-    tot = 0
-    print(detaillist[1])
+    factors = DESIGNATION_WEIGHTS.get(designation)
+    weighted, tot = weighted_scores(scores, designation)
+    print(designation)
 
     for row_idx, row in zip(range(2, 6), lasttable.rows[2:6]):  # rows 2 to 5
         for cell_idx, cell in zip(range(1, 6), row.cells[1:6]):  # cells 1 to 5
             if row_idx == 2:
-                cell.text = str(score[cell_idx - 1])  
-
+                cell.text = str(score[cell_idx - 1])
             elif row_idx == 3:
-                if detaillist[1] == "Professor":
-                    cell.text = str(prof[cell_idx - 1])
-                elif detaillist[1] == "Associate Professor":
-                    cell.text = str(assospro[cell_idx - 1])
-                elif detaillist[1] == "Assistant Professor":
-                    cell.text = str(assispro[cell_idx - 1])
-                else:
-                    cell.text = "0"
-
+                cell.text = str(factors[cell_idx - 1]) if factors else "0"
             elif row_idx == 4:
-                if detaillist[1] == "Professor":
-                    weight = prof[cell_idx - 1]
-                elif detaillist[1] == "Associate Professor":
-                    weight = assospro[cell_idx - 1]
-                elif detaillist[1] == "Assistant Professor":
-                    weight = assispro[cell_idx - 1]
-                else:
-                    weight = 0
-
-                weighted_score = score[cell_idx - 1] * weight
-                cell.text = str(weighted_score)
-                tot += weighted_score
-
+                cell.text = str(weighted[cell_idx - 1])
             else:
                 print("Not filled")
 
     # Write total to last cell in 5th row (index 4)
     lasttable.rows[4].cells[-1].text = str(tot)
+    return fdoc
 
-    
 
-    # Save final doc
-    fdoc.save("appfilled_template.docx")
-    print("Document saved as filled_template.docx")
+def processing(excel_path, staffname, template_path, template_file, deadline=None, details=None,
+               output_dir=None):
+    """Full processing: read provided Excel, populate template Word docs and compute scores.
+
+    `excel_path` is the uploaded workbook (a path or file object) or a
+    registered TermWorkbook. `details` are the faculty's name, designation,
+    department and employee id; the documents are written to `output_dir`
+    (the working directory by default). `deadline` is checked between
+    sections; when it expires or the client disconnects, Cancelled is raised
+    and no output documents are written.
+    Returns the section scores, the paths of the documents written, the sheet
+    fingerprints, which sections were reused from the section cache or
+    reprocessed, and each section's facts.
+    """
+    if deadline is None:
+        deadline = Deadline()
+    details = list(details) if details else [staffname, "", "", ""]
+    output_dir = output_dir or os.getcwd()
+
+    # Load template
+    try:
+        doc = open_template(template_path)
+    except Exception as e:
+        raise RuntimeError(f"Could not open template docx at {template_path}: {e}")
+
+    # reset scores and counters
+    research = 0
+    selfm = 0
+    mentor = 0
+    academics = 0
+    hod = 0
+
+    # Each section's rows, score and filled tables are cached per faculty
+    # under a fingerprint of the sheets they came from; a re-upload where a
+    # sheet is unchanged reuses them instead of reading the sheet again.
+    cache = load_section_cache(staffname)
+    sheet_fingerprints = workbook_fingerprints(excel_path)
+    template_digest = hashlib.sha256(template_bytes(template_path)).hexdigest()
+    workbook = None
+    sheet_names = []
+    report = {"fingerprints": sheet_fingerprints or {}, "reused": [], "reprocessed": [], "facts": {}}
+
+    def open_once():
+        # Open the workbook once, and only if a section has to be read;
+        # every sheet is read from this handle (parsed whole by pandas,
+        # extracted in parallel or streamed row by row for large workbooks).
+        nonlocal workbook, sheet_names
+        if workbook is None:
+            try:
+                workbook = open_workbook(excel_path)
+                sheet_names = workbook.sheet_names
+            except Exception as e:
+                workbook = False
+                print("Could not read Excel file or sheets:", e)
+        return workbook
+
+    ############### Academics section (copy table and compute totals) ###############
+    deadline.check("Academics")
+    # The course table is read straight from the uploaded Word file's stream
+    # (table 1 of the upload, copied into table 1 of the template). Without
+    # a Word file there is no course table and academics scores 0.
+    key = None
+    if template_file is not None:
+        key = fingerprint("Academics", stream_sha256(uploaded_stream(template_file)), template_digest)
+    entry = cache.get("Academics")
+    if template_file is None:
+        entry = {"facts": None, "scores": {"academics": 0}}
+        report["reprocessed"].append("Academics")
+    elif entry and entry["fingerprint"] == key:
+        restore_tables(doc, entry["tables"])
+        report["reused"].append("Academics")
+    else:
+        try:
+            source_rows = read_docx_table(uploaded_stream(template_file), 1)
+            destination_table = doc.tables[1]
+        except Exception as e:
+            print(f"Error opening uploaded Word file for academics table: {e}")
+            source_rows = None
+        summary = None
+        if source_rows is not None:
+            summary = summarize_academics(source_rows)
+            fill_academics(destination_table, source_rows, summary)
+        entry = cache["Academics"] = {"fingerprint": key, "facts": summary,
+                                      "scores": {"academics": summary["total"] if summary else 0},
+                                      "tables": snapshot_tables(doc, [1])}
+        report["reprocessed"].append("Academics")
+    academics = entry["scores"]["academics"]
+    report["facts"]["Academics"] = entry["facts"]
+
+    ############### Workbook sections ###############
+    counters = blank_counters()
+    totals = {"research": 0, "selfm": 0, "mentor": 0}
+    for group in section_groups():
+        sheets = [unit["sheet"] for unit in group]
+        name = " + ".join(sheets)
+        key = None
+        if sheet_fingerprints is not None:
+            key = fingerprint([sheet_fingerprints.get(sheet) for sheet in sheets], staffname, template_digest)
+        entry = cache.get(name)
+        if key is not None and entry and entry["fingerprint"] == key:
+            restore_tables(doc, entry["tables"])
+            report["reused"].extend(sheets)
+        else:
+            entry = {"fingerprint": key, "facts": {}, "parts": {}, "counters": {}}
+            for unit in group:
+                deadline.check(unit["sheet"])
+                if not open_once() or unit["sheet"] not in sheet_names:
+                    continue
+                df_filtered, name_col = read_section(workbook, unit["sheet"], staffname)
+                rows = section_facts(df_filtered)
+                if not rows:
+                    continue
+                placed = unit["fill"](doc, rows, name_col)
+                parts, unit_counters = unit["score"](rows, placed)
+                fill_totals(doc, unit, parts)
+                entry["facts"][unit["sheet"]] = {"rows": rows, "name_column": name_col, "placed": placed}
+                entry["parts"][unit["sheet"]] = parts
+                entry["counters"][unit["sheet"]] = unit_counters
+            entry["tables"] = snapshot_tables(doc, sorted({t for unit in group for t in unit["tables"]}))
+            if key is not None:
+                cache[name] = entry
+            report["reprocessed"].extend(sheets)
+        for unit in group:
+            for points in entry["parts"].get(unit["sheet"], {}).values():
+                totals[unit["category"]] += points
+            for counter, value in entry["counters"].get(unit["sheet"], {}).items():
+                counters[counter] = counters.get(counter, 0) + value
+        report["facts"].update(entry["facts"])
+    research, selfm, mentor = totals["research"], totals["selfm"], totals["mentor"]
+    report["counters"] = counters
+    report["scores"] = scores = {"research": research, "selfm": selfm, "mentor": mentor,
+                                 "academics": academics, "hod": hod}
+
+    if workbook:
+        workbook.close()
+    save_section_cache(staffname, cache)
+
+    # Prepare placeholders for main template and corrective doc
+    placeholders = {
+        "{{research}}": str(research),
+        "{{self}}": str(selfm),
+        "{{mentorship}}": str(mentor),
+        "{{academics}}": str(academics),
+        "{{name}}": details[0] if details and len(details) > 0 else staffname,
+        "{{designation}}": details[1] if len(details) > 1 else "",
+        "{{dept}}": details[2] if len(details) > 2 else "",
+        "{{empid}}": details[3] if len(details) > 3 else ""
+    }
+
+    if app.config["CORRECTIVE_REPORT"] == "eager":
+        build_corrective_report(scores, details[1], deadline, output_dir)
+        report["outputs"] = [os.path.join(output_dir, name) for name in CORRECTIVE_OUTPUTS]
+    else:
+        # Built on first download instead; drop the previous appraisal's copy
+        deadline.check("saving documents")
+        discard_corrective_report(output_dir)
+        report["outputs"] = []
         # Replace placeholders in paragraphs with the corresponding values
     for placeholder, value in placeholders.items():
         for paragraph in doc.paragraphs:
             if placeholder in paragraph.text:
                 paragraph.text = paragraph.text.replace(placeholder, value)
     # Save the modified document
-    output_doc_path = "filled_template.docx"
-    doc.save(output_doc_path)
-    fdoc.save("debug_filled_template.docx")
+    output_doc_path = os.path.join(output_dir, "filled_template.docx")
+    save_document(doc, output_doc_path, template_path)
+    report["outputs"].insert(0, output_doc_path)
     print(f"Word document saved as {output_doc_path}")
+    return report
 
 def copy_table_contents(source_table, dest_table):
-    """Copy contents from source table to destination table"""
-    # Ensure destination table has enough rows
-    while len(dest_table.rows) < len(source_table.rows):
-        dest_table.add_row()
-
-    # Copy cell contents
-    for i, row in enumerate(source_table.rows):
-        for j, cell in enumerate(row.cells):
-            try:
-                dest_table.cell(i, j).text = cell.text
-            except IndexError:
-                print(f"Warning: Could not copy cell at row {i}, column {j}")
+    """Copy the source table's rows over the destination's as XML.
+
+    Each w:tr is deep-copied in one operation, so run formatting, merged
+    cells and cell widths come along and the cost is linear in the table
+    size. The source's column grid replaces the destination's so merges and
+    widths line up; destination rows past the source's are kept, and the
+    destination's table properties (style, borders) stay as they are.
+    """
+    src, dest = source_table._tbl, dest_table._tbl
+    if src.tblGrid is not None and dest.tblGrid is not None:
+        dest.replace(dest.tblGrid, copy.deepcopy(src.tblGrid))
+    dest_rows = dest.tr_lst
+    previous = None
+    for i, tr in enumerate(src.tr_lst):
+        clone = copy.deepcopy(tr)
+        if i < len(dest_rows):
+            dest.replace(dest_rows[i], clone)
+        elif previous is not None:
+            previous.addnext(clone)
+        else:
+            dest.append(clone)
+        previous = clone
 
 def process_blueprint(excel_path, staffname):
     """Process the blueprint and fill the template"""
     try:
         # Load both documents
-        source_doc = Document("MSP Self-Appraisal form.docx")
-        template_doc = Document("template.docx")  # Your template document
+        source_doc = open_template(BLUEPRINT_FILE)
+        template_doc = open_template(TEMPLATE_FILE)  # Your template document
 
         # Copy contents from each table
         for i, source_table in enumerate(source_doc.tables):
@@ -1401,7 +4778,7 @@ def process_blueprint(excel_path, staffname):
                     paragraph.text = paragraph.text.replace(placeholder, value)
 
         # Save the filled template
-        template_doc.save("filled_template.docx")
+        save_document(template_doc, "filled_template.docx", TEMPLATE_FILE)
         print("Successfully filled template and saved as filled_template.docx")
         
         return True
@@ -1411,7 +4788,568 @@ def process_blueprint(excel_path, staffname):
         return False
 
 
+############### Shadow runs ###############
+# Before a faster reader, scoring change or DOCX writer replaces today's
+# path, both run side by side: a sampled share of real uploads (and any
+# replay corpus, see benchmarks/shadow_replay.py) is processed once with
+# the legacy configuration and once with the candidate one, in worker
+# processes so the upload is not slowed down. Scores and section counters
+# must match exactly and every table of both output documents must have
+# the same canonical XML. Each comparison, with both paths' timings, is
+# kept in the store under SHADOW_DIR and summarized by /shadow/report.
+SHADOW_MAX_PENDING = 4
+# attributes and elements Word and python-docx may change without changing
+# the document (revision ids, paragraph ids, proofing marks)
+SHADOW_NOISE_ATTRIBUTES = ("rsidR", "rsidRPr", "rsidRDefault", "rsidP", "rsidDel", "rsidSect", "rsidTr")
+SHADOW_NOISE_ELEMENTS = ("proofErr", "bookmarkStart", "bookmarkEnd")
+W14_NS = "http://schemas.microsoft.com/office/word/2010/wordml"
+
+_shadow_pool = None
+_shadow_pool_lock = threading.Lock()
+_shadow_pending = 0
+
+
+def parse_overrides(spec):
+    """"KEY=value,KEY=value" as app.config overrides, each value converted to
+    the type of the setting it replaces."""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, sep, value = item.partition("=")
+        name = name.strip()
+        if not sep or name not in app.config:
+            raise ValueError(f"Not a configuration override: {item!r}")
+        current = app.config[name]
+        overrides[name] = type(current)(value.strip()) if isinstance(current, (int, float)) else value.strip()
+    return overrides
+
+
+def normalized_tables(path):
+    """Every table of a .docx as canonical XML, without the markup that does
+    not change the document."""
+    with zipfile.ZipFile(path) as package:
+        root = etree.fromstring(package.read("word/document.xml"))
+    for element in [e for e in root.iter(*(_w(tag) for tag in SHADOW_NOISE_ELEMENTS))]:
+        element.getparent().remove(element)
+    noise = {_w(name) for name in SHADOW_NOISE_ATTRIBUTES} | {f"{{{W14_NS}}}paraId", f"{{{W14_NS}}}textId"}
+    for element in root.iter():
+        for name in noise.intersection(element.attrib):
+            del element.attrib[name]
+    return [etree.tostring(table, method="c14n").decode("utf-8") for table in root.iter(_w("tbl"))]
+
+
+@contextmanager
+def scratch_directory(template_path):
+    """Work in a fresh directory holding copies of the templates, so output
+    documents of runs in other processes are not overwritten."""
+    cwd = os.getcwd()
+    scratch = tempfile.mkdtemp(prefix="appraisal-")
+    try:
+        shutil.copyfile(template_path, os.path.join(scratch, TEMPLATE_FILE))
+        shutil.copyfile(CORRECTIVE_TEMPLATE_FILE, os.path.join(scratch, CORRECTIVE_TEMPLATE_FILE))
+        os.chdir(scratch)
+        yield scratch
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _shadow_path(job, overrides):
+    """Process one submission with `overrides` applied, in a scratch working
+    directory, and return its scores, counters, tables and timing."""
+    saved = {name: app.config[name] for name in overrides}
+    saved.update(SECTION_CACHE_DIR=app.config["SECTION_CACHE_DIR"], CORRECTIVE_REPORT=app.config["CORRECTIVE_REPORT"])
+    try:
+        # nothing may come from the section cache, and both documents are built
+        app.config.update(overrides, SECTION_CACHE_DIR="", CORRECTIVE_REPORT="eager")
+        details = [job["fields"][field] for field in FORM_FIELDS]
+        with open(job["word_file"], "rb") as word, \
+                scratch_directory(os.path.join(job["root"], TEMPLATE_FILE)) as scratch:
+            started = time.perf_counter()
+            report = processing(job["workbook"], details[0], os.path.join(scratch, TEMPLATE_FILE),
+                                FileStorage(stream=word, filename=os.path.basename(job["word_file"])),
+                                details=details, output_dir=scratch)
+            seconds = time.perf_counter() - started
+            return {
+                "seconds": seconds,
+                "scores": report["scores"],
+                "counters": report["counters"],
+                "tables": {name: normalized_tables(name) for name in ("filled_template.docx", "appfilled_template.docx")},
+            }
+    finally:
+        app.config.update(saved)
+
+
+def _first_difference(left, right, context=60):
+    at = next((i for i, (a, b) in enumerate(zip(left, right)) if a != b), min(len(left), len(right)))
+    start = max(0, at - context // 2)
+    return left[start:at + context // 2], right[start:at + context // 2]
+
+
+def compare_paths(legacy, candidate):
+    """Differences between two _shadow_path() results (empty when they match)."""
+    differences = []
+    for field in sorted(legacy["scores"]):
+        if legacy["scores"][field] != candidate["scores"][field]:
+            differences.append({"kind": "score", "field": field,
+                                "legacy": legacy["scores"][field], "candidate": candidate["scores"][field]})
+    for counter in sorted(set(legacy["counters"]) | set(candidate["counters"])):
+        left, right = legacy["counters"].get(counter), candidate["counters"].get(counter)
+        if left != right:
+            differences.append({"kind": "counter", "field": counter, "legacy": left, "candidate": right})
+    for document, tables in legacy["tables"].items():
+        other = candidate["tables"][document]
+        if len(tables) != len(other):
+            differences.append({"kind": "tables", "field": document, "legacy": len(tables), "candidate": len(other)})
+        for number, (left, right) in enumerate(zip(tables, other)):
+            if left != right:
+                excerpt = _first_difference(left, right)
+                differences.append({"kind": "table", "field": f"{document} table {number}",
+                                    "legacy": excerpt[0], "candidate": excerpt[1]})
+    return differences
+
+
+def shadow_compare(job):
+    """Worker task: run one submission through the legacy and the candidate
+    configuration and compare them."""
+    warm_up()  # so neither path's timing includes the imports
+    runs = {path: _shadow_path(job, job[path]) for path in ("legacy", "candidate")}
+    differences = compare_paths(runs["legacy"], runs["candidate"])
+    return {
+        "id": job["id"],
+        "timestamp": datetime.now().isoformat(),
+        "source": job["source"],
+        "name": job["fields"]["name"],
+        "designation": job["fields"]["designation"],
+        "workbook_sha256": job["workbook_sha256"],
+        "legacy": {"config": job["legacy"], "seconds": runs["legacy"]["seconds"]},
+        "candidate": {"config": job["candidate"], "seconds": runs["candidate"]["seconds"]},
+        "match": not differences,
+        "differences": differences,
+    }
+
+
+def shadow_job(workbook, word_file, fields, source, legacy=None, candidate=None):
+    """A shadow_compare() job for files on disk, with the configured legacy
+    and candidate overrides unless others are given."""
+    with open(workbook, "rb") as f:
+        digest = stream_sha256(f)
+    return {
+        "id": f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}",
+        "source": source,
+        "root": os.getcwd(),
+        "workbook": os.path.abspath(workbook),
+        "word_file": os.path.abspath(word_file),
+        "workbook_sha256": digest,
+        "fields": fields,
+        "legacy": parse_overrides(app.config["SHADOW_LEGACY"]) if legacy is None else legacy,
+        "candidate": parse_overrides(app.config["SHADOW_CANDIDATE"]) if candidate is None else candidate,
+    }
+
+
+def shadow_pool():
+    """The process pool shadow runs are done in (started on first use)."""
+    global _shadow_pool
+    with _shadow_pool_lock:
+        if _shadow_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            _shadow_pool = ProcessPoolExecutor(max_workers=max(1, app.config["SHADOW_WORKERS"]),
+                                               mp_context=multiprocessing.get_context("spawn"))
+        return _shadow_pool
+
+
+def save_shadow_run(record):
+    store.put(f"{app.config['SHADOW_DIR']}/{record['id']}.json", json.dumps(record).encode("utf-8"))
+
+
+def load_shadow_runs():
+    prefix = app.config["SHADOW_DIR"]
+    runs = []
+    for key, _, _ in store.list(prefix):
+        data = store.get(key)
+        try:
+            runs.append(json.loads(data))
+        except (TypeError, ValueError):
+            continue
+    return sorted(runs, key=lambda run: run["id"])
+
+
+def sample_shadow_run(workbook, word_file, fields):
+    """Maybe queue a shadow run of the upload just processed.
+
+    Called with the request's files (a file object or TermWorkbook, and the
+    Word file); they are copied aside because the request's upload directory
+    is removed when it ends. Skipped when shadow runs are off, not sampled,
+    or too many are pending already, so uploads never wait for them.
+    """
+    global _shadow_pending
+    rate = app.config["SHADOW_SAMPLE_RATE"]
+    if rate <= 0 or not app.config["SHADOW_CANDIDATE"] or not app.config["SHADOW_DIR"] or word_file is None:
+        return
+    if random.random() >= rate:
+        return
+    with _shadow_pool_lock:
+        if _shadow_pending >= SHADOW_MAX_PENDING:
+            print("Shadow run skipped: too many pending")
+            return
+        _shadow_pending += 1
+    spool = None
+    try:
+        os.makedirs(app.config["UPLOAD_ROOT"], exist_ok=True)
+        spool = tempfile.mkdtemp(prefix="shadow-", dir=app.config["UPLOAD_ROOT"])
+        workbook_path = os.path.join(spool, "workbook.xlsx")
+        if isinstance(workbook, TermWorkbook):
+            if not store.get_file(f"{workbook.key}/workbook.xlsx", workbook_path):
+                raise FileNotFoundError(f"term workbook {workbook.id} is gone")
+        else:
+            with open(workbook_path, "wb") as out:
+                shutil.copyfileobj(uploaded_stream(workbook), out)
+        word_path = os.path.join(spool, "word.docx")
+        with open(word_path, "wb") as out:
+            shutil.copyfileobj(uploaded_stream(word_file), out)
+        job = shadow_job(workbook_path, word_path, fields, "sample")
+        future = shadow_pool().submit(shadow_compare, job)
+    except Exception as e:
+        print(f"Shadow run not started: {e}")
+        with _shadow_pool_lock:
+            _shadow_pending -= 1
+        if spool:
+            shutil.rmtree(spool, ignore_errors=True)
+        return
+
+    def finished(future):
+        global _shadow_pending
+        try:
+            record = future.result()
+            save_shadow_run(record)
+            if not record["match"]:
+                print(f"Shadow run {record['id']} diverged: {len(record['differences'])} differences")
+        except Exception as e:
+            print(f"Shadow run failed: {e}")
+        finally:
+            with _shadow_pool_lock:
+                _shadow_pending -= 1
+            shutil.rmtree(spool, ignore_errors=True)
+
+    future.add_done_callback(finished)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def shadow_report(runs):
+    """Divergence rate, mismatches per field and per-path timings of `runs`."""
+    diverged = [run for run in runs if not run["match"]]
+    mismatches = {}
+    for run in diverged:
+        for difference in run["differences"]:
+            field = f"{difference['kind']}:{difference['field']}"
+            mismatches[field] = mismatches.get(field, 0) + 1
+    timings = {}
+    for path in ("legacy", "candidate"):
+        seconds = [run[path]["seconds"] for run in runs]
+        timings[path] = {"median_seconds": _percentile(seconds, 0.5), "p95_seconds": _percentile(seconds, 0.95),
+                         "total_seconds": sum(seconds)}
+    candidate_total = timings["candidate"]["total_seconds"]
+    configs = sorted({(json.dumps(run["legacy"]["config"], sort_keys=True),
+                       json.dumps(run["candidate"]["config"], sort_keys=True)) for run in runs})
+    return {
+        "runs": len(runs),
+        "diverged": len(diverged),
+        "divergence_rate": len(diverged) / len(runs) if runs else None,
+        "mismatches": dict(sorted(mismatches.items(), key=lambda item: -item[1])),
+        "timings": timings,
+        "speedup": timings["legacy"]["total_seconds"] / candidate_total if candidate_total else None,
+        "configs": [{"legacy": json.loads(legacy), "candidate": json.loads(candidate)} for legacy, candidate in configs],
+        "recent_divergences": diverged[-20:],
+    }
+
+
+@app.route("/shadow/report", methods=["GET"])
+def shadow_report_route():
+    """Summary of the stored shadow runs (optionally only those `since` an
+    ISO timestamp, or with a given `source`: sample or replay)."""
+    runs = load_shadow_runs()
+    since = request.args.get("since")
+    if since:
+        runs = [run for run in runs if run["timestamp"] >= since]
+    source = request.args.get("source")
+    if source:
+        runs = [run for run in runs if run["source"] == source]
+    return jsonify(shadow_report(runs))
+
+
+############### Batch runs ###############
+# `python app.py batch <directory | manifest>` processes a term's workbooks
+# offline, without the web server: each workbook is validated and split by
+# faculty once (as a registered term workbook is), then every faculty on its
+# list is appraised by processing() in a process pool. Documents go to the
+# store under <BATCH_DIR>/<batch>/<memo key>/ and history records carry the
+# batch id, so /export, /bundle and /rescore can select the run. An item is
+# finished once its item.json is stored; running the same command again
+# skips finished items and retries the others.
+BATCH_DOCUMENTS = ("filled_template.docx", "appfilled_template.docx")
+
+
+class BatchWorkbook(TermWorkbook):
+    """A workbook of a batch run, partitioned by faculty once for all of its items."""
+
+    def __init__(self, meta, partitions):
+        super().__init__(meta)
+        self._partitions = partitions
+
+    def partitions(self, source=None):
+        return self._partitions
+
+
+def read_faculty_list(path):
+    """Rows of a faculty list CSV (name, designation, department,
+    employee_id and an optional word_file) with the form fields normalized."""
+    import csv
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = []
+        for row in csv.DictReader(f):
+            row = {normalize_field(k).lower().replace(" ", "_"): v for k, v in row.items() if k}
+            fields = {k: normalize_field(row.get(k)) for k in FORM_FIELDS}
+            if fields["name"]:
+                word_file = normalize_field(row.get("word_file"))
+                fields["word_file"] = os.path.join(os.path.dirname(path), word_file) if word_file else None
+                rows.append(fields)
+        return rows
+
+
+def read_batch_source(source, word_file):
+    """[(workbook path, faculty list path or rows, Word file)] of a batch.
+
+    A directory holds the workbooks (*.xlsx), each with a faculty list of the
+    same name (.csv) or a shared faculty.csv. A manifest is a JSON lines
+    file of {"workbook", "faculty", optional "word_file"}, where "faculty"
+    is a CSV path or a list of rows; paths are relative to the manifest.
+    """
+    if os.path.isdir(source):
+        entries = []
+        for name in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() != ".xlsx" or name.startswith("~$"):
+                continue
+            faculty = os.path.join(source, f"{stem}.csv")
+            if not os.path.exists(faculty):
+                faculty = os.path.join(source, "faculty.csv")
+            entries.append((os.path.join(source, name), faculty, word_file))
+        return entries
+    base = os.path.dirname(os.path.abspath(source))
+    entries = []
+    with open(source, encoding="utf-8") as f:
+        for line in filter(None, (line.strip() for line in f)):
+            entry = json.loads(line)
+            faculty = entry.get("faculty", [])
+            if isinstance(faculty, str):
+                faculty = os.path.join(base, faculty)
+            entries.append((os.path.join(base, entry["workbook"]), faculty,
+                            os.path.join(base, entry["word_file"]) if entry.get("word_file") else word_file))
+    return entries
+
+
+def prepare_batch_workbook(path, directory):
+    """Worker task: validate, fingerprint and partition one batch workbook.
+    Returns its meta (as a term workbook's) or raises ValueError."""
+    with redirect_stdout(sys.stderr), open(path, "rb") as f:
+        validation = validate_workbook(f)
+        if not validation["readable"]:
+            raise ValueError(validation["message"])
+        meta = {"id": os.path.basename(path), "version": 0, "sha256": stream_sha256(f),
+                "fingerprints": workbook_fingerprints(path) or {}, "validation": validation}
+        reader = StreamingWorkbook(path)
+        try:
+            reader.partition(directory)
+        finally:
+            reader.close()
+        return meta
+
+
+def run_batch_item(job):
+    """Worker task: appraise one faculty of a batch and store the documents,
+    the history record and the item's completion marker."""
+    with redirect_stdout(sys.stderr):
+        app.config.update(CORRECTIVE_REPORT="eager", SECTION_CACHE_DIR=job["section_cache"])
+        details = [job["fields"][field] for field in FORM_FIELDS]
+        workbook = BatchWorkbook(job["meta"], job["partitions"])
+        started = time.perf_counter()
+        with open(job["word_file"], "rb") as word, scratch_directory(job["template"]) as scratch:
+            report = processing(workbook, details[0], os.path.join(scratch, TEMPLATE_FILE),
+                                FileStorage(stream=word, filename=os.path.basename(job["word_file"])),
+                                details=details, output_dir=scratch)
+            documents = {}
+            for name in BATCH_DOCUMENTS:
+                with open(os.path.join(scratch, name), "rb") as f:
+                    documents[name] = f.read()
+        prefix = f"{app.config['BATCH_DIR']}/{job['batch']}/{job['key']}"
+        for name, data in documents.items():
+            store.put(f"{prefix}/{name}", data)
+        result = {"scores": report["scores"], "detaillist": details, "fingerprints": report["fingerprints"],
+                  "facts": report["facts"]}
+        appraisal = record_appraisal(job["key"], result, batch=job["batch"])
+        item = {"timestamp": appraisal["timestamp"], "scores": report["scores"],
+                "seconds": round(time.perf_counter() - started, 3)}
+        store.put(f"{prefix}/item.json", json.dumps(item).encode("utf-8"))
+        return item
+
+
+def batch_document(record, name):
+    """Bytes of a document stored by a batch run for a history record, or None."""
+    if not record.get("batch") or not record.get("memo_key"):
+        return None
+    return store.get(f"{app.config['BATCH_DIR']}/{record['batch']}/{record['memo_key']}/{name}")
+
+
+def finished_batch_items(batch):
+    """Memo keys of the items of `batch` finished by earlier runs."""
+    prefix = f"{app.config['BATCH_DIR']}/{batch}"
+    done = {key[len(prefix) + 1:].split("/")[0] for key, _, _ in store.list(prefix) if key.endswith("/item.json")}
+    # a record without item.json: the run stopped just after recording it
+    return done | {record.get("memo_key") for record in iter_history() if record.get("batch") == batch}
+
+
+def run_batch(source, batch=None, template=None, word_file=None, workers=None, out=None):
+    """Process a directory or manifest of workbooks (see read_batch_source),
+    writing progress to `out` as JSON lines. Returns the number of failed items."""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    import multiprocessing
+
+    out = out or sys.stdout
+
+    def emit(event, **fields):
+        out.write(json.dumps({"event": event, **fields}, default=str) + "\n")
+        out.flush()
+
+    def emit_item(item, status, completed, **fields):
+        emit("item", workbook=item["workbook"], name=item["fields"]["name"],
+             designation=item["fields"]["designation"], status=status, **fields,
+             completed=completed, total=len(items))
+
+    batch = batch or secure_filename(os.path.splitext(os.path.basename(os.path.normpath(source)))[0]) or "batch"
+    template = os.path.abspath(template or TEMPLATE_FILE)
+    word_file = os.path.abspath(word_file or BLUEPRINT_FILE)
+    section_cache = os.path.abspath(app.config["SECTION_CACHE_DIR"]) if app.config["SECTION_CACHE_DIR"] else ""
+    started = time.perf_counter()
+    failed = 0
+
+    # Items: one per faculty listed for a workbook, keyed like an upload
+    workbooks = {}
+    items = []
+    unreadable = []  # (workbook, error), reported after the start event
+    for path, faculty, default_word_file in read_batch_source(source, word_file):
+        try:
+            rows = read_faculty_list(faculty) if isinstance(faculty, str) else [
+                {**{k: normalize_field(row.get(k)) for k in FORM_FIELDS}, "word_file": row.get("word_file")}
+                for row in faculty]
+            with open(path, "rb") as f:
+                sha256 = stream_sha256(f)
+        except (OSError, ValueError) as e:
+            unreadable.append((path, str(e)))
+            continue
+        # keyed by the workbook's sha256 only, like a term workbook upload
+        workbooks[path] = BatchWorkbook({"id": os.path.basename(path), "version": 0, "sha256": sha256,
+                                         "fingerprints": {}, "validation": {}}, None)
+        for row in rows:
+            row_word_file = os.path.abspath(row.pop("word_file") or default_word_file)
+            with open(row_word_file, "rb") as word:
+                key = appraisal_key(workbooks[path], word, row, template)
+            items.append({"workbook": path, "fields": row, "word_file": row_word_file, "key": key})
+
+    done = finished_batch_items(batch)
+    pending = [item for item in items if item["key"] not in done]
+    emit("start", batch=batch, workbooks=len(workbooks) + len(unreadable), items=len(items),
+         finished_before=len(items) - len(pending))
+    for path, error in unreadable:
+        emit("workbook", workbook=path, status="failed", error=error)
+        failed += 1
+    completed = len(items) - len(pending)
+
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 2,
+                               mp_context=multiprocessing.get_context("spawn"))
+    try:
+        with tempfile.TemporaryDirectory(prefix=f"batch-{batch}-") as scratch:
+            # Split each workbook with pending items by faculty, once
+            prepared = {}
+            for n, path in enumerate(sorted({item["workbook"] for item in pending})):
+                partitions = os.path.join(scratch, str(n))
+                prepared[pool.submit(prepare_batch_workbook, path, partitions)] = (path, partitions)
+            jobs = {}
+            for future in as_completed(prepared):
+                path, partitions = prepared[future]
+                try:
+                    meta = future.result()
+                except Exception as e:
+                    emit("workbook", workbook=path, status="failed", error=str(e))
+                    for item in pending:
+                        if item["workbook"] == path:
+                            failed += 1
+                            completed += 1
+                            emit_item(item, "failed", completed, error=f"Workbook not readable: {e}")
+                    continue
+                emit("workbook", workbook=path, status="ready", sheets=len(meta["fingerprints"]))
+                for item in pending:
+                    if item["workbook"] == path:
+                        job = {**item, "batch": batch, "meta": meta, "partitions": partitions,
+                               "template": template, "section_cache": section_cache}
+                        jobs[pool.submit(run_batch_item, job)] = item
+
+            for future in as_completed(jobs):
+                item = jobs[future]
+                completed += 1
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    emit_item(item, "failed", completed, error=str(e))
+                    continue
+                emit_item(item, "done", completed, key=item["key"], scores=result["scores"],
+                          seconds=result["seconds"])
+    except KeyboardInterrupt:
+        # finished items are stored; running the command again resumes
+        pool.shutdown(wait=False, cancel_futures=True)
+        emit("interrupted", batch=batch, items=len(items), completed=completed, failed=failed)
+        raise
+    pool.shutdown()
+
+    emit("finish", batch=batch, items=len(items), failed=failed, seconds=round(time.perf_counter() - started, 3))
+    return failed
+
+
+def batch_main(argv):
+    """`python app.py batch ...`: see run_batch()."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="app.py batch",
+                                     description="Appraise every faculty of a directory or manifest of workbooks.")
+    parser.add_argument("source", help="directory of workbooks and faculty lists, or a JSON lines manifest")
+    parser.add_argument("--batch", help="batch id recorded in the history (default: the source's name); "
+                                        "rerun with the same id to resume")
+    parser.add_argument("--template", help=f"appraisal template (default: {TEMPLATE_FILE})")
+    parser.add_argument("--word-file", help=f"Word file with the course table (default: {BLUEPRINT_FILE})")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    # processing() prints as it goes; stdout carries only the progress lines
+    out = sys.stdout
+    try:
+        with redirect_stdout(sys.stderr):
+            failed = run_batch(args.source, args.batch, args.template, args.word_file, args.workers, out)
+    except KeyboardInterrupt:
+        return 130
+    return 1 if failed else 0
+
+
 if __name__ == '__main__':
+    if sys.argv[1:2] == ["batch"]:
+        sys.exit(batch_main(sys.argv[2:]))
     # with app.app_context():
     #     db.create_all()
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Development server only; production runs `gunicorn -c gunicorn.conf.py app:app`
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get("FLASK_ENV") == "development")
\ No newline at end of file
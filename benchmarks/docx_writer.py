@@ -0,0 +1,87 @@
+"""Timing of the template-copying DOCX writer.
+
+Fills each template's tables with sample text and reports how long
+python-docx's doc.save() and app.save_document() each take to save it.
+That both write the same document is checked by tests/test_docx_writer.py.
+
+--media N first embeds an N MB image in a copy of each template, to time a
+template with heavy embedded media.
+
+Usage:  python benchmarks/docx_writer.py [--media N] [--runs N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app  # noqa: E402
+
+
+def with_media(path, megabytes):
+    """Copy of `path` with an incompressible image of `megabytes` MB added."""
+    import struct
+    import zlib
+
+    # a PNG whose pixel data is random, so deflate cannot shrink it
+    width = 1024
+    height = megabytes * 1024 * 1024 // (3 * width)
+    raw = b"".join(b"\x00" + os.urandom(3 * width) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    png = (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">2I5B", width, height, 8, 2, 0, 0, 0))
+           + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b""))
+    doc = app.Document(path)
+    doc.add_picture(BytesIO(png))
+    fd, target = tempfile.mkstemp(suffix=".docx")
+    os.close(fd)
+    doc.save(target)
+    return target
+
+
+def fill(doc):
+    for t, table in enumerate(doc.tables):
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = f"{t}.{r}.{c}"
+
+
+def best(save, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        save()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--media", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=10, help="best of N timings per writer")
+    args = parser.parse_args()
+
+    for template in (app.TEMPLATE_FILE, app.CORRECTIVE_TEMPLATE_FILE):
+        path = with_media(template, args.media) if args.media else template
+        try:
+            doc = app.open_template(path)
+            fill(doc)
+            python_docx = best(lambda: doc.save(BytesIO()), args.runs)
+            copying = best(lambda: app.save_document(doc, BytesIO(), path), args.runs)
+        finally:
+            if path != template:
+                os.remove(path)
+        print(f"{os.path.basename(template)}{f' + {args.media} MB image' if args.media else ''}")
+        print(f"  doc.save()       {python_docx * 1000:>8.1f} ms")
+        print(f"  save_document()  {copying * 1000:>8.1f} ms   ({python_docx / copying:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Import-time report and start-up budget for the backend.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter, prints
+the most expensive top-level packages by cumulative import time, and exits
+non-zero when
+
+* importing app takes longer than the budget (STARTUP_BUDGET_MS, default
+  600 ms), or
+* one of the heavy dependencies that app.py loads lazily (pandas,
+  python-docx, openpyxl, numpy, reportlab) was imported at start-up.
+
+Usage:  python benchmarks/import_time.py [--budget-ms N] [--top N] [--runs N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY = ("pandas", "docx", "openpyxl", "numpy", "reportlab")
+
+
+def measure():
+    """Return ({top-level package: cumulative µs}, total µs for app) from one cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    # -X importtime prints children before their parent, so the direct
+    # imports of app are the depth-1 lines just before the "app" line.
+    pending = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        # the name column is indented two spaces per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        if depth == 1:
+            pending[name.split(".")[0]] += int(cumulative_us)
+        elif depth == 0:
+            if name == "app":
+                return pending, int(cumulative_us)
+            pending = defaultdict(int)
+    raise RuntimeError("no import time reported for app")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("STARTUP_BUDGET_MS", 600)))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="best of N cold imports")
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    per_package, total = min(runs, key=lambda run: run[1])
+
+    print(f"{'package':<30}{'cumulative ms':>15}")
+    for name, us in sorted(per_package.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"{name:<30}{us / 1000:>15.1f}")
+    print(f"{'import app (best of %d)' % args.runs:<30}{total / 1000:>15.1f}")
+
+    failed = False
+    eager = [name for name in LAZY if name in per_package]
+    if eager:
+        print(f"FAIL: imported at start-up but expected lazily: {', '.join(eager)}")
+        failed = True
+    if total / 1000 > args.budget_ms:
+        print(f"FAIL: start-up took {total / 1000:.1f} ms, budget is {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"OK: within the {args.budget_ms:.0f} ms start-up budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Timing of the parallel workbook reader.
+
+Reports how long the pandas reader and the parallel reader each take to
+read every section sheet of a workbook for one faculty, as an upload does.
+That both return identical rows is checked by tests/test_parallel_reader.py.
+
+--scale N first writes a copy of the workbook with every section's data
+rows repeated N times, to time the readers on a larger file.
+
+Usage:  python benchmarks/parallel_reader.py [workbook.xlsx] [--scale N] [--runs N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+
+
+def scaled_copy(path, scale):
+    """Write a copy of `path` with each section's data rows repeated `scale` times."""
+    import openpyxl
+
+    source = openpyxl.load_workbook(path)
+    for section in app.SECTIONS:
+        if section["sheet"] not in source.sheetnames:
+            continue
+        sheet = source[section["sheet"]]
+        rows = [[cell.value for cell in row] for row in sheet.iter_rows()]
+        header, _ = app.locate_header(rows[:app.HEADER_SCAN_ROWS + 1], section["find_header"])
+        for _ in range(scale - 1):
+            for row in rows[header + 1:]:
+                sheet.append(row)
+    fd, target = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    source.save(target)
+    return target
+
+
+def faculty_names(path):
+    """Every distinct faculty name in the workbook's section sheets."""
+    workbook = app.PandasWorkbook(path)
+    names = set()
+    for section in app.SECTIONS:
+        if section["sheet"] not in workbook.sheet_names:
+            continue
+        skiprows = 0
+        if section["find_header"]:
+            header = app.find_header_row(workbook.book, section["sheet"])
+            skiprows = header + 1 if header is not None else 0
+        frame = app.pd.read_excel(workbook.book, sheet_name=section["sheet"], skiprows=skiprows)
+        frame.columns = frame.columns.str.strip()
+        column = next((c for c in section["name_columns"] if c in frame.columns), None)
+        if column is not None:
+            names.update(str(v).strip() for v in frame[column].dropna())
+    workbook.close()
+    return sorted(names)
+
+
+def read_all(mode, path, names):
+    """Open `path` with one reader, read every section for `names`, and
+    return the seconds it took."""
+    started = time.perf_counter()
+    workbook = app.open_workbook(path, mode)
+    for section in app.SECTIONS:
+        if section["sheet"] in workbook.sheet_names:
+            for name in names:
+                workbook.faculty_rows(section, name)
+    workbook.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workbook", nargs="?", default=os.path.join(ROOT, "marks.xlsx"))
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3, help="best of N timings per reader")
+    args = parser.parse_args()
+
+    path = scaled_copy(args.workbook, args.scale) if args.scale > 1 else args.workbook
+    try:
+        names = faculty_names(path)
+        # Start the worker processes before timing.
+        app.extract_pool().submit(len, "").result()
+
+        # Time what one upload does: every section for one faculty.
+        timings = {mode: min(read_all(mode, path, names[:1]) for _ in range(args.runs))
+                   for mode in ("pandas", "parallel")}
+    finally:
+        if path != args.workbook:
+            os.remove(path)
+
+    print(f"workbook: {os.path.basename(args.workbook)} x{args.scale}, {len(names)} faculty, "
+          f"{app.app.config['EXTRACT_WORKERS']} workers")
+    for mode, seconds in timings.items():
+        print(f"{mode:<10}{seconds * 1000:>10.1f} ms")
+    print(f"speed-up  {timings['pandas'] / timings['parallel']:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
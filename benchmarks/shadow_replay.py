@@ -0,0 +1,93 @@
+"""Shadow comparison of a candidate configuration on a replay corpus.
+
+Runs every submission of the corpus through processing() with the legacy
+configuration and with the candidate one (see "Shadow runs" in app.py),
+prints each difference in scores, counters or document tables, and ends
+with the report /shadow/report gives: divergence rate, mismatches per
+field, and the median and p95 time of each path with the speedup. Exits
+non-zero when any submission diverged.
+
+The corpus is a JSON lines file, one submission per line:
+  {"workbook": "...xlsx", "word_file": "...docx", "name": "...",
+   "designation": "...", "department": "...", "employee_id": "..."}
+(paths relative to the file). A workbook instead replays it for every
+faculty name in it, with the form in the repository as the Word file.
+
+--legacy and --candidate are "KEY=value,KEY=value" overrides of the app
+config and default to SHADOW_LEGACY and SHADOW_CANDIDATE. --record also
+stores the runs under SHADOW_DIR, so /shadow/report includes them.
+
+Usage:  python benchmarks/shadow_replay.py [corpus.jsonl | workbook.xlsx]
+            [--candidate SPEC] [--legacy SPEC] [--workers N] [--record]
+"""
+import argparse
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app  # noqa: E402
+from parallel_reader import faculty_names  # noqa: E402
+
+
+def read_corpus(path, designation):
+    """The submissions of a corpus file, or of every faculty in a workbook."""
+    if not path.endswith(".jsonl"):
+        word_file = os.path.join(ROOT, app.BLUEPRINT_FILE)
+        return [{"workbook": path, "word_file": word_file, "name": name, "designation": designation,
+                 "department": "", "employee_id": ""} for name in faculty_names(path)]
+    base = os.path.dirname(os.path.abspath(path))
+    submissions = []
+    with open(path, encoding="utf-8") as f:
+        for line in filter(None, (line.strip() for line in f)):
+            submission = json.loads(line)
+            for field in ("workbook", "word_file"):
+                submission[field] = os.path.join(base, submission[field])
+            submissions.append(submission)
+    return submissions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=os.path.join(ROOT, "marks.xlsx"))
+    parser.add_argument("--legacy", default=app.app.config["SHADOW_LEGACY"])
+    parser.add_argument("--candidate", default=app.app.config["SHADOW_CANDIDATE"])
+    parser.add_argument("--designation", default="Professor", help="for a workbook corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--record", action="store_true", help="store the runs under SHADOW_DIR")
+    args = parser.parse_args()
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    import multiprocessing
+
+    legacy, candidate = app.parse_overrides(args.legacy), app.parse_overrides(args.candidate)
+    print(f"legacy:    {legacy or 'production config'}")
+    print(f"candidate: {candidate or 'production config'}")
+    jobs = [app.shadow_job(s["workbook"], s["word_file"], {field: s.get(field, "") for field in app.FORM_FIELDS},
+                           "replay", legacy, candidate)
+            for s in read_corpus(os.path.abspath(args.corpus), args.designation)]
+
+    runs = []
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for future in as_completed([pool.submit(app.shadow_compare, job) for job in jobs]):
+            run = future.result()
+            runs.append(run)
+            if args.record:
+                app.save_shadow_run(run)
+            print(f"{'ok  ' if run['match'] else 'DIFF'} {run['name']} ({run['designation']})"
+                  f"  {run['legacy']['seconds'] * 1000:.0f} ms -> {run['candidate']['seconds'] * 1000:.0f} ms")
+            for difference in run["differences"]:
+                print(f"     {difference['kind']} {difference['field']}: "
+                      f"{difference['legacy']!r} != {difference['candidate']!r}")
+
+    report = app.shadow_report(sorted(runs, key=lambda run: run["id"]))
+    report.pop("recent_divergences")
+    print(json.dumps(report, indent=2))
+    return 1 if report["diverged"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Gunicorn settings for production serving.
+
+Run with:  gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master (preload_app) together with
+pandas, openpyxl and python-docx, and the document templates are loaded
+before forking, so workers start instantly and share that memory
+copy-on-write. Workers are recycled after `max_requests` requests to cap
+memory growth.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+# Every request holds one of a worker's threads until it finishes, and an
+# open /history/stream dashboard holds one for up to HISTORY_STREAM_SECONDS.
+# HISTORY_MAX_STREAMS (2 by default) caps the streams per worker so the
+# remaining threads stay free for uploads and downloads; raise threads
+# together with it when many dashboards stay open.
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+preload_app = True
+
+# Recycle workers to cap memory growth; jitter keeps them from all
+# restarting at the same moment.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 500))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 50))
+
+# Must exceed UPLOAD_DEADLINE / PDF_DEADLINE so requests are abandoned
+# cooperatively before the arbiter kills the worker.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 180))
+graceful_timeout = 30
+
+accesslog = "-"
+
+
+def when_ready(server):
+    """Warm the master before the first fork."""
+    from app import warm_up
+
+    warm_up()
+    # Move everything loaded so far into the permanent generation so the
+    # workers' garbage collector never touches (and so never copies) it.
+    gc.collect()
+    gc.freeze()
+    server.log.info("Templates preloaded; %d objects frozen", gc.get_freeze_count())
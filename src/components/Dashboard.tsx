@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
 import { useNavigate, useLocation, useParams } from 'react-router-dom';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
@@ -49,6 +49,45 @@ interface DisplayScores {
   [key: string]: unknown;
 }
 
+// History records as the dashboard shows them, most recent first.
+const toFacultyRecords = (data: Array<Record<string, unknown>>): FacultyRecord[] => {
+  const mappedData: FacultyRecord[] = data.map((item: Record<string, unknown>, index: number) => ({
+    id: (index + 1).toString(),
+    name: (item.name as string) || '',
+    employeeId: (item.emp_id as string) || '',
+    department: (item.department as string) || '',
+    designation: (item.designation as string) || '',
+    academicYear: '2024-25',
+    uploadDate: new Date().toLocaleDateString(),
+    status: 'completed',
+    timestamp: (item.timestamp as string) || '',
+    scores: {
+      teaching: (item.academics as number) || 0,
+      research: (item.research as number) || 0,
+      service: (item.selfm as number) || 0,
+      mentor: (item.mentor as number) || 0,
+      hod: (item.hod as number) || 0,
+      overall:
+        ((item.academics as number) || 0) +
+        ((item.research as number) || 0) +
+        ((item.selfm as number) || 0) +
+        ((item.mentor as number) || 0) +
+        ((item.hod as number) || 0),
+    },
+  }));
+  // Sort so most-recent uploads appear first. Try numeric timestamp then Date.parse.
+  const sorted = mappedData.sort((a, b) => {
+    const pa = Number(a.timestamp) || Date.parse(String(a.timestamp)) || 0;
+    const pb = Number(b.timestamp) || Date.parse(String(b.timestamp)) || 0;
+    return pb - pa;
+  });
+  // Recompute ids so they reflect the displayed order (1 = newest)
+  sorted.forEach((rec, idx) => {
+    rec.id = (idx + 1).toString();
+  });
+  return sorted;
+};
+
 const Dashboard = () => {
   const navigate = useNavigate();
   const location = useLocation();
@@ -65,69 +104,63 @@ const Dashboard = () => {
     : location.pathname.includes('/results')
     ? 'results'
     : 'dashboard';
-  const [appraisalHistory, setAppraisalHistory] = useState<FacultyRecord[]>([]);
+  const [history, setHistory] = useState<Array<Record<string, unknown>>>([]);
   const [loading, setLoading] = useState<boolean>(true);
+  const appraisalHistory = useMemo(() => toFacultyRecords(history), [history]);
 
-  const fetchData = async (): Promise<FacultyRecord[]> => {
-    setLoading(true);
+  // Fallback for browsers without EventSource: one full fetch.
+  const fetchHistory = async () => {
     try {
       const res = await fetch('/api/download_path', {
         method: 'GET',
         credentials: 'include',
       });
-      if (!res.ok) {
-        setAppraisalHistory([]);
-        setLoading(false);
-        return [];
-      }
-      const data = await res.json();
-      const mappedData: FacultyRecord[] = (data as Array<Record<string, unknown>>).map((item: Record<string, unknown>, index: number) => ({
-        id: (index + 1).toString(),
-        name: (item.name as string) || '',
-        employeeId: (item.emp_id as string) || '',
-        department: (item.department as string) || '',
-        designation: (item.designation as string) || '',
-        academicYear: '2024-25',
-        uploadDate: new Date().toLocaleDateString(),
-        status: 'completed',
-        timestamp: (item.timestamp as string) || '',
-        scores: {
-          teaching: (item.academics as number) || 0,
-          research: (item.research as number) || 0,
-          service: (item.selfm as number) || 0,
-          mentor: (item.mentor as number) || 0,
-          hod: (item.hod as number) || 0,
-          overall:
-            ((item.academics as number) || 0) +
-            ((item.research as number) || 0) +
-            ((item.selfm as number) || 0) +
-            ((item.mentor as number) || 0) +
-            ((item.hod as number) || 0),
-        },
-      }));
-      // Sort so most-recent uploads appear first. Try numeric timestamp then Date.parse.
-      const sorted = mappedData.sort((a, b) => {
-        const pa = Number(a.timestamp) || Date.parse(String(a.timestamp)) || 0;
-        const pb = Number(b.timestamp) || Date.parse(String(b.timestamp)) || 0;
-        return pb - pa;
-      });
-      // Recompute ids so they reflect the displayed order (1 = newest)
-      sorted.forEach((rec, idx) => {
-        rec.id = (idx + 1).toString();
-      });
-      setAppraisalHistory(sorted);
-      setLoading(false);
-      return sorted;
+      setHistory(res.ok ? await res.json() : []);
     } catch (err) {
-      setAppraisalHistory([]);
-      setLoading(false);
-      return [];
+      setHistory([]);
     }
+    setLoading(false);
   };
 
-  // Fetch latest scores/details from backend on dashboard load
+  // Keep a live copy of the history: one snapshot from /history/stream, then
+  // insert/delete deltas as appraisals are added or removed. The browser
+  // reconnects on its own and the server resumes after the last event seen.
+  // When the server is at its stream limit (503) EventSource gives up, so
+  // fall back to one full fetch and open a new stream a little later.
   useEffect(() => {
-    fetchData();
+    if (typeof EventSource === 'undefined') {
+      fetchHistory();
+      return;
+    }
+    let source: EventSource;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    const connect = () => {
+      source = new EventSource('/api/history/stream', { withCredentials: true });
+      source.addEventListener('snapshot', (e) => {
+        setHistory(JSON.parse((e as MessageEvent).data));
+        setLoading(false);
+      });
+      source.addEventListener('insert', (e) => {
+        const item = JSON.parse((e as MessageEvent).data);
+        setHistory((prev) => [...prev.filter((r) => r.timestamp !== item.timestamp), item]);
+      });
+      source.addEventListener('delete', (e) => {
+        const { timestamp } = JSON.parse((e as MessageEvent).data);
+        setHistory((prev) => prev.filter((r) => r.timestamp !== timestamp));
+      });
+      source.onerror = () => {
+        setLoading(false);
+        if (source.readyState === EventSource.CLOSED) {
+          fetchHistory();
+          retry = setTimeout(connect, 10000 + Math.random() * 5000);
+        }
+      };
+    };
+    connect();
+    return () => {
+      clearTimeout(retry);
+      source.close();
+    };
   }, []);
 
   // current view is driven by URL (see navigate calls below)
@@ -195,33 +228,10 @@ const Dashboard = () => {
   };
 
   const handleUploadComplete = async (data: Record<string, unknown>) => {
-    // After upload, try to refresh history and navigate to the new results.
-    try {
-      const serverTs = data?.timestamp ? String(data.timestamp) : undefined;
-      let finalTs: string | undefined = serverTs;
-      if (serverTs) {
-        // Poll a few times for backend processing to make the record available
-        for (let i = 0; i < 6; i++) {
-          const list = await fetchData();
-          if (list.find((r) => String(r.timestamp) === serverTs)) {
-            finalTs = serverTs;
-            break;
-          }
-          // small delay before retry
-          await new Promise((res) => setTimeout(res, 1000));
-        }
-      } else {
-        const list = await fetchData();
-        finalTs = list.length > 0 ? list[0].timestamp : undefined;
-      }
-      if (finalTs) {
-        navigate(`/dashboard/results/${encodeURIComponent(finalTs)}`);
-      } else {
-        navigate('/dashboard');
-      }
-    } catch (err) {
-      navigate('/dashboard');
-    }
+    // The new record arrives through the history stream; the results view
+    // finds it by timestamp (and fetches it if the event is not in yet).
+    const serverTs = data?.timestamp ? String(data.timestamp) : appraisalHistory[0]?.timestamp;
+    navigate(serverTs ? `/dashboard/results/${encodeURIComponent(serverTs)}` : '/dashboard');
   };
 
   if (currentView === 'upload') {
@@ -492,7 +502,7 @@ const Dashboard = () => {
                                 credentials: 'include',
                               });
                               if (res.ok) {
-                                await fetchData();
+                                setHistory((prev) => prev.filter((r) => r.timestamp !== record.timestamp));
                               }
                             }
                           }}
@@ -1,9 +1,16 @@
-import { useState } from 'react';
+import { useState, useEffect } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Button } from '@/components/ui/button';
 import { FileText, Upload, AlertCircle } from 'lucide-react';
+import { RESUMABLE_THRESHOLD, uploadResumable } from '@/lib/resumableUpload';
+
+interface TermWorkbook {
+  id: string;
+  version: number;
+  filename: string;
+}
 
 interface UploadFormProps {
   onComplete: (data: Record<string, unknown>) => void;
@@ -30,6 +37,17 @@ const UploadForm = ({ onComplete, onCancel }: UploadFormProps) => {
   const [selectedExcelFile, setSelectedExcelFile] = useState<File | null>(null);
   const [selectedWordFile, setSelectedWordFile] = useState<File | null>(null);
   const [dragActive, setDragActive] = useState(false);
+  // Registered term workbooks; 'upload' means the user picks a file instead
+  const [termWorkbooks, setTermWorkbooks] = useState<TermWorkbook[]>([]);
+  const [workbookId, setWorkbookId] = useState<string>('upload');
+  const useTermWorkbook = workbookId !== 'upload';
+
+  useEffect(() => {
+    fetch('/api/workbooks', { credentials: 'include' })
+      .then((res) => (res.ok ? res.json() : []))
+      .then((data: TermWorkbook[]) => setTermWorkbooks(Array.isArray(data) ? data : []))
+      .catch(() => setTermWorkbooks([]));
+  }, []);
 
   const handleInputChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     setFormData({
@@ -75,11 +93,12 @@ const UploadForm = ({ onComplete, onCancel }: UploadFormProps) => {
   };
 
   const [error, setError] = useState('');
+  const [uploadProgress, setUploadProgress] = useState<string>('');
 
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setError('');
-    if (!selectedExcelFile || !selectedWordFile) {
+    if ((!selectedExcelFile && !useTermWorkbook) || !selectedWordFile) {
       setError('Please select both Excel and Word template files.');
       return;
     }
@@ -89,8 +108,34 @@ const UploadForm = ({ onComplete, onCancel }: UploadFormProps) => {
       data.append('designation', formData.designation);
       data.append('department', formData.department);
       data.append('employee_id', formData.employeeId);
-      data.append('excel_file', selectedExcelFile);
-      data.append('word_file', selectedWordFile);
+      // Large files are sent first in resumable chunks; /upload gets their ids
+      const attach = async (field: 'excel' | 'word', file: File) => {
+        if (file.size <= RESUMABLE_THRESHOLD) {
+          data.append(`${field}_file`, file);
+          return;
+        }
+        const uploadId = await uploadResumable(file, (sent, total) =>
+          setUploadProgress(`Uploading ${file.name}: ${Math.round((sent / total) * 100)}%`)
+        );
+        data.append(`${field}_upload_id`, uploadId);
+      };
+      try {
+        if (useTermWorkbook) {
+          data.append('workbook_id', workbookId);
+        } else if (selectedExcelFile) {
+          await attach('excel', selectedExcelFile);
+        }
+        await attach('word', selectedWordFile);
+      } catch (err) {
+        setError(
+          err instanceof Error && !(err instanceof TypeError)
+            ? `${err.message} Submit again to resume.`
+            : 'Upload interrupted. Submit again to resume.'
+        );
+        return;
+      } finally {
+        setUploadProgress('');
+      }
 
       const res = await fetch('/api/upload', {
         method: 'POST',
@@ -211,6 +256,24 @@ const UploadForm = ({ onComplete, onCancel }: UploadFormProps) => {
                 <CardTitle className="text-lg">Excel File Upload</CardTitle>
               </CardHeader>
               <CardContent>
+                {termWorkbooks.length > 0 && (
+                  <div className="space-y-2 mb-4">
+                    <Label htmlFor="termWorkbook">Term Workbook</Label>
+                    <Select onValueChange={setWorkbookId} value={workbookId}>
+                      <SelectTrigger id="termWorkbook" className="bg-muted/30">
+                        <SelectValue placeholder="Select term workbook" />
+                      </SelectTrigger>
+                      <SelectContent>
+                        <SelectItem value="upload">Upload an Excel file</SelectItem>
+                        {termWorkbooks.map((wb) => (
+                          <SelectItem key={wb.id} value={wb.id}>
+                            {wb.id} (v{wb.version}, {wb.filename})
+                          </SelectItem>
+                        ))}
+                      </SelectContent>
+                    </Select>
+                  </div>
+                )}
                 <div
                   className={`border-2 border-dashed rounded-lg p-8 text-center transition-colors ${
                     dragActive ? 'border-academic bg-academic/5' : 'border-muted-foreground/25'
@@ -224,7 +287,12 @@ const UploadForm = ({ onComplete, onCancel }: UploadFormProps) => {
                     <div className="w-12 h-12 bg-muted rounded-lg flex items-center justify-center">
                       <FileText className="w-6 h-6 text-muted-foreground" />
                     </div>
-                    {selectedExcelFile ? (
+                    {useTermWorkbook ? (
+                      <div className="space-y-2">
+                        <p className="font-medium text-foreground">Using term workbook {workbookId}</p>
+                        <p className="text-sm text-muted-foreground">No Excel upload needed</p>
+                      </div>
+                    ) : selectedExcelFile ? (
                       <div className="space-y-2">
                         <p className="font-medium text-foreground">{selectedExcelFile.name}</p>
                         <p className="text-sm text-muted-foreground">
@@ -312,6 +380,9 @@ const UploadForm = ({ onComplete, onCancel }: UploadFormProps) => {
             {/* Action Buttons */}
             <div className="flex flex-col gap-2">
               {error && <div className="text-red-500 text-sm mb-2">{error}</div>}
+              {uploadProgress && (
+                <div className="text-muted-foreground text-sm mb-2">{uploadProgress}</div>
+              )}
               <div className="flex justify-end gap-3">
                 <Button type="button" variant="outline" onClick={onCancel}>
                   Cancel
@@ -319,7 +390,7 @@ const UploadForm = ({ onComplete, onCancel }: UploadFormProps) => {
                 <Button
                   type="submit"
                   variant="academic"
-                  disabled={!selectedExcelFile || !selectedWordFile}
+                  disabled={(!selectedExcelFile && !useTermWorkbook) || !selectedWordFile}
                 >
                   <Upload className="w-4 h-4 mr-2" />
                   Upload & Process
@@ -0,0 +1,111 @@
+// Chunked, resumable uploads (see "Chunked uploads" in app.py). The upload
+// id is remembered per file, so a retry after a dropped connection only
+// sends the chunks the server has not received yet.
+
+// Files larger than this are sent in chunks instead of in the /upload form
+export const RESUMABLE_THRESHOLD = 1024 * 1024;
+
+const CHUNK_RETRIES = 5;
+
+interface UploadStatus {
+  upload_id: string;
+  size: number;
+  sha256: string;
+  chunk_size: number;
+  complete: boolean;
+  missing: number[];
+}
+
+const sha256Hex = async (data: ArrayBuffer): Promise<string> => {
+  const digest = await crypto.subtle.digest('SHA-256', data);
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, '0'))
+    .join('');
+};
+
+const storageKey = (file: File) => `upload:${file.name}:${file.size}:${file.lastModified}`;
+
+const delay = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const previousUpload = async (file: File, sha256: string): Promise<UploadStatus | null> => {
+  const uploadId = localStorage.getItem(storageKey(file));
+  if (!uploadId) return null;
+  try {
+    const res = await fetch(`/api/uploads/${uploadId}`, { credentials: 'include' });
+    if (!res.ok) return null;
+    const status: UploadStatus = await res.json();
+    return status.sha256 === sha256 ? status : null;
+  } catch {
+    return null;
+  }
+};
+
+const putChunk = async (uploadId: string, number: number, chunk: ArrayBuffer) => {
+  const checksum = await sha256Hex(chunk);
+  for (let attempt = 0; attempt <= CHUNK_RETRIES; attempt++) {
+    if (attempt > 0) await delay(500 * 2 ** (attempt - 1));
+    let res: Response;
+    try {
+      res = await fetch(`/api/uploads/${uploadId}/chunks/${number}`, {
+        method: 'PUT',
+        body: chunk,
+        headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum },
+        credentials: 'include',
+      });
+    } catch {
+      continue; // connection dropped: send the chunk again
+    }
+    if (res.ok) return;
+    // 422: corrupted on the way; 5xx: server trouble. Anything else is final.
+    if (res.status !== 422 && res.status < 500) {
+      throw new Error(`Chunk ${number} was rejected (${res.status}).`);
+    }
+  }
+  throw new Error(`Chunk ${number} could not be sent.`);
+};
+
+/**
+ * Upload `file` in chunks, resuming an earlier attempt when the server still
+ * has it, and return the upload id to pass to /upload.
+ */
+export async function uploadResumable(
+  file: File,
+  onProgress?: (sent: number, total: number) => void
+): Promise<string> {
+  const sha256 = await sha256Hex(await file.arrayBuffer());
+  let status = await previousUpload(file, sha256);
+  if (!status) {
+    const res = await fetch('/api/uploads', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size, sha256 }),
+      credentials: 'include',
+    });
+    if (!res.ok) throw new Error(`Could not start the upload of ${file.name}.`);
+    status = (await res.json()) as UploadStatus;
+    localStorage.setItem(storageKey(file), status.upload_id);
+  }
+  const { upload_id: uploadId, chunk_size: chunkSize } = status;
+  if (!status.complete) {
+    let sent = file.size - status.missing.reduce(
+      (total, n) => total + Math.min(chunkSize, file.size - n * chunkSize),
+      0
+    );
+    onProgress?.(sent, file.size);
+    for (const number of status.missing) {
+      const chunk = await file.slice(number * chunkSize, (number + 1) * chunkSize).arrayBuffer();
+      await putChunk(uploadId, number, chunk);
+      sent += chunk.byteLength;
+      onProgress?.(sent, file.size);
+    }
+    const res = await fetch(`/api/uploads/${uploadId}/complete`, {
+      method: 'POST',
+      credentials: 'include',
+    });
+    if (!res.ok) {
+      localStorage.removeItem(storageKey(file));
+      throw new Error(`The upload of ${file.name} could not be completed.`);
+    }
+  }
+  return uploadId;
+}
@@ -0,0 +1,55 @@
+"""Fixtures shared by the tests: the app imported from the repository root,
+and processing() of the bundled workbook and Self-Appraisal form."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app  # noqa: E402
+from docx.oxml.ns import qn  # noqa: E402
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+WORKBOOK = os.path.join(ROOT, "marks.xlsx")
+# every faculty in marks.xlsx, and one who is in none of its sheets
+FACULTY = ["Ananthi", "Keren Lois Daniel", "Ravi P", "J Poongodi", "Balakrishnan Deivasigamani",
+           "Umamakeswari S", "Jaya Pratibha R Chandran", "V Sivaranjani", "Nobody"]
+DESIGNATIONS = ["Professor", "Assistant Professor"]
+DOCUMENTS = ("filled_template.docx", "appfilled_template.docx")
+
+
+def document_text(path):
+    """The text of every paragraph (table cells included) of a DOCX, one per line."""
+    body = app.Document(path).element.body
+    return "\n".join("".join(t.text or "" for t in p.iter(qn("w:t"))) for p in body.iter(qn("w:p")))
+
+
+@pytest.fixture
+def process(tmp_path, monkeypatch):
+    """process(workbook, name, designation, word_file=True, **config) runs
+    processing() as an upload of the bundled form does (or, with
+    word_file=False, an upload without a Word file), with the app config
+    overridden by `config`, and returns its report and the text of both
+    documents.
+
+    Both documents are always built, and the section cache lives in
+    tmp_path unless `config` says otherwise.
+    """
+    monkeypatch.setitem(app.app.config, "SECTION_CACHE_DIR", str(tmp_path / "section_cache"))
+    monkeypatch.setitem(app.app.config, "CORRECTIVE_REPORT", "eager")
+
+    def process(workbook, name, designation, word_file=True, **config):
+        for key, value in config.items():
+            monkeypatch.setitem(app.app.config, key, value)
+        output_dir = tempfile.mkdtemp(dir=tmp_path)
+        with open(os.path.join(ROOT, app.BLUEPRINT_FILE), "rb") as word:
+            upload = FileStorage(stream=word, filename=app.BLUEPRINT_FILE) if word_file else None
+            report = app.processing(workbook, name, app.TEMPLATE_FILE, upload,
+                                    details=[name, designation, "CSBS", "1"], output_dir=output_dir)
+        return report, {document: document_text(os.path.join(output_dir, document)) for document in DOCUMENTS}
+
+    return process
@@ -0,0 +1,23 @@
+"""Admission of /history/stream connections: past HISTORY_MAX_STREAMS per
+worker a stream is turned away with a 503 instead of taking a thread."""
+import app
+
+
+def test_history_streams_over_the_cap_get_503(monkeypatch):
+    queue = app.AdmissionQueue("history_stream", 1, 0, 0, 7)
+    monkeypatch.setattr(app, "stream_queue", queue)
+    client = app.app.test_client()
+
+    first = client.get("/history/stream", buffered=False)
+    assert first.status_code == 200
+    rejected = client.get("/history/stream")
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "7"
+    assert rejected.get_data(as_text=True) == "retry: 7000\n\n"
+    assert queue.stats()["running"] == 1
+
+    first.close()  # the slot is given back when the response closes
+    assert queue.stats()["running"] == 0
+    assert queue.stats()["rejected"] == 1
+    client.get("/history/stream", buffered=False).close()
+    assert queue.stats()["admitted"] == 2
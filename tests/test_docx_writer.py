@@ -0,0 +1,80 @@
+"""save_document() must write what doc.save() does: the same entries and
+word/document.xml, with every other part copied from the template."""
+import os
+import struct
+import zipfile
+import zlib
+from io import BytesIO
+
+import pytest
+
+import app
+from conftest import ROOT
+
+
+def png(width=64, height=64):
+    """A small PNG of random pixels."""
+    raw = b"".join(b"\x00" + os.urandom(3 * width) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">2I5B", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+@pytest.fixture(autouse=True)
+def copying_writer(monkeypatch):
+    monkeypatch.setitem(app.app.config, "DOCX_WRITER", "copy")
+
+
+def fill(doc):
+    for t, table in enumerate(doc.tables):
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = f"{t}.{r}.{c}"
+
+
+@pytest.fixture(params=["template", "corrective", "template with media"])
+def template(request, tmp_path):
+    if request.param == "corrective":
+        return os.path.join(ROOT, app.CORRECTIVE_TEMPLATE_FILE)
+    path = os.path.join(ROOT, app.TEMPLATE_FILE)
+    if request.param == "template with media":
+        doc = app.Document(path)
+        doc.add_picture(BytesIO(png()))
+        path = str(tmp_path / "media.docx")
+        doc.save(path)
+    return path
+
+
+def test_copying_writer_matches_python_docx(template):
+    doc = app.open_template(template)
+    fill(doc)
+    reference, output = BytesIO(), BytesIO()
+    doc.save(reference)
+    app.save_document(doc, output, template)
+
+    original = zipfile.ZipFile(BytesIO(app.template_bytes(template)))
+    left, right = zipfile.ZipFile(reference), zipfile.ZipFile(output)
+    assert sorted(right.namelist()) == sorted(left.namelist())
+    assert right.testzip() is None
+    assert right.read("word/document.xml") == left.read("word/document.xml")
+    for name in right.namelist():
+        if name != "word/document.xml":
+            assert right.read(name) == original.read(name), name
+    app.Document(BytesIO(output.getvalue()))
+
+
+def test_falls_back_to_python_docx_when_parts_are_added():
+    template = os.path.join(ROOT, app.TEMPLATE_FILE)
+    doc = app.open_template(template)
+    doc.add_picture(BytesIO(png()))
+    reference, output = BytesIO(), BytesIO()
+    doc.save(reference)
+    app.save_document(doc, output, template)
+
+    left, right = zipfile.ZipFile(reference), zipfile.ZipFile(output)
+    assert sorted(right.namelist()) == sorted(left.namelist())
+    assert any(name.startswith("word/media/") for name in right.namelist())
+    assert right.read("word/document.xml") == left.read("word/document.xml")
@@ -0,0 +1,23 @@
+"""/export/<file_type>: pyarrow is optional, so without it Parquet export
+answers 501 while CSV export still works."""
+import builtins
+
+import app
+
+
+def test_parquet_export_without_pyarrow_gets_501(monkeypatch):
+    real_import = builtins.__import__
+
+    def no_pyarrow(name, *args, **kwargs):
+        if name.split(".")[0] == "pyarrow":
+            raise ImportError(f"No module named {name!r}")
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", no_pyarrow)
+    client = app.app.test_client()
+
+    response = client.get("/export/parquet")
+    assert response.status_code == 501
+    assert "pyarrow" in response.get_json()["error"]
+    assert client.get("/export/csv").status_code == 200
+    assert client.get("/export/pdf").status_code == 400
@@ -0,0 +1,67 @@
+"""The parallel and streaming workbook readers must return exactly the rows
+pandas does: values, dtypes, columns and index, for every section sheet
+and faculty, with the same strings read as missing."""
+import openpyxl
+import pytest
+
+import app
+from conftest import FACULTY, WORKBOOK
+
+
+@pytest.fixture(scope="module")
+def scaled_workbook(tmp_path_factory):
+    """marks.xlsx with each section's data rows repeated three times."""
+    workbook = openpyxl.load_workbook(WORKBOOK)
+    for section in app.SECTIONS:
+        if section["sheet"] not in workbook.sheetnames:
+            continue
+        sheet = workbook[section["sheet"]]
+        rows = [[cell.value for cell in row] for row in sheet.iter_rows()]
+        header, _ = app.locate_header(rows[:app.HEADER_SCAN_ROWS + 1], section["find_header"])
+        for _ in range(2):
+            for row in rows[header + 1:]:
+                sheet.append(row)
+    path = tmp_path_factory.mktemp("scaled") / "marks.xlsx"
+    workbook.save(path)
+    return str(path)
+
+
+def read_all(mode, path):
+    """{(sheet, name): (rows, name column)} of every section for every faculty."""
+    workbook = app.open_workbook(path, mode)
+    try:
+        return {(section["sheet"], name): workbook.faculty_rows(section, name)
+                for section in app.SECTIONS if section["sheet"] in workbook.sheet_names
+                for name in FACULTY}
+    finally:
+        workbook.close()
+
+
+@pytest.mark.parametrize("scaled", [False, True], ids=["marks", "marks x3"])
+@pytest.mark.parametrize("mode", ["parallel", "streaming"])
+def test_reader_matches_pandas(mode, scaled, scaled_workbook):
+    path = scaled_workbook if scaled else WORKBOOK
+    expected, actual = read_all("pandas", path), read_all(mode, path)
+    assert expected.keys() == actual.keys()
+    for key, (rows, column) in expected.items():
+        other, other_column = actual[key]
+        assert other_column == column, key
+        assert list(other.columns) == list(rows.columns), key
+        assert list(other.dtypes) == list(rows.dtypes), key
+        assert list(other.index) == list(rows.index), key
+        assert other.equals(rows), key
+
+
+def test_na_strings_match_pandas(tmp_path):
+    # every NA_STRINGS value, and some near misses, as read_excel reads them
+    values = sorted(app.NA_STRINGS) + ["na", "Null", "NONE", " NA", "N.A.", "-", "0"]
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["value"])
+    for value in values:
+        workbook.active.append([value])
+    path = tmp_path / "na.xlsx"
+    workbook.save(path)
+    frame = app.pd.read_excel(path)
+    assert len(frame) == len(values)
+    assert {value for value, read in zip(values, frame["value"]) if app.pd.isna(read)} == app.NA_STRINGS
+    assert all(app._is_missing(value) == (value in app.NA_STRINGS) for value in values)
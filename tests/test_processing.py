@@ -0,0 +1,59 @@
+"""Differential tests of processing(): answers from the section cache must
+match a full recompute, and the production configuration must match the
+legacy one (pandas reader, python-docx writer, no section cache)."""
+import openpyxl
+import pytest
+
+from conftest import DESIGNATIONS, FACULTY, WORKBOOK
+
+LEGACY = {"WORKBOOK_READER": "pandas", "DOCX_WRITER": "python-docx", "SECTION_CACHE_DIR": ""}
+
+
+def same_appraisal(left, right):
+    (left_report, left_text), (right_report, right_text) = left, right
+    assert left_report["scores"] == right_report["scores"]
+    assert left_report["counters"] == right_report["counters"]
+    assert left_text == right_text
+
+
+@pytest.mark.parametrize("designation", DESIGNATIONS)
+@pytest.mark.parametrize("name", FACULTY)
+def test_section_cache_hit_matches_recompute(process, name, designation):
+    first = process(WORKBOOK, name, designation)
+    hit = process(WORKBOOK, name, designation)
+    assert hit[0]["reprocessed"] == []
+    assert hit[0]["reused"] == first[0]["reprocessed"]
+    same_appraisal(hit, process(WORKBOOK, name, designation, SECTION_CACHE_DIR=""))
+
+
+def test_changed_sheet_is_the_only_one_reprocessed(process, tmp_path):
+    # Saved by openpyxl from separate loads, so only the edited sheet's XML differs.
+    before, after = str(tmp_path / "before.xlsx"), str(tmp_path / "after.xlsx")
+    openpyxl.load_workbook(WORKBOOK).save(before)
+    workbook = openpyxl.load_workbook(WORKBOOK)
+    sheet = workbook["Journal Publication"]
+    paper = next(row for row in sheet.iter_rows(values_only=True) if "Ravi P" in row)
+    sheet.append(paper)  # the same paper again: one more publication
+    workbook.save(after)
+
+    original = process(before, "Ravi P", "Professor")
+    changed = process(after, "Ravi P", "Professor")
+    assert changed[0]["reprocessed"] == ["Journal Publication"]
+    assert changed[0]["scores"]["research"] > original[0]["scores"]["research"]
+    same_appraisal(changed, process(after, "Ravi P", "Professor", SECTION_CACHE_DIR=""))
+
+
+def test_without_word_file_academics_scores_zero(process):
+    report, _ = process(WORKBOOK, "Ravi P", "Professor", word_file=False)
+    assert report["scores"]["academics"] == 0
+    assert report["scores"]["research"] == process(WORKBOOK, "Ravi P", "Professor")[0]["scores"]["research"]
+    # and a later upload with the Word file is not answered from that run
+    assert process(WORKBOOK, "Ravi P", "Professor")[0]["scores"]["academics"] > 0
+
+
+@pytest.mark.parametrize("designation", DESIGNATIONS)
+@pytest.mark.parametrize("name", FACULTY)
+def test_matches_legacy_configuration(process, name, designation):
+    legacy = process(WORKBOOK, name, designation, **LEGACY)
+    for reader in ("pandas", "parallel", "streaming"):
+        same_appraisal(process(WORKBOOK, name, designation, WORKBOOK_READER=reader, SECTION_CACHE_DIR=""), legacy)